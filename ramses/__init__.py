@@ -19,7 +19,7 @@
 
 from .logger import log, printException
 from .ram_settings import RamSettings
-from .constants import ItemType, Log, LogLevel, StepType, UserRole
+from .constants import CircuitState, ItemType, Log, LogLevel, QueryPriority, StepType, UserRole
 from .ram_object import RamObject
 from .ram_state import RamState
 from .ram_filetype import RamFileType
@@ -37,3 +37,9 @@ from .file_manager import RamFileManager
 from .metadata_manager import RamMetaDataManager
 from .file_info import RamFileInfo
 from .daemon_interface import RamDaemonInterface
+from .object_registry import RamObjectRegistry
+from .object_cache import RamObjectCache, RamCachePolicy
+from .object_transaction import RamObjectTransaction
+from .daemon_transport import RamDaemonTransport, RamTcpTransport, RamUnixTransport, RamReplayTransport
+from .daemon_interface_async import AsyncRamDaemonInterface
+from .json_codec import RamJsonCodec, registerJsonCodec, setJsonCodec, availableJsonCodecs
@@ -46,6 +46,16 @@ class MetaDataKeys():
     STATE = 'stateShortName'
     RESOURCE = 'resource'
 
+class CircuitState():
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+class QueryPriority():
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
 class ItemType():
     GENERAL='G'
     ASSET='A'
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import time
+import threading
+
+from .logger import log
+from .constants import LogLevel, CircuitState
+
+class RamDaemonCircuitBreaker( object ):
+    """Stops contacting the Ramses Daemon for a while when it can't be reached,
+    so that queries fail immediately instead of trying to connect each time.
+
+    - Closed: the daemon is available, all queries are posted.
+    - Open: the daemon could not be reached, queries are rejected until the retry delay has elapsed.
+    - Half-open: the retry delay has elapsed, the next query is posted as a probe and the others are still rejected.
+      If the probe succeeds, the circuit is closed again; if it fails, it's opened again with twice the delay.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, failureThreshold=1, retryDelay=1.0, maxRetryDelay=30.0):
+        """
+        Args:
+            failureThreshold: int.
+                The number of consecutive failures which open the circuit.
+            retryDelay: float.
+                The time in seconds before the first probe, doubled after each failed probe.
+            maxRetryDelay: float.
+                The maximum time in seconds between two probes.
+        """
+        self._failureThreshold = max(1, failureThreshold)
+        self._retryDelay = retryDelay
+        self._maxRetryDelay = maxRetryDelay
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._delay = retryDelay
+        self._retryTime = 0
+        self._rejectedCount = 0
+        self._openCount = 0
+
+    def state(self):
+        """The current state of the circuit. An open circuit becomes half-open when its retry delay has elapsed.
+
+        Returns: str.
+            One of CircuitState.
+        """
+        with self._lock:
+            if self._state == CircuitState.OPEN and time.monotonic() >= self._retryTime:
+                return CircuitState.HALF_OPEN
+            return self._state
+
+    def retryDelay(self):
+        """The time in seconds before the next probe, 0 if the circuit is closed"""
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return 0
+            return max(0, self._retryTime - time.monotonic())
+
+    def allow(self):
+        """Checks if a query can be posted to the daemon.
+
+        When the retry delay has elapsed, the first caller is allowed to probe the daemon
+        and must report the result with success() or failure().
+
+        Returns: bool.
+        """
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.OPEN and time.monotonic() >= self._retryTime:
+                self._state = CircuitState.HALF_OPEN
+                return True
+            self._rejectedCount = self._rejectedCount + 1
+            return False
+
+    def success(self):
+        """Reports the daemon has replied"""
+        with self._lock:
+            recovered = self._state != CircuitState.CLOSED
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._delay = self._retryDelay
+        if recovered:
+            log("The Ramses Daemon is available again.", LogLevel.Info)
+
+    def failure(self):
+        """Reports the daemon could not be reached"""
+        with self._lock:
+            self._failures = self._failures + 1
+            if self._state == CircuitState.HALF_OPEN:
+                # The probe failed
+                self._delay = min(self._delay * 2, self._maxRetryDelay)
+            elif self._state == CircuitState.OPEN or self._failures < self._failureThreshold:
+                return
+            self._state = CircuitState.OPEN
+            self._retryTime = time.monotonic() + self._delay
+            self._openCount = self._openCount + 1
+            delay = self._delay
+        log("The Ramses Daemon can't be reached, I'll try again in " + str(round(delay, 1)) + " s.", LogLevel.Debug)
+
+    def reset(self):
+        """Closes the circuit, the next query will be posted whatever happened before"""
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._delay = self._retryDelay
+
+    def rejectedCount(self):
+        """The number of queries rejected while the circuit was open since the last reset"""
+        return self._rejectedCount
+
+    def openCount(self):
+        """The number of times the circuit has been opened since the last reset"""
+        return self._openCount
+
+    def resetCounters(self):
+        """Resets rejectedCount() and openCount()"""
+        with self._lock:
+            self._rejectedCount = 0
+            self._openCount = 0
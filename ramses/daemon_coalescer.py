@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import copy
+import threading
+
+class RamDaemonCall( object ):
+    """A query in flight, which other threads can wait for"""
+
+    def __init__(self, generation):
+        self.done = threading.Event()
+        self.result = None
+        # The number of threads waiting for the result
+        self.waiting = 0
+        self.generation = generation
+
+class RamDaemonCoalescer( object ):
+    """Shares the result of a query between all the threads posting the same query at the same time.
+
+    The first thread posts the query; the others wait for its reply instead of posting the query again.
+    Each thread gets its own copy of the reply, as the callers may modify it.
+
+    A query which was posted before a write may reply with the data from before the write:
+    call invalidate() when a write is posted, so that the next calls don't wait for a query posted before.
+    This class is thread-safe.
+    """
+
+    def __init__(self, enabled=True):
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._generation = 0
+        self._callCount = 0
+        self._coalescedCount = 0
+
+    def enabled(self):
+        """True if identical concurrent queries are coalesced"""
+        return self._enabled
+
+    def setEnabled(self, enabled=True):
+        """Enables or disables coalescing"""
+        self._enabled = enabled
+
+    def call(self, key, function, *args):
+        """Calls the function, or waits for the result of the call in flight with the same key.
+
+        Args:
+            key: str.
+                Identifies the call, the query string.
+            function: callable.
+                Called with args if there's no call in flight with the same key.
+
+        Returns:
+            The result of the function.
+        """
+        with self._lock:
+            self._callCount = self._callCount + 1
+        if not self._enabled:
+            return function(*args)
+
+        with self._lock:
+            call = self._calls.get(key)
+            inFlight = call is not None and call.generation == self._generation
+            if inFlight:
+                self._coalescedCount = self._coalescedCount + 1
+                call.waiting = call.waiting + 1
+            else:
+                call = RamDaemonCall(self._generation)
+                self._calls[key] = call
+
+        if inFlight:
+            call.done.wait()
+            with self._lock:
+                call.waiting = call.waiting - 1
+                last = call.waiting == 0
+            # The last thread can take the copy which was kept for the waiting threads
+            if last:
+                return call.result
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = function(*args)
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                # No other thread can wait for this call anymore
+                waiting = call.waiting
+            # Copy before returning the result, the caller may modify it while the others copy it
+            if waiting > 0:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+        return result
+
+    def invalidate(self):
+        """Makes sure the next calls don't wait for a call in flight,
+        which may have been posted before a write and reply with outdated data."""
+        with self._lock:
+            self._generation = self._generation + 1
+
+    def callCount(self):
+        """The number of calls since the last reset"""
+        return self._callCount
+
+    def coalescedCount(self):
+        """The number of calls which have waited for another identical call instead of posting a query, since the last reset"""
+        return self._coalescedCount
+
+    def resetCounters(self):
+        """Resets callCount() and coalescedCount()"""
+        with self._lock:
+            self._callCount = 0
+            self._coalescedCount = 0
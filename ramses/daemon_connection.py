@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import re
+import select
+import socket
+import threading
+import weakref
+
+from .logger import log
+from .constants import LogLevel
+from .json_codec import jsonCodec
+
+# Size of the chunks read from the socket
+READ_SIZE = 65536
+# The bytes which matter to find the end of a JSON document once the escaped characters are removed;
+# the others are removed before scanning
+JSON_SYNTAX = b'"[]{}'
+JSON_OTHERS = bytes( b for b in range(256) if not b in JSON_SYNTAX )
+# A complete string, once the other bytes have been removed
+JSON_STRING = re.compile(rb'"[^"]*"')
+# Skips everything until the next bracket which is not in a string
+JSON_SKIP = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*', re.DOTALL)
+JSON_WHITESPACE = b' \t\r\n'
+
+class RamReplyDecoder( object ):
+    """Finds the end of the JSON replies received in chunks, and decodes them.
+
+    The data is scanned incrementally: each call only scans the bytes received since the previous one,
+    keeping track of the depth of the brackets, and of the string which isn't complete yet if any.
+    To scan quickly, the escaped characters are removed from the new data, then only the quotes and brackets are kept,
+    and the complete strings are removed.
+    A reply is decoded only once, with the fastest codec available (see json_codec), when it's complete.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forgets the state of the scan, when the buffer is cleared"""
+        # Where to resume the scan
+        self._position = 0
+        # The beginning of the current document, -1 if not found yet
+        self._start = -1
+        self._depth = 0
+        # The syntax of the string which is not complete yet
+        self._string = b''
+
+    def decode(self, buffer):
+        """Decodes the first JSON document in the buffer if it's complete, and removes it from the buffer.
+
+        Args:
+            buffer: bytearray.
+                The data received so far; it must only be appended to between two calls, until a document is returned.
+
+        Returns: dict or None.
+            None if the buffer does not contain a complete document yet.
+
+        Raises: ValueError.
+            If the document is not valid JSON.
+        """
+        end = self.__scan(buffer)
+        if end < 0:
+            return None
+
+        data = bytes(buffer[self._start:end])
+        del buffer[:end]
+        self.reset()
+        return jsonCodec().loads(data)
+
+    def __scan(self, buffer):
+        """Scans the new data, returns the end of the document or -1"""
+        position = self._position
+        length = len(buffer)
+        if self._start < 0:
+            # Skip the whitespace between the documents
+            while position < length and buffer[position] in JSON_WHITESPACE:
+                position = position + 1
+            if position == length:
+                self._position = position
+                return -1
+            if buffer[position] not in b'{[':
+                raise ValueError("Invalid reply from the Ramses Daemon.")
+            self._start = position
+
+        # A backslash at the end escapes a character which is not received yet
+        scanEnd = length
+        while scanEnd > position and buffer[scanEnd-1] == 92: # '\\'
+            scanEnd = scanEnd - 1
+
+        data = bytes(buffer[position:scanEnd])
+        if b'\\' in data:
+            data = data.replace(b'\\\\', b'').replace(b'\\"', b'')
+        syntax = self._string + data.translate(None, JSON_OTHERS)
+        # Most strings don't contain any bracket; merging adjacent strings doesn't change anything
+        syntax = syntax.replace(b'""', b'')
+        if b'"' in syntax:
+            syntax = JSON_STRING.sub(b'', syntax)
+        # What remains after the brackets is a string which is not complete yet
+        stringStart = syntax.find(b'"')
+        if stringStart < 0:
+            stringStart = len(syntax)
+
+        depth = self._depth
+        for index in range(stringStart):
+            if syntax[index] in b'{[':
+                depth = depth + 1
+                continue
+            depth = depth - 1
+            if depth == 0:
+                if index == len(syntax) - 1:
+                    # Usually the document ends with the data received
+                    end = length
+                    while buffer[end-1] in JSON_WHITESPACE:
+                        end = end - 1
+                    if buffer[end-1] in b']}':
+                        return end
+                # There's something after the document, like another reply: find where it ends
+                return self.__find(buffer)
+
+        self._depth = depth
+        self._string = syntax[stringStart:]
+        self._position = scanEnd
+        return -1
+
+    def __find(self, buffer):
+        """Finds the end of the document, scanning it from the beginning"""
+        position = self._start
+        depth = 0
+        skip = JSON_SKIP.match
+        while True:
+            position = skip(buffer, position).end() + 1
+            if buffer[position-1] in b'{[':
+                depth = depth + 1
+            else:
+                depth = depth - 1
+                if depth == 0:
+                    return position
+
+def decodeReply( buffer ):
+    """Decodes the first JSON document in the buffer if it's complete, and removes it from the buffer.
+    Use a RamReplyDecoder to decode the replies received in chunks.
+
+    Args:
+        buffer: bytearray.
+
+    Returns: dict or None.
+        None if the buffer does not contain a complete document yet.
+    """
+    return RamReplyDecoder().decode(buffer)
+
+class RamDaemonConnection( object ):
+    """A socket connected to the Ramses Daemon, which can be kept alive and used for several queries.
+
+    Replies are read until they're complete, whatever their size:
+    the end of a reply is detected by scanning the chunks as they're received, see RamReplyDecoder.
+    """
+
+    def __init__(self, transport):
+        """
+        Args:
+            transport: RamDaemonTransport.
+                Opens the socket.
+
+        Raises: OSError.
+            If the daemon can't be reached.
+        """
+        self._socket = transport.connect()
+        self._queryCount = 0
+        self._bytesReceived = 0
+        # Reused for all the replies read through this connection
+        self._buffer = bytearray()
+        self._decoder = RamReplyDecoder()
+        self._chunk = bytearray(READ_SIZE)
+        self._chunkView = memoryview(self._chunk)
+
+    def queryCount(self):
+        """The number of queries already sent through this connection"""
+        return self._queryCount
+
+    def bytesReceived(self):
+        """The number of bytes received through this connection"""
+        return self._bytesReceived
+
+    def send(self, data):
+        """Sends the bytes to the daemon"""
+        self._queryCount = self._queryCount + 1
+        self._socket.sendall(data)
+
+    def stale(self):
+        """Checks if an idle connection has been closed by the daemon.
+
+        Nothing should be received before the next query is sent:
+        if the socket is readable, the daemon has closed it (or sent something unexpected).
+
+        Returns: bool.
+        """
+        if self._buffer:
+            return True
+        try:
+            readable, _, _ = select.select( (self._socket,), (), (), 0 )
+        except (OSError, ValueError, TypeError):
+            # Not a real socket, it can't be checked
+            return False
+        return bool(readable)
+
+    def readReply(self):
+        """Reads a complete JSON reply from the daemon.
+
+        Data received after the end of the reply is kept for the next call.
+
+        Returns: dict or None.
+            None if the daemon has closed the connection before replying.
+
+        Raises: ValueError.
+            If the connection was closed before the reply was complete, or the reply is not valid JSON.
+        """
+        while True:
+            obj = self._decoder.decode(self._buffer)
+            if obj is not None:
+                return obj
+
+            received = self._socket.recv_into(self._chunk)
+            if received == 0:
+                if self._buffer.strip():
+                    self._buffer.clear()
+                    self._decoder.reset()
+                    raise ValueError("Incomplete reply from the Ramses Daemon.")
+                return None
+            self._bytesReceived = self._bytesReceived + received
+            self._buffer += self._chunkView[:received]
+
+    def shutdown(self):
+        """Interrupts a blocking read from another thread, the connection can't be used anymore"""
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except (OSError, AttributeError):
+            pass
+
+    def close(self):
+        """Closes the socket"""
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+
+class RamDaemonConnectionPool( object ):
+    """Keeps connections to the Ramses Daemon open to reuse them for the next queries,
+    instead of connecting a new socket for each query.
+
+    Connections are taken from the pool with acquire() and given back with release() when the reply has been read,
+    or discard() if they can't be used anymore. This class is thread-safe.
+
+    With per-thread connections, each thread keeps its own idle connection instead of sharing the idle connections:
+    threads posting many queries don't compete for the connections, which is useful with a pool of worker threads.
+    """
+
+    def __init__(self, transport, maxIdle=4, keepAlive=True, perThread=False):
+        """
+        Args:
+            transport: RamDaemonTransport.
+                Opens the connections.
+            maxIdle: int.
+                The maximum number of idle connections kept open.
+            keepAlive: bool.
+                If False, connections are closed as soon as they're released.
+            perThread: bool.
+                If True, each thread keeps its own connection open.
+        """
+        self._transport = transport
+        self._maxIdle = maxIdle
+        self._keepAlive = keepAlive
+        self._idle = []
+        self._lock = threading.Lock()
+        self._perThread = perThread
+        self._local = threading.local()
+        # All the connections kept by the threads, to close them with clear()
+        self._threadConnections = weakref.WeakSet()
+        # Set to True as soon as a connection has been reused successfully,
+        # which means the daemon supports persistent connections
+        self._reuseWorks = False
+        self._connectCount = 0
+        self._reuseCount = 0
+
+    def acquire(self):
+        """Gets an idle connection, or connects a new one.
+
+        Raises: OSError.
+            If the daemon can't be reached.
+        """
+        if self._perThread:
+            connection = getattr(self._local, 'connection', None)
+            if connection is not None:
+                self._local.connection = None
+                if not self.__isStale(connection):
+                    with self._lock:
+                        self._reuseCount = self._reuseCount + 1
+                    return connection
+
+        while True:
+            with self._lock:
+                if not self._idle:
+                    self._connectCount = self._connectCount + 1
+                    break
+                connection = self._idle.pop()
+            if not self.__isStale(connection):
+                with self._lock:
+                    self._reuseCount = self._reuseCount + 1
+                return connection
+        return RamDaemonConnection(self._transport)
+
+    def release(self, connection):
+        """Gives back a connection which can be reused"""
+        if connection.queryCount() > 1:
+            self._reuseWorks = True
+        if self._perThread and self._keepAlive and getattr(self._local, 'connection', None) is None:
+            self._local.connection = connection
+            with self._lock:
+                self._threadConnections.add(connection)
+            return
+
+        with self._lock:
+            if self._keepAlive and len(self._idle) < self._maxIdle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def discard(self, connection, failed=True):
+        """Closes a connection which can't be reused.
+
+        If it was a reused connection which failed and the daemon never accepted a second query on the same connection,
+        keep-alive is turned off: this daemon closes connections after each reply.
+        """
+        connection.close()
+        if failed and connection.queryCount() > 1 and not self._reuseWorks and self._keepAlive:
+            log("The Ramses Daemon does not keep connections alive, I'll connect for each query.", LogLevel.Debug)
+            self._keepAlive = False
+            self.clear()
+
+    def __isStale(self, connection):
+        """Discards an idle connection if the daemon has closed it"""
+        if not connection.stale():
+            return False
+        # Closed after a single query: the daemon may not keep connections alive, see discard()
+        if connection.queryCount() == 1 and not self._reuseWorks and self._keepAlive:
+            log("The Ramses Daemon does not keep connections alive, I'll connect for each query.", LogLevel.Debug)
+            self._keepAlive = False
+            connection.close()
+            self.clear()
+            return True
+        self.discard(connection)
+        return True
+
+    def clear(self):
+        """Closes all idle connections"""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+            # The threads will get an error when reusing them, and connect again
+            idle.extend( self._threadConnections )
+            self._threadConnections = weakref.WeakSet()
+        for connection in idle:
+            connection.close()
+
+    def transport(self):
+        """The transport used to open the connections
+
+        Returns: RamDaemonTransport.
+        """
+        return self._transport
+
+    def setTransport(self, transport):
+        """Changes the transport, closing the current connections"""
+        self._transport = transport
+        self.clear()
+
+    def keepAlive(self):
+        """True if the connections are kept open after use"""
+        return self._keepAlive
+
+    def setKeepAlive(self, keepAlive=True):
+        """Enables or disables persistent connections"""
+        self._keepAlive = keepAlive
+        if not keepAlive:
+            self.clear()
+
+    def perThread(self):
+        """True if each thread keeps its own connection"""
+        return self._perThread
+
+    def setPerThread(self, perThread=True):
+        """Enables or disables per-thread connections"""
+        self._perThread = perThread
+        self.clear()
+
+    def connectCount(self):
+        """The number of connections opened since the last reset"""
+        return self._connectCount
+
+    def reuseCount(self):
+        """The number of times an idle connection has been reused since the last reset"""
+        return self._reuseCount
+
+    def resetCounters(self):
+        """Resets connectCount() and reuseCount()"""
+        with self._lock:
+            self._connectCount = 0
+            self._reuseCount = 0
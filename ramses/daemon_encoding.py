@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+"""The encoding of the queries sent to the Ramses Daemon.
+
+A query is a string in the form "name&key1=value1&key2=value2". Older daemons read the values as is,
+so they can't contain '&' or '=', and read each chunk of data received as a single query.
+Newer daemons advertise optional capabilities in their ping reply:
+
+- 'escaping': the values are percent-encoded, only for the characters which would break the query
+  ('%', '&', '=' and new lines). The daemon decodes them as URL-encoded values.
+- 'framing': each query is preceded by a header with its length in bytes: "#<length>\\n<query>",
+  so that queries of any size can be sent in several chunks, or back-to-back.
+- 'zlib': with framing, large queries can be compressed: "#z<length>\\n<compressed query>".
+"""
+
+import zlib
+
+# The characters which would break the query string, and their escaped form
+ESCAPED_CHARACTERS = (
+    ('%', '%25'),
+    ('&', '%26'),
+    ('=', '%3D'),
+    ('\n', '%0A'),
+    ('\r', '%0D'),
+    )
+
+# The compression level: fast, the daemon is usually local
+COMPRESSION_LEVEL = 1
+
+def escapeValue( value ):
+    """Escapes the characters of a query value which would break the query"""
+    for character, escaped in ESCAPED_CHARACTERS:
+        if character in value:
+            value = value.replace(character, escaped)
+    return value
+
+def unescapeValue( value ):
+    """Decodes an escaped query value"""
+    if not '%' in value:
+        return value
+    from urllib.parse import unquote
+    return unquote(value)
+
+def frameQuery( data, compressThreshold=0 ):
+    """Prefixes the encoded query with its length, and compresses it if it's large.
+
+    Args:
+        data: bytes.
+        compressThreshold: int.
+            The minimum size in bytes of the queries to compress, 0 to never compress.
+
+    Returns: bytes.
+    """
+    if compressThreshold > 0 and len(data) >= compressThreshold:
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        if len(compressed) < len(data):
+            return b'#z' + str(len(compressed)).encode('ascii') + b'\n' + compressed
+    return b'#' + str(len(data)).encode('ascii') + b'\n' + data
+
+def readFrames( buffer ):
+    """Reads the complete framed queries at the beginning of the buffer, and removes them from the buffer.
+
+    Args:
+        buffer: bytearray.
+
+    Returns: list of bytes.
+        The decoded queries.
+
+    Raises: ValueError.
+        If a header is invalid.
+    """
+    queries = []
+    start = 0
+    while start < len(buffer) and buffer[start:start+1] == b'#':
+        headerEnd = buffer.find(b'\n', start)
+        if headerEnd < 0:
+            break
+        header = bytes(buffer[start+1:headerEnd])
+        compressed = header.startswith(b'z')
+        if compressed:
+            header = header[1:]
+        length = int(header)
+        end = headerEnd + 1 + length
+        if end > len(buffer):
+            break
+        payload = bytes(buffer[headerEnd+1:end])
+        if compressed:
+            payload = zlib.decompress(payload)
+        queries.append(payload)
+        start = end
+    del buffer[:start]
+    return queries
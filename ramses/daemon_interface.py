@@ -17,14 +17,230 @@
 #
 #======================= END GPL LICENSE BLOCK ========================
 
-import socket, json
+import time
+import atexit
+import threading
 
 from .logger import log
-from .constants import ItemType, LogLevel, Log, StepType
+from .constants import CircuitState, ItemType, LogLevel, Log, QueryPriority, StepType
+from .daemon_connection import RamDaemonConnectionPool
+from .daemon_transport import RamTcpTransport, createTransport
+from .daemon_session import RamDaemonSession
+from .daemon_stats import RamDaemonStats
+from .daemon_circuit import RamDaemonCircuitBreaker
+from .daemon_coalescer import RamDaemonCoalescer
+from .daemon_recorder import RamDaemonRecorder
+from .daemon_subscription import RamDaemonSubscription
+from .daemon_limiter import RamDaemonLimiter
+from .daemon_retry import RamDaemonRetryPolicy
+from .daemon_encoding import escapeValue, frameQuery
+from .json_codec import jsonDumps
+from .object_registry import RamObjectRegistry
+
+# Maximum number of uuids or paths in a single batch query, to keep the queries small enough
+# for daemons which read each query in one chunk. Larger batches are split (and pipelined if possible).
+BATCH_SIZE = 500
+
+# The queries which only read data: posting them twice has the same result
+READ_QUERIES = frozenset((
+    'ping',
+    'getRamsesFolder',
+    'getObjects',
+    'getProjects',
+    'getShots',
+    'getAssets',
+    'getSequences',
+    'getAssetGroups',
+    'getPipes',
+    'getSteps',
+    'getCurrentProject',
+    'getData',
+    'getPath',
+    'uuidFromPath',
+    'getStatus',
+    'getDataBatch',
+    'getPathBatch',
+    'uuidFromPathBatch',
+    'getChanges',
+    ))
+
+# The queries getting a lot of data at once, posted after the others when the daemon load is limited
+BULK_QUERIES = frozenset((
+    'getObjects',
+    'getDataBatch',
+    'getPathBatch',
+    'uuidFromPathBatch',
+    'getChanges',
+    ))
+
+def isReadQuery( query ):
+    """Checks if a query only reads data: posting it twice has the same result.
+
+    Args:
+        query: str.
+
+    Returns: bool.
+    """
+    return query.partition('&')[0] in READ_QUERIES
+
+def encodeQuery( query, session ):
+    """Encodes a query string for the daemon, according to the capabilities of the session.
+    See RamDaemonInterface.__encodeQuery()
+
+    Returns: bytes.
+    """
+    # The ping negotiates the capabilities, it must be understood by any daemon
+    if session.supports('framing') and query != 'ping':
+        from .ram_settings import RamSettings
+        threshold = RamSettings.instance().daemonCompressThreshold if session.supports('zlib') else 0
+        return frameQuery( query.encode('utf-8'), threshold )
+    if session.supports('pipelining'):
+        query = query + "\n"
+    return query.encode('utf-8')
+
+def setDataQuery( uuid, data, keys, session ):
+    """The query changing the data of an object: if the changed keys are known and the daemon supports it,
+    a patchData query with only the changed values; otherwise a setData query with the whole data.
+
+    Args:
+        data: dict or str.
+            The whole data of the object.
+        keys: iterable of str or None.
+            The keys of the changed values; the keys which are not in the data are removed.
+
+    Returns: tuple.
+    """
+    if keys is not None and isinstance(data, dict) and session.supports('patchData'):
+        values = {}
+        removed = []
+        for key in keys:
+            if key in data:
+                values[key] = data[key]
+            else:
+                removed.append(key)
+        query = [ "patchData", ('uuid', uuid), ('data', jsonDumps(values, compact=True)) ]
+        if removed:
+            query.append( ('removed', jsonDumps(removed, compact=True)) )
+        return tuple(query)
+
+    if not isinstance(data, str):
+        data = jsonDumps(data, compact=True)
+    return ( "setData", ('uuid', uuid), ('data', data) )
+
+def batchChunks( values ):
+    """Splits a list into chunks of at most BATCH_SIZE values"""
+    return [ values[i:i+BATCH_SIZE] for i in range(0, len(values), BATCH_SIZE) ]
+
+class RamDaemonPipeline( object ):
+    """A list of queries to be sent at once to the Ramses Daemon.
+
+    Get a new pipeline with RamDaemonInterface.pipeline()"""
+
+    def __init__(self, checkUser, postMany, session, subscription):
+        """
+        Args:
+            checkUser: callable.
+                Checks if there's a current user.
+            postMany: callable.
+                Posts a list of queries and returns the list of replies.
+            session: RamDaemonSession.
+                The capabilities of the daemon.
+            subscription: RamDaemonSubscription.
+                The changes of the daemon, the data of the objects in the replies is cached with its generation.
+        """
+        self.__checkUser = checkUser
+        self.__postMany = postMany
+        self.__session = session
+        self.__subscription = subscription
+        self.__generation = 0
+        self.__queries = []
+        self.__converters = []
+
+    def __len__(self):
+        return len(self.__queries)
+
+    def add(self, query, converter=None):
+        """Adds a query to the pipeline.
+
+        Args:
+            query: str or tuple.
+                See RamDaemonInterface.buildQuery().
+            converter: callable.
+                Converts the reply (dict or None) to the result returned by execute().
+                By default, the reply is returned as is.
+        """
+        self.__queries.append(query)
+        self.__converters.append(converter)
+
+    def getData(self, uuid):
+        """Adds a getData query; its result is the data (dict)"""
+        self.add( ("getData", ('uuid', uuid)),
+            lambda reply: RamDaemonInterface.checkReply(reply).get("data", {}) )
+
+    def setData(self, uuid, data, keys=None):
+        """Adds a setData query, or a patchData query if the changed keys are known (see RamDaemonInterface.setData());
+        its result is the reply (dict)"""
+        self.add( setDataQuery( uuid, data, keys, self.__session ) )
+
+    def getPath(self, uuid):
+        """Adds a getPath query; its result is the path (str)"""
+        self.add( ("getPath", ('uuid', uuid)),
+            lambda reply: RamDaemonInterface.checkReply(reply).get("path", "") )
+
+    def uuidFromPath(self, path, type):
+        """Adds a uuidFromPath query; its result is the uuid (str)"""
+        self.add( ("uuidFromPath", ('path', path), ('type', type)),
+            lambda reply: RamDaemonInterface.checkReply(reply).get("uuid", "") )
+
+    def getStatus(self, itemUuid, stepUuid):
+        """Adds a getStatus query; its result is a RamStatus or None"""
+        self.add( ("getStatus", ('itemUuid', itemUuid), ('stepUuid', stepUuid)), self.__status )
+
+    def execute(self):
+        """Sends all the queries and returns the list of the results, in the same order.
+        The pipeline is cleared and can be reused.
+
+        Returns: list.
+        """
+        queries = self.__queries
+        converters = self.__converters
+        self.__queries = []
+        self.__converters = []
+
+        if not queries:
+            return []
+
+        if not self.__checkUser():
+            log( Log.NoUser, LogLevel.Debug)
+            replies = [ None for query in queries ]
+        else:
+            # Changes received while the replies are in flight will invalidate their data
+            self.__generation = self.__subscription.generation()
+            replies = self.__postMany( queries )
+
+        results = []
+        for reply, converter in zip(replies, converters):
+            if converter is None:
+                results.append(reply)
+            else:
+                results.append( converter(reply) )
+        return results
+
+    def __status(self, reply):
+        content = RamDaemonInterface.checkReply(reply)
+        uuid = content.get("uuid", "")
+        if uuid == "":
+            return None
+        return RamObjectRegistry.instance().create("RamStatus", uuid, content.get("data", {}), self.__generation)
 
 class RamDaemonInterface( object ):
     """The Class used to communicate with the Ramses Daemon
 
+    The interface can be used from several threads, for example with a concurrent.futures.ThreadPoolExecutor:
+    the connection pool, the session, the statistics and the other shared states are protected by locks.
+    When many threads post queries, set RamSettings.daemonPerThreadConnections (or call setPerThreadConnections())
+    so that each thread keeps its own connection to the daemon.
+
     Attributes:
         port: int.
             The listening port of the daemon
@@ -33,9 +249,12 @@ class RamDaemonInterface( object ):
     """
     
     _instance = None
+    _instanceLock = threading.Lock()
 
     @staticmethod
     def checkReply( obj ):
+        if obj is None:
+            return {}
         if obj['accepted'] and obj['success'] and obj['content'] is not None:
             return obj['content']
         return {}
@@ -44,10 +263,57 @@ class RamDaemonInterface( object ):
     def instance( cls ):
         from .ram_settings import RamSettings
         
-        if cls._instance is None:
-            cls._instance = cls.__new__(cls)
-            cls._port = RamSettings.instance().ramsesClientPort
+        if cls._instance is not None:
+            return cls._instance
+
+        with cls._instanceLock:
+            if cls._instance is not None:
+                return cls._instance
+            instance = cls.__new__(cls)
+            settings = RamSettings.instance()
+            cls._port = settings.ramsesClientPort
             cls._address = 'localhost'
+            cls._pool = RamDaemonConnectionPool(
+                createTransport( settings, cls._address ),
+                settings.daemonPoolSize,
+                settings.daemonKeepAlive,
+                settings.daemonPerThreadConnections
+                )
+            cls._session = RamDaemonSession( settings.userCacheTimeout )
+            cls._stats = RamDaemonStats()
+            cls._registry = RamObjectRegistry.instance()
+            cls._coalescer = RamDaemonCoalescer( settings.daemonCoalesceQueries )
+            cls._recorder = None
+            cls._circuit = RamDaemonCircuitBreaker(
+                settings.daemonFailureThreshold,
+                settings.daemonRetryDelay,
+                settings.daemonMaxRetryDelay
+                )
+            cls._subscription = RamDaemonSubscription(
+                instance,
+                settings.daemonSubscribe,
+                settings.daemonPollInterval,
+                settings.daemonRetryDelay,
+                settings.daemonMaxRetryDelay
+                )
+            cls._limiter = RamDaemonLimiter(
+                settings.daemonRateLimit,
+                settings.daemonRateBurst,
+                settings.daemonMaxInFlight
+                )
+            cls._retryPolicy = RamDaemonRetryPolicy(
+                settings.daemonReadRetries,
+                settings.daemonReadRetryDelay,
+                settings.daemonReadMaxRetryDelay,
+                READ_QUERIES
+                )
+            atexit.register( cls._stats.dumpAtExit )
+            # Closes the recording if there's one
+            atexit.register( instance.stopRecording )
+            if settings.daemonRecordFile != "":
+                instance.startRecording( settings.daemonRecordFile )
+            # Only publish the instance when it's ready, other threads may be waiting for it
+            cls._instance = instance
 
         return cls._instance
 
@@ -59,9 +325,170 @@ class RamDaemonInterface( object ):
         raise RuntimeError("RamDaemonInterface can't be initialized with `RamDaemonInterface()`, it is a singleton. Call RamDaemonInterface.instance() or Ramses.instance().daemonInterface() instead.")
 
     def online(self):
-        """Checks if the daemon is available"""
+        """Checks if the daemon is available.
+        While the circuit breaker is open, returns False without trying to reach the daemon."""
         return self.__testConnection()
 
+    def setAddress(self, address, port):
+        """Connects to a daemon at another address through TCP, for example a RamFakeDaemon used for tests.
+        The current connections are closed."""
+        self._address = address
+        self._port = port
+        self.setTransport( RamTcpTransport( address, port ) )
+
+    def address(self):
+        """The address of the daemon, used with the TCP transport"""
+        return self._address
+
+    def port(self):
+        """The listening port of the daemon, used with the TCP transport"""
+        return self._port
+
+    def transport(self):
+        """The transport used to connect to the daemon, set with RamSettings.daemonTransport
+
+        Returns: RamDaemonTransport.
+        """
+        return self._pool.transport()
+
+    def setTransport(self, transport):
+        """Connects to the daemon through another transport, like a RamUnixTransport.
+        The current connections are closed.
+
+        Args:
+            transport: RamDaemonTransport.
+        """
+        self._subscription.stop()
+        self._pool.setTransport( transport )
+        self._session.reset()
+        self._circuit.reset()
+
+    def connectionPool(self):
+        """The pool of the connections kept open to the daemon.
+
+        Returns: RamDaemonConnectionPool.
+        """
+        return self._pool
+
+    def setPerThreadConnections(self, perThread=True):
+        """Makes each thread keep its own connection to the daemon, instead of sharing the idle connections.
+        Use it when posting queries from many threads."""
+        self._pool.setPerThread( perThread )
+
+    def session(self):
+        """The state of the session with the daemon, which caches the current user.
+
+        Returns: RamDaemonSession.
+        """
+        return self._session
+
+    def circuitBreaker(self):
+        """The circuit breaker which rejects the queries immediately for a while when the daemon can't be reached,
+        instead of trying to connect for each query.
+
+        Returns: RamDaemonCircuitBreaker.
+        """
+        return self._circuit
+
+    def coalescer(self):
+        """Shares the replies between the threads posting the same read query at the same time,
+        like widgets getting the data of the same object.
+
+        Returns: RamDaemonCoalescer.
+        """
+        return self._coalescer
+
+    def subscription(self):
+        """Follows the changes of the objects in the daemon, so that their data stays cached until they change.
+        It's started as soon as the daemon is pinged, if it supports it.
+
+        Returns: RamDaemonSubscription.
+        """
+        return self._subscription
+
+    def retryPolicy(self):
+        """Decides when the read queries are posted again after a dropped connection or an incomplete reply,
+        see RamSettings.daemonReadRetries. The retries are counted in stats().
+
+        Returns: RamDaemonRetryPolicy.
+        """
+        return self._retryPolicy
+
+    def limiter(self):
+        """Limits the rate of the queries and the number of queries in flight, see RamSettings.daemonRateLimit
+        and RamSettings.daemonMaxInFlight. Queries are then served by priority:
+
+            with DAEMON.limiter().prioritize( QueryPriority.BULK ):
+                for shot in project.shots():
+                    ...
+
+        Returns: RamDaemonLimiter.
+        """
+        return self._limiter
+
+    def stats(self):
+        """The statistics of the queries posted to the daemon: count, latency, size and failures by query name.
+
+        Use stats().trace() to record the queries posted during a specific call:
+
+            with DAEMON.stats().trace() as trace:
+                Ramses.instance().saveFile( filePath )
+            print( trace.counts() )
+
+        Returns: RamDaemonStats.
+        """
+        return self._stats
+
+    def startRecording(self, filePath):
+        """Records all the queries and their replies to a JSON Lines file, until stopRecording() is called.
+        The recording can be replayed without a daemon:
+
+            DAEMON.setTransport( RamReplayTransport( filePath ) )
+
+        Args:
+            filePath: str.
+                The file is overwritten.
+        """
+        self.stopRecording()
+        self._recorder = RamDaemonRecorder( filePath )
+        # Record the ping checking the user too, the replay will need it
+        self._session.invalidate()
+
+    def recorder(self):
+        """The current recording, see startRecording()
+
+        Returns: RamDaemonRecorder or None.
+        """
+        return self._recorder
+
+    def stopRecording(self):
+        """Stops recording the queries, see startRecording()
+
+        Returns: int.
+            The number of queries recorded.
+        """
+        recorder = self._recorder
+        if recorder is None:
+            return 0
+        self._recorder = None
+        recorder.close()
+        return recorder.count()
+
+    def pipeline(self):
+        """Creates a pipeline to send several queries at once.
+
+        Queries added to the pipeline are sent when it's executed, back-to-back through a single connection
+        if the daemon supports pipelining, and the results are returned in the same order:
+
+            pipe = DAEMON.pipeline()
+            for shot in shots:
+                pipe.getData( shot.uuid() )
+            datas = pipe.execute()
+
+        Returns: RamDaemonPipeline.
+        """
+        return RamDaemonPipeline( self.__checkUser, self.__postMany, self._session, self._subscription )
+
     def ping(self):
         """Gets the version and current user of the ramses daemon.
 
@@ -70,7 +497,18 @@ class RamDaemonInterface( object ):
         Returns: dict.
             Read http://ramses.rxlab.guide/dev/daemon-reference/ for more information.
         """
-        return self.__post('ping', 65536)
+        reply = self.__post('ping', 65536)
+        if reply is None:
+            self._session.invalidate()
+            return reply
+
+        capabilities = self._session.capabilities()
+        self._session.update( reply.get('content') )
+        # Open connections may be using the previous query framing
+        if capabilities != self._session.capabilities():
+            self._pool.clear()
+        self._subscription.start()
+        return reply
 
     def raiseWindow(self):
         """Raises the Ramses Client application main window.
@@ -93,25 +531,12 @@ class RamDaemonInterface( object ):
         Returns: list of RamObject.
         """
 
-        from .ram_asset import RamAsset
-        from .ram_assetgroup import RamAssetGroup
-        from .ram_filetype import RamFileType
-        from .ram_item import RamItem
-        from .ram_object import RamObject
-        from .ram_pipe import RamPipe
-        from .ram_pipefile import RamPipeFile
-        from .ram_project import RamProject
-        from .ram_sequence import RamSequence
-        from .ram_shot import RamShot
-        from .ram_state import RamState
-        from .ram_status import RamStatus
-        from .ram_step import RamStep
-        from .ram_user import RamUser
-
         if not self.__checkUser():
             self.__noUserReply('getProjects')
             return []
 
+        # Changes received while the reply is in flight will invalidate its data
+        generation = self._subscription.generation()
         reply = self.__post(
             (
                 "getObjects",
@@ -119,42 +544,7 @@ class RamDaemonInterface( object ):
             ),
             65536 )
         content = self.checkReply(reply)
-        objs = content.get("objects", ())
-        objects = []
-        for obj in objs:
-            uuid = obj.get("uuid", "")
-            data = obj.get("data", {})
-            if objectType == "RamObject":
-                o = RamObject( uuid, data=data)
-            elif objectType == "RamAsset":
-                o = RamAsset( uuid, data=data)
-            elif objectType == "RamAssetGroup":
-                o = RamAssetGroup( uuid, data=data)
-            elif objectType == "RamFileType":
-                o = RamFileType( uuid, data=data)
-            elif objectType == "RamItem":
-                o = RamItem( uuid, data=data)
-            elif objectType == "RamPipe":
-                o = RamPipe( uuid, data=data)
-            elif objectType == "RamPipeFile":
-                o = RamPipeFile( uuid, data=data)
-            elif objectType == "RamProject":
-                o = RamProject( uuid, data=data)
-            elif objectType == "RamSequence":
-                o = RamSequence( uuid, data=data)
-            elif objectType == "RamShot":
-                o = RamShot( uuid, data=data)
-            elif objectType == "RamState":
-                o = RamState( uuid, data=data)
-            elif objectType == "RamStatus":
-                o = RamStatus( uuid, data=data)
-            elif objectType == "RamStep":
-                o = RamStep( uuid, data=data)
-            elif objectType == "RamUser":
-                o = RamUser( uuid, data=data)
-            if o:
-                objects.append(o)
-        return objects
+        return self._registry.createList( objectType, content.get("objects", ()), generation )
 
     def getProjects(self):
         """Gets the list of the projects
@@ -164,178 +554,131 @@ class RamDaemonInterface( object ):
         Returns: list of RamProject.
         """
 
-        from .ram_project import RamProject
-
         if not self.__checkUser():
             self.__noUserReply('getProjects')
             return ()
 
+        generation = self._subscription.generation()
         reply = self.__post( "getProjects", 262144 )
         content = self.checkReply(reply)
-        projectList = content.get("projects", ())
-        projects = []
-        for p in projectList:
-            pid = p.get("uuid", "")
-            pdata = p.get("data", {})
-            projects.append( RamProject(
-                uuid = pid,
-                data = pdata
-            ))
+        return self._registry.createList( "RamProject", content.get("projects", ()), generation )
 
-        return projects
+    def getShots(self, projectUuid, sequenceUuid="", hydrate=False):
+        """Gets the list of shots for this project.
 
-    def getShots(self, projectUuid, sequenceUuid=""):
-        """Gets the list of shots for this project"""
+        Args:
+            hydrate: bool.
+                Also gets the data of the shots, in the same reply.
 
-        from .ram_shot import RamShot
+        Returns: list of RamShot.
+        """
 
         if not self.__checkUser():
             self.__noUserReply('getAssets')
             return ()
-        
-        shots = []
 
-        reply =  self.__post(
-            (
-                "getShots",
-                ('projectUuid', projectUuid),
-                ('sequenceUuid', sequenceUuid)
-            ),
-            65536 )
+        return self.__getList( "RamShot", "shots", hydrate, (
+            "getShots",
+            ('projectUuid', projectUuid),
+            ('sequenceUuid', sequenceUuid)
+            ) )
 
-        content = self.checkReply(reply)
-        shotListUuid = content.get("shots", ())
-        for uuid in shotListUuid:
-            shot = RamShot( uuid )
-            shots.append( shot )
-        return shots
+    def getAssetGroups(self, projectUuid, hydrate=False):
+        """Gets the list of asset groups for this project.
 
-    def getAssetGroups(self, projectUuid):
-        """Gets the list of asset groups for this project"""
+        Args:
+            hydrate: bool.
+                Also gets the data of the asset groups, in the same reply.
 
-        from .ram_assetgroup import RamAssetGroup
+        Returns: list of RamAssetGroup.
+        """
 
         if not self.__checkUser():
             self.__noUserReply('getAssets')
             return ()
-        
-        assetGroups = []
 
-        reply =  self.__post(
-            (
-                "getAssetGroups",
-                ('projectUuid', projectUuid)
-            ),
-            65536 )
+        return self.__getList( "RamAssetGroup", "assetGroups", hydrate, (
+            "getAssetGroups",
+            ('projectUuid', projectUuid)
+            ) )
 
-        content = self.checkReply(reply)
-        agListUuid = content.get("assetGroups", ())
-        for uuid in agListUuid:
-            ag = RamAssetGroup( uuid )
-            assetGroups.append( ag )
-        return assetGroups
+    def getSequences(self, projectUuid, hydrate=False):
+        """Gets the list of sequences for this project.
 
-    def getSequences(self, projectUuid):
-        """Gets the list of sequences for this project"""
+        Args:
+            hydrate: bool.
+                Also gets the data of the sequences, in the same reply.
 
-        from .ram_sequence import RamSequence
+        Returns: list of RamSequence.
+        """
 
         if not self.__checkUser():
             self.__noUserReply('getAssets')
             return ()
-        
-        sequences = []
 
-        reply =  self.__post(
-            (
-                "getSequences",
-                ('projectUuid', projectUuid)
-            ),
-            65536 )
+        return self.__getList( "RamSequence", "sequences", hydrate, (
+            "getSequences",
+            ('projectUuid', projectUuid)
+            ) )
 
-        content = self.checkReply(reply)
-        seqListUuid = content.get("sequences", ())
-        for uuid in seqListUuid:
-            seq = RamSequence( uuid )
-            sequences.append( seq )
-        return sequences
+    def getAssets(self, projectUuid, groupUuid="", hydrate=False):
+        """Gets the list of assets for this project.
 
-    def getAssets(self, projectUuid, groupUuid=""):
-        """Gets the list of assets for this project"""
+        Args:
+            hydrate: bool.
+                Also gets the data of the assets, in the same reply.
 
-        from .ram_asset import RamAsset
+        Returns: list of RamAsset.
+        """
 
         if not self.__checkUser():
             self.__noUserReply('getAssets')
             return ()
-        
-        assets = []
 
-        reply =  self.__post(
-            (
-                "getAssets",
-                ('projectUuid', projectUuid),
-                ('groupUuid', groupUuid)
-            ),
-            65536 )
+        return self.__getList( "RamAsset", "assets", hydrate, (
+            "getAssets",
+            ('projectUuid', projectUuid),
+            ('groupUuid', groupUuid)
+            ) )
 
-        content = self.checkReply(reply)
-        assetListUuid = content.get("assets", ())
-        for uuid in assetListUuid:
-            asset = RamAsset( uuid )
-            assets.append( asset )
-        return assets
+    def getPipes(self, projectUuid, hydrate=False):
+        """Gets the list of pipes for this project.
 
-    def getPipes(self, projectUuid):
-        """Gets the list of pipes for this project"""
+        Args:
+            hydrate: bool.
+                Also gets the data of the pipes, in the same reply.
 
-        from .ram_pipe import RamPipe
+        Returns: list of RamPipe.
+        """
 
         if not self.__checkUser():
             self.__noUserReply('getAssets')
             return ()
-        
-        pipes = []
 
-        reply =  self.__post(
-            (
-                "getPipes",
-                ('projectUuid', projectUuid)
-            ),
-            65536 )
+        return self.__getList( "RamPipe", "pipes", hydrate, (
+            "getPipes",
+            ('projectUuid', projectUuid)
+            ) )
 
-        content = self.checkReply(reply)
-        pipeListUuid = content.get("pipes", ())
-        for uuid in pipeListUuid:
-            pipe = RamPipe( uuid )
-            pipes.append( pipe )
-        return pipes
+    def getSteps(self, projectUuid, stepType=StepType.ALL, hydrate=False):
+        """Gets the list of steps for this project.
 
-    def getSteps(self, projectUuid, stepType=StepType.ALL):
-        """Gets the list of steps for this project"""
+        Args:
+            hydrate: bool.
+                Also gets the data of the steps, in the same reply.
 
-        from .ram_step import RamStep
+        Returns: list of RamStep.
+        """
 
         if not self.__checkUser():
             self.__noUserReply('getAssets')
             return ()
-        
-        steps = []
 
-        reply =  self.__post(
-            (
-                "getSteps",
-                ('projectUuid', projectUuid),
-                ('type', stepType)
-            ),
-            65536 )
-
-        content = self.checkReply(reply)
-        stepListUuid = content.get("steps", ())
-        for uuid in stepListUuid:
-            step = RamStep( uuid )
-            steps.append( step )
-        return steps
+        return self.__getList( "RamStep", "steps", hydrate, (
+            "getSteps",
+            ('projectUuid', projectUuid),
+            ('type', stepType)
+            ) )
 
     def getCurrentProject(self):
         """Gets the current project
@@ -345,28 +688,26 @@ class RamDaemonInterface( object ):
         Returns: RamProject.
         """
 
-        from .ram_project import RamProject
-
         if not self.__checkUser():
             self.__noUserReply('getCurrentProject')
             return None
 
+        generation = self._subscription.generation()
         reply = self.__post( "getCurrentProject", 65536 )
         content = self.checkReply(reply)
         uuid = content.get("uuid", "")
         if uuid == "":
             return None
         data = content.get("data", {})
-        return RamProject(uuid, data)
+        return self._registry.create("RamProject", uuid, data, generation)
 
     def getCurrentUser(self):
         """Gets the current user"""
-        from .ram_user import RamUser
         content = self.checkReply( self.ping() )
         uuid =  content.get("userUuid", "")
         if uuid == "":
             return None
-        return RamUser( uuid )
+        return self._registry.create("RamUser", uuid)
 
     def setCurrentProject(self, projectUuid):
         """Sets the current project.
@@ -403,23 +744,26 @@ class RamDaemonInterface( object ):
         content = self.checkReply(reply)
         return content.get("data", {})
 
-    def setData(self, uuid, data):
+    def setData(self, uuid, data, keys=None):
         """Sets the data of a specific RamObject.
 
+        If the keys of the changed values are given and the daemon supports the 'patchData' capability,
+        only these values are sent; otherwise the whole data is sent.
+
         Read the Ramses Daemon reference at http://ramses.rxlab.guide/dev/daemon-reference/ for more information.
+
+        Args:
+            uuid: str.
+            data: dict or str.
+                The whole data of the object.
+            keys: iterable of str.
+                The keys of the changed values, None if unknown. The keys which are not in the data are removed.
         
         Returns: dict.
         """
 
-        if not isinstance(data, str):
-            data = json.dumps(data)
-
         if not self.__checkUser(): return self.__noUserReply('setData')
-        return self.__post( (
-            "setData",
-            ('uuid', uuid),
-            ('data', data)
-            ), 65536 )
+        return self.__post( setDataQuery( uuid, data, keys, self._session ), 65536 )
 
     def getPath(self, uuid):
         """Gets the path for a specific RamObject.
@@ -460,12 +804,151 @@ class RamDaemonInterface( object ):
         content = self.checkReply(reply)
         return content.get("uuid", "")
 
+    def getDataBatch(self, uuids):
+        """Gets the data for several RamObjects at once.
+
+        If the daemon supports it, all the data is fetched with a single query.
+        Otherwise, the getData queries are sent one after the other through the same connection.
+
+        Returns: dict.
+            The data (a dict) for each uuid.
+        """
+
+        uuids = list(uuids)
+        if not uuids:
+            return {}
+
+        if not self.__checkUser():
+            self.__noUserReply('getDataBatch')
+            return {}
+
+        result = {}
+
+        if self._session.supports('getDataBatch'):
+            replies = self.__postMany( [ (
+                "getDataBatch",
+                ('uuids', self.__jsonList(chunk))
+                ) for chunk in batchChunks(uuids) ] )
+            for reply in replies:
+                content = self.checkReply(reply)
+                for obj in content.get("objects", ()):
+                    result[obj.get("uuid", "")] = obj.get("data", {})
+        else:
+            replies = self.__postMany( [ ("getData", ('uuid', uuid)) for uuid in uuids ] )
+            for uuid, reply in zip(uuids, replies):
+                result[uuid] = self.checkReply(reply).get("data", {})
+
+        for uuid in uuids:
+            if not uuid in result:
+                result[uuid] = {}
+        return result
+
+    def getPathBatch(self, uuids):
+        """Gets the paths of several RamObjects at once.
+
+        If the daemon supports it, all the paths are fetched with a single query.
+        Otherwise, the getPath queries are sent one after the other through the same connection.
+
+        Returns: dict.
+            The path (a str) for each uuid.
+        """
+
+        uuids = list(uuids)
+        if not uuids:
+            return {}
+
+        if not self.__checkUser():
+            self.__noUserReply('getPathBatch')
+            return {}
+
+        result = {}
+
+        if self._session.supports('getPathBatch'):
+            replies = self.__postMany( [ (
+                "getPathBatch",
+                ('uuids', self.__jsonList(chunk))
+                ) for chunk in batchChunks(uuids) ] )
+            for reply in replies:
+                content = self.checkReply(reply)
+                result.update( content.get("paths", {}) )
+        else:
+            replies = self.__postMany( [ ("getPath", ('uuid', uuid)) for uuid in uuids ] )
+            for uuid, reply in zip(uuids, replies):
+                result[uuid] = self.checkReply(reply).get("path", "")
+
+        for uuid in uuids:
+            if not uuid in result:
+                result[uuid] = ""
+        return result
+
+    def uuidFromPathBatch(self, paths, type ):
+        """Gets the uuids of several Objects of the same type using their paths.
+
+        If the daemon supports it, all the uuids are fetched with a single query.
+        Otherwise, the uuidFromPath queries are sent one after the other through the same connection.
+
+        Returns: list of str.
+            The uuids, in the same order as the paths; an empty string if a path does not belong to an object.
+        """
+
+        paths = list(paths)
+        if not paths:
+            return []
+
+        if not self.__checkUser():
+            self.__noUserReply('uuidFromPathBatch')
+            return [""] * len(paths)
+
+        if self._session.supports('uuidFromPathBatch'):
+            replies = self.__postMany( [ (
+                "uuidFromPathBatch",
+                ('paths', self.__jsonList(chunk)),
+                ('type', type),
+                ) for chunk in batchChunks(paths) ] )
+            uuids = []
+            for reply in replies:
+                content = self.checkReply(reply)
+                uuids.extend( content.get("uuids", ()) )
+        else:
+            replies = self.__postMany( [ ("uuidFromPath", ('path', path), ('type', type)) for path in paths ] )
+            uuids = [ self.checkReply(reply).get("uuid", "") for reply in replies ]
+
+        if len(uuids) != len(paths):
+            log("Invalid uuidFromPathBatch reply from the Ramses Daemon.", LogLevel.Critical)
+            return [""] * len(paths)
+        return uuids
+
+    def getChanges(self, since=None):
+        """Gets the objects modified since the given time, if the daemon supports it (see session().supports('getChanges')).
+
+        Args:
+            since: float or None.
+                A time returned by a previous call. If None, only the current time of the daemon is returned.
+
+        Returns: dict or None.
+            objects (dict): the modification time of each changed object, by uuid.
+            time (float): the current time of the daemon, to be used for the next call.
+            None if the daemon can't be reached or doesn't support this query.
+        """
+
+        if not self.__checkUser():
+            self.__noUserReply('getChanges')
+            return None
+
+        query = ( "getChanges", )
+        if since is not None:
+            query = query + ( ('since', repr(since)), )
+        reply = self.__post( query, 65536 )
+        if reply is None or not self.__successful(reply):
+            return None
+        return reply['content']
+
     def create(self, uuid, data, objectType):
         if not self.__checkUser():
             return self.__noUserReply('uuidFromPath')
 
         if not isinstance(data, str):
-            data = json.dumps(data)
+            data = jsonDumps(data, compact=True)
 
         return self.__post( (
             "create",
@@ -477,12 +960,11 @@ class RamDaemonInterface( object ):
     def getStatus(self, itemUuid, stepUuid):
         """Gets the status of an item & step"""
 
-        from .ram_status import RamStatus
-
         if not self.__checkUser():
             self.__noUserReply('getStatus')
             return {}
 
+        generation = self._subscription.generation()
         reply =  self.__post(
             (
                 "getStatus",
@@ -494,7 +976,7 @@ class RamDaemonInterface( object ):
         uuid = content.get("uuid", "")
         if (uuid == ""):
             return None
-        return RamStatus(uuid, content.get("data", {}))
+        return self._registry.create("RamStatus", uuid, content.get("data", {}), generation)
 
     def setStatusModifiedBy(self, uuid, userUuid = "current"):
         """Sets the user who's modified the status.
@@ -513,13 +995,17 @@ class RamDaemonInterface( object ):
             ),
             65536 )
 
-    def __buildQuery(self, query):
+    @staticmethod
+    def buildQuery( query, escape=False ):
         """Builds a query from a list of args
 
         Args:
             query: str or tuple.
                 If query is a str, it is returned as is.
                 If it's a tuple, each item can be either an argument as a string, or a 2-tuple key/value pair.
+            escape: bool.
+                Escapes the characters of the values which would break the query ('&', '='...).
+                Only for daemons advertising the 'escaping' capability.
 
         Returns: str.
             The query string in the form "key1&key2=value2&key3=value3"
@@ -534,11 +1020,122 @@ class RamDaemonInterface( object ):
             if isinstance(arg, str):
                 if arg:
                     queryList.append(arg)
+            elif escape:
+                queryList.append( arg[0] + "=" + escapeValue(arg[1]) )
             else:
                 queryList.append( "=".join(arg) )
 
         return "&".join(queryList)
 
+    def __getList(self, objectType, replyKey, hydrate, query):
+        """Posts a query listing objects and builds them.
+
+        If hydrate is True, the daemon is asked to include the data of the objects in the list.
+        Daemons which don't support it only list the uuids: the data is then fetched with a single getDataBatch.
+        """
+
+        if hydrate and self._session.supports('hydrate'):
+            query = query + ( ('hydrate', '1'), )
+        # Changes received while the reply is in flight will invalidate its data
+        generation = self._subscription.generation()
+        reply = self.__post( query, 65536 )
+        content = self.checkReply(reply)
+        objs = content.get(replyKey, ())
+
+        if hydrate and objs and isinstance(objs[0], str):
+            datas = self.getDataBatch( objs )
+            objs = [ { "uuid": uuid, "data": datas.get(uuid, {}) } for uuid in objs ]
+
+        return self._registry.createList( objectType, objs, generation )
+
+    def __jsonList(self, values):
+        """Converts a list to a compact json string to be used as a query value"""
+        return jsonDumps( list(values), compact=True )
+
+    def __postMany(self, queries):
+        """Posts several queries and returns the list of the replies, in the same order.
+
+        If the daemon supports pipelining, the queries are sent back-to-back through the same connection
+        without waiting for the replies, which are then matched in order.
+        Otherwise they're sent one after the other, reusing the same pooled connection.
+
+        Returns: list of dict or None.
+        """
+
+        if len(queries) < 2 or not self._session.supports('pipelining'):
+            return [ self.__post( query, 65536 ) for query in queries ]
+
+        if not self._circuit.allow():
+            return [ None for query in queries ]
+
+        queryStrs = []
+        datas = []
+        for query in queries:
+            query = self.buildQuery( query, self._session.supports('escaping') )
+            log( query, LogLevel.DataSent)
+            queryStrs.append( query )
+            datas.append( self.__encodeQuery(query) )
+        readOnly = all( isReadQuery(query) for query in queryStrs )
+        if not readOnly:
+            self._coalescer.invalidate()
+
+        attempt = 0
+        while True:
+            if attempt > 0:
+                time.sleep( self._retryPolicy.delay(attempt - 1) )
+            acquired = self._limiter.acquire( self.__priority(queryStrs[0]), len(queries) )
+            start = time.perf_counter()
+            try:
+                objs, received = self.__exchangeMany( datas, readOnly )
+                break
+            except ValueError:
+                if self.__retryMany( queryStrs, attempt ):
+                    attempt = attempt + 1
+                    continue
+                self._circuit.success()
+                self.__recordMany( queryStrs, datas, start, 0, None, False )
+                return [ self.__invalidReply() for query in queries ]
+            except Exception as e: #pylint: disable=broad-except
+                if self.__retryMany( queryStrs, attempt ):
+                    attempt = attempt + 1
+                    continue
+                self.__recordMany( queryStrs, datas, start, 0, None, True )
+                self.__unreachable(e)
+                return [ None for query in queries ]
+            finally:
+                if acquired: self._limiter.release()
+
+        self._circuit.success()
+        self.__recordMany( queryStrs, datas, start, received, objs, False )
+        return [ self.__processReply(obj) for obj in objs ]
+
+    def __recordMany(self, queries, datas, start, received, replies, unreachable):
+        """Records pipelined queries; the time and received bytes are shared equally"""
+        duration = (time.perf_counter() - start) / len(queries)
+        received = received // len(queries)
+        for i, query in enumerate(queries):
+            if replies is None:
+                self.__record( query, start, duration, len(datas[i]), failed=True, unreachable=unreachable )
+            else:
+                self.__record( query, start, duration, len(datas[i]), received, replies[i], not self.__successful(replies[i]) )
+
+    def __record(self, query, start, duration, sent, received=0, reply=None, failed=False, unreachable=False):
+        """Records a query in the stats, and in the recording if there's one"""
+        self._stats.record( query, start, duration, sent, received, failed or unreachable )
+        recorder = self._recorder
+        if recorder is None:
+            return
+        if failed and reply is None and not unreachable:
+            # Invalid reply
+            reply = {
+                'accepted': False,
+                'success': False,
+                'message': "Invalid reply data from the Ramses Daemon.",
+                'query': query.partition('&')[0],
+                'content': None,
+                }
+        recorder.record( query, reply, start, duration, unreachable )
+
     def __post(self, query, bufsize = 0):
         """Posts a query and returns a dict corresponding to the json reply
         
@@ -546,57 +1143,241 @@ class RamDaemonInterface( object ):
             query: tuple.
                 The list of arguments, which are themselves 2-tuples of key-value pairs (value may be an empty string)
             bufsize: int.
-                The maximum amount of data to be received at once is specified by bufsize.
+                0 if no reply is expected.
+                Any other value means the reply is read until it's complete, whatever its size.
                 
         Returns: dict or None.
             The Daemon reply converted from json to a python dict.
             None if there is an error or the Daemon is unavailable.
         """
 
-        from .ramses import Ramses
+        query = self.buildQuery( query, self._session.supports('escaping') )
+
+        # Identical read queries posted at the same time by other threads share the same reply
+        if isReadQuery(query):
+            if bufsize != 0:
+                return self._coalescer.call( query, self.__postQuery, query, bufsize )
+        else:
+            # The reads in flight may reply without this write
+            self._coalescer.invalidate()
+        return self.__postQuery( query, bufsize )
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def __postQuery(self, query, bufsize):
+        """Posts a query string, see __post()"""
 
-        query = self.__buildQuery( query )
+        if not self._circuit.allow():
+            log( "The Ramses Daemon is offline, I'm not posting: " + query, LogLevel.DataSent)
+            return None
 
         log( query, LogLevel.DataSent)
 
-        try:
-            s.connect((self._address, self._port))
-        except Exception as e: #pylint: disable=broad-except
-            log("Daemon can't be reached", LogLevel.Debug)
-            log(str(e), LogLevel.Critical)
-            ramses = Ramses.instance()
-            ramses.disconnect()
-            return
-
-        s.sendall(query.encode('utf-8'))
+        data = self.__encodeQuery(query)
+        attempt = 0
+        while True:
+            if attempt > 0:
+                time.sleep( self._retryPolicy.delay(attempt - 1) )
+            acquired = self._limiter.acquire( self.__priority(query) )
+            start = time.perf_counter()
+            try:
+                obj, received = self.__exchange( data, bufsize != 0, isReadQuery(query) )
+                break
+            except ValueError:
+                if self.__retry( query, attempt ):
+                    attempt = attempt + 1
+                    continue
+                # The daemon is there, even if its reply is invalid
+                self._circuit.success()
+                self.__record( query, start, time.perf_counter() - start, len(data), failed=True )
+                return self.__invalidReply()
+            except Exception as e: #pylint: disable=broad-except
+                if self.__retry( query, attempt ):
+                    attempt = attempt + 1
+                    continue
+                self.__record( query, start, time.perf_counter() - start, len(data), unreachable=True )
+                self.__unreachable(e)
+                return
+            finally:
+                if acquired: self._limiter.release()
+
+        self._circuit.success()
 
         if bufsize == 0:
-            s.close()
+            self.__record( query, start, time.perf_counter() - start, len(data) )
             return None
 
-        data = s.recv(bufsize)
-        s.close()
+        self.__record( query, start, time.perf_counter() - start, len(data), received, obj, not self.__successful(obj) )
 
-        try:
-            obj = json.loads(data)
-        except:
-            log("Invalid reply data from the Ramses Daemon.", LogLevel.Critical)
-            obj = {
-                'accepted': False,
-                'success': False
-            }
-            return obj
+        return self.__processReply(obj)
+
+    def __retry(self, query, attempt):
+        """Checks if a failed query can be posted again, after the delay of the retry policy.
+
+        Returns: bool.
+        """
+        if not self._retryPolicy.canRetry( query, attempt ):
+            return False
+        # The daemon was already unreachable, don't make the probe wait
+        if self._circuit.state() != CircuitState.CLOSED:
+            return False
+        self._stats.recordRetry( query )
+        log( "Retrying: " + query, LogLevel.Debug )
+        return True
+
+    def __retryMany(self, queries, attempt):
+        """Like __retry(), for pipelined queries: they're retried only if they can all be retried"""
+        for query in queries:
+            if not self._retryPolicy.canRetry( query, attempt ):
+                return False
+        if self._circuit.state() != CircuitState.CLOSED:
+            return False
+        for query in queries:
+            self._stats.recordRetry( query )
+        log( "Retrying " + str(len(queries)) + " pipelined queries", LogLevel.Debug )
+        return True
+
+    def __priority(self, query):
+        """The default priority of a query, when the thread has not set one"""
+        if query.partition('&')[0] in BULK_QUERIES:
+            return QueryPriority.BULK
+        return QueryPriority.NORMAL
 
-        log (str(data), LogLevel.DataReceived )
+    def __encodeQuery(self, query):
+        """Encodes the query to be sent.
+
+        If the daemon supports framing, queries are prefixed with their length, and compressed if they're large
+        (see RamSettings.daemonCompressThreshold). Otherwise, if the daemon supports pipelining,
+        queries are terminated by a new line so it can split them."""
+        return encodeQuery( query, self._session )
+
+    def __processReply(self, obj):
+        """Logs the reply and checks if it's successful"""
+
+        log (str(obj), LogLevel.DataReceived )
 
         if not obj['accepted']: log("Unknown Ramses Daemon query: " + obj['query'], LogLevel.Critical)
         if not obj['success']: log("Warning: the Ramses Daemon could not reply to the query: " + obj['query'], LogLevel.Critical)       
+        # The user may have logged out, check it again with the next query
+        if not obj['accepted'] or not obj['success']: self._session.invalidate()
         if obj['message']: log(obj['message'], LogLevel.Debug)
 
         return obj
 
+    def __successful(self, obj):
+        return obj.get('accepted', False) and obj.get('success', False)
+
+    def __invalidReply(self):
+        log("Invalid reply data from the Ramses Daemon.", LogLevel.Critical)
+        obj = {
+            'accepted': False,
+            'success': False
+        }
+        return obj
+
+    def __unreachable(self, e):
+        """Opens the circuit when the daemon can't be reached; Ramses.online() is False until it replies again"""
+        log("Daemon can't be reached", LogLevel.Debug)
+        log(str(e), LogLevel.Critical)
+        self._session.invalidate()
+        self._circuit.failure()
+
+    def __exchange(self, data, readReply=True, resend=False):
+        """Sends the data through a pooled connection and reads the complete reply.
+
+        A reused connection may have been closed by the daemon in the meantime (idle connections are checked
+        before they're reused, but the daemon may close them at the same time):
+        in this case, if resend is True, the query is sent again through a new connection.
+        Other queries may have been processed by the daemon before it closed the connection,
+        they're left to the retry policy.
+
+        Args:
+            data: bytes.
+            readReply: bool.
+            resend: bool.
+                True if the query only reads data and can be sent again when a reused connection fails.
+
+        Returns: tuple.
+            The decoded reply (None if readReply is False), and the number of bytes received.
+
+        Raises:
+            OSError: If the daemon can't be reached.
+            ValueError: If the reply is incomplete or invalid.
+        """
+
+        while True:
+            connection = self._pool.acquire()
+            reused = connection.queryCount() > 0
+            try:
+                connection.send(data)
+                if not readReply:
+                    # We won't read the reply, the connection can't be reused
+                    self._pool.discard(connection, False)
+                    return None, 0
+                received = connection.bytesReceived()
+                reply = connection.readReply()
+                received = connection.bytesReceived() - received
+            except OSError:
+                self._pool.discard(connection)
+                if reused and resend: continue
+                raise
+            except ValueError:
+                self._pool.discard(connection, False)
+                raise
+
+            if reply is None:
+                # The daemon has closed the connection
+                self._pool.discard(connection)
+                if reused and resend: continue
+                raise ConnectionError("The Ramses Daemon closed the connection without replying.")
+
+            self._pool.release(connection)
+            return reply, received
+
+    def __exchangeMany(self, datas, resend=False):
+        """Sends the queries back-to-back through a pooled connection and reads all the replies, in the same order.
+
+        At most RamSettings.daemonPipelineDepth queries are sent ahead of the replies,
+        so that neither side blocks on full socket buffers.
+        Like __exchange(), the queries are sent again if a reused connection fails only if resend is True.
+
+        Returns: tuple.
+            The list of the decoded replies, and the number of bytes received.
+
+        Raises:
+            OSError: If the daemon can't be reached.
+            ValueError: If a reply is incomplete or invalid.
+        """
+
+        from .ram_settings import RamSettings
+        depth = max(1, RamSettings.instance().daemonPipelineDepth)
+
+        while True:
+            connection = self._pool.acquire()
+            reused = connection.queryCount() > 0
+            replies = []
+            sent = 0
+            received = connection.bytesReceived()
+            try:
+                while len(replies) < len(datas):
+                    if sent < len(datas) and sent - len(replies) < depth:
+                        end = min( len(datas), len(replies) + depth )
+                        connection.send( b''.join(datas[sent:end]) )
+                        sent = end
+                    reply = connection.readReply()
+                    if reply is None:
+                        raise ConnectionError("The Ramses Daemon closed the connection without replying.")
+                    replies.append(reply)
+            except OSError:
+                self._pool.discard(connection)
+                # These queries only read data, we can send everything again
+                if reused and resend and not replies: continue
+                raise
+            except ValueError:
+                self._pool.discard(connection, False)
+                raise
+
+            self._pool.release(connection)
+            return replies, connection.bytesReceived() - received
+
     def __testConnection(self):
         """Checks if the Ramses Daemon is available"""
 
@@ -619,6 +1400,15 @@ class RamDaemonInterface( object ):
         return False
 
     def __checkUser(self):
+        """Checks if there's a current user.
+
+        The user is cached in the session for a few seconds (see RamSettings.userCacheTimeout),
+        the daemon is pinged only if the cache has expired."""
+
+        userUuid = self._session.userUuid()
+        if userUuid is not None:
+            return True
+
         data = self.ping()
 
         if data is None:
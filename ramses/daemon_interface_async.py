@@ -0,0 +1,667 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import asyncio
+import time
+
+from .logger import log
+from .constants import CircuitState, LogLevel, Log, QueryPriority, StepType
+from .daemon_connection import RamReplyDecoder, READ_SIZE
+from .daemon_interface import RamDaemonInterface, BULK_QUERIES, batchChunks, encodeQuery, isReadQuery, setDataQuery
+from .daemon_transport import RamTcpTransport
+from .object_registry import RamObjectRegistry
+from .json_codec import jsonDumps
+
+class AsyncRamDaemonConnection( object ):
+    """A stream connected to the Ramses Daemon, used by AsyncRamDaemonInterface."""
+
+    def __init__(self, reader, writer):
+        """
+        Args:
+            reader: asyncio.StreamReader.
+            writer: asyncio.StreamWriter.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._queryCount = 0
+        self._bytesReceived = 0
+        self._buffer = bytearray()
+        self._decoder = RamReplyDecoder()
+
+    def queryCount(self):
+        """The number of queries already sent through this connection"""
+        return self._queryCount
+
+    def bytesReceived(self):
+        """The number of bytes received through this connection"""
+        return self._bytesReceived
+
+    async def send(self, data):
+        """Sends the bytes to the daemon"""
+        self._queryCount = self._queryCount + 1
+        self._writer.write(data)
+        await self._writer.drain()
+
+    def stale(self):
+        """Checks if an idle connection has been closed by the daemon, see RamDaemonConnection.stale()"""
+        return bool(self._buffer) or self._reader.at_eof()
+
+    async def readReply(self):
+        """Reads a complete JSON reply from the daemon.
+
+        Returns: dict or None.
+            None if the daemon has closed the connection before replying.
+
+        Raises: ValueError.
+            If the connection was closed before the reply was complete, or the reply is not valid JSON.
+        """
+        while True:
+            obj = self._decoder.decode(self._buffer)
+            if obj is not None:
+                return obj
+
+            chunk = await self._reader.read(READ_SIZE)
+            if not chunk:
+                if self._buffer.strip():
+                    self._buffer.clear()
+                    self._decoder.reset()
+                    raise ValueError("Incomplete reply from the Ramses Daemon.")
+                return None
+            self._bytesReceived = self._bytesReceived + len(chunk)
+            self._buffer += chunk
+
+    def close(self):
+        """Closes the stream"""
+        try:
+            self._writer.close()
+        except OSError:
+            pass
+
+class AsyncRamDaemonInterface( object ):
+    """An asyncio client for the Ramses Daemon, with the same methods as RamDaemonInterface as coroutines.
+
+    Use it to run many independent queries concurrently, for example with asyncio.gather().
+    At most maxConcurrency queries are sent at the same time, and connections are kept open to be reused.
+    The queries are limited and prioritized with the other queries of the process, see RamDaemonInterface.limiter().
+
+    Unlike RamDaemonInterface, this is not a singleton: asyncio streams belong to the event loop which created them,
+    so an instance must be created and used in the same event loop. It shares the current user cache
+    of the RamDaemonInterface session.
+
+        daemon = AsyncRamDaemonInterface()
+        datas = await asyncio.gather( *[ daemon.getData(uuid) for uuid in uuids ] )
+        await daemon.close()
+    """
+
+    def __init__(self, address=None, port=None, maxConcurrency=8):
+        """
+        Args:
+            address: str.
+                Connects through TCP to this address. If neither the address nor the port are set,
+                the transport used by RamDaemonInterface is used.
+            port: int.
+                Defaults to the port used by RamDaemonInterface.
+            maxConcurrency: int.
+                The maximum number of queries running at the same time, which is also the maximum number of connections.
+        """
+        from .ram_settings import RamSettings
+        settings = RamSettings.instance()
+        daemon = RamDaemonInterface.instance()
+
+        if address is None and port is None:
+            self._transport = daemon.transport()
+        else:
+            if address is None:
+                address = daemon.address()
+            if port is None:
+                port = daemon.port()
+            self._transport = RamTcpTransport( address, port )
+        self._semaphore = asyncio.Semaphore(maxConcurrency)
+        self._idle = []
+        self._keepAlive = settings.daemonKeepAlive
+        self._reuseWorks = False
+        self._session = daemon.session()
+        self._daemon = daemon
+        self._stats = daemon.stats()
+        self._circuit = daemon.circuitBreaker()
+        self._subscription = daemon.subscription()
+        self._limiter = daemon.limiter()
+        self._registry = RamObjectRegistry.instance()
+        # The ping checking the user, shared by all the queries waiting for it
+        self._pingTask = None
+
+    async def close(self):
+        """Closes all the connections"""
+        idle = self._idle
+        self._idle = []
+        for connection in idle:
+            connection.close()
+
+    async def online(self):
+        """Checks if the daemon is available"""
+        data = await self.ping()
+        if data is None:
+            return False
+        content = data.get('content')
+        if content is None:
+            return False
+        return content.get('ramses', '') in ("Ramses", "Ramses-Client")
+
+    async def ping(self):
+        """Gets the version and current user of the ramses daemon.
+
+        Returns: dict.
+        """
+        reply = await self.__post('ping')
+        if reply is None:
+            self._session.invalidate()
+        else:
+            self._session.update( reply.get('content') )
+        return reply
+
+    async def raiseWindow(self):
+        """Raises the Ramses Client application main window."""
+        await self.__post('raise', False)
+
+    async def getRamsesFolderPath(self):
+        """Gets the path of the main Ramses folder"""
+        reply = await self.__post( "getRamsesFolder" )
+        content = RamDaemonInterface.checkReply(reply)
+        return content.get("path", "")
+
+    async def getObjects( self, objectType ):
+        """Gets the list of the objects
+
+        Returns: list of RamObject.
+        """
+
+        if not await self.__checkUser():
+            self.__noUserReply('getObjects')
+            return []
+
+        # Changes received while the reply is in flight will invalidate its data
+        generation = self._subscription.generation()
+        reply = await self.__post( (
+            "getObjects",
+            ("type", objectType)
+            ) )
+        content = RamDaemonInterface.checkReply(reply)
+        return self._registry.createList( objectType, content.get("objects", ()), generation )
+
+    async def getProjects(self):
+        """Gets the list of the projects
+
+        Returns: list of RamProject.
+        """
+        if not await self.__checkUser():
+            self.__noUserReply('getProjects')
+            return ()
+
+        generation = self._subscription.generation()
+        reply = await self.__post( "getProjects" )
+        content = RamDaemonInterface.checkReply(reply)
+        return self._registry.createList( "RamProject", content.get("projects", ()), generation )
+
+    async def getShots(self, projectUuid, sequenceUuid="", hydrate=False):
+        """Gets the list of shots for this project"""
+        return await self.__getList( "RamShot", "getShots", "shots", hydrate,
+            ('projectUuid', projectUuid),
+            ('sequenceUuid', sequenceUuid) )
+
+    async def getAssetGroups(self, projectUuid, hydrate=False):
+        """Gets the list of asset groups for this project"""
+        return await self.__getList( "RamAssetGroup", "getAssetGroups", "assetGroups", hydrate,
+            ('projectUuid', projectUuid) )
+
+    async def getSequences(self, projectUuid, hydrate=False):
+        """Gets the list of sequences for this project"""
+        return await self.__getList( "RamSequence", "getSequences", "sequences", hydrate,
+            ('projectUuid', projectUuid) )
+
+    async def getAssets(self, projectUuid, groupUuid="", hydrate=False):
+        """Gets the list of assets for this project"""
+        return await self.__getList( "RamAsset", "getAssets", "assets", hydrate,
+            ('projectUuid', projectUuid),
+            ('groupUuid', groupUuid) )
+
+    async def getPipes(self, projectUuid, hydrate=False):
+        """Gets the list of pipes for this project"""
+        return await self.__getList( "RamPipe", "getPipes", "pipes", hydrate,
+            ('projectUuid', projectUuid) )
+
+    async def getSteps(self, projectUuid, stepType=StepType.ALL, hydrate=False):
+        """Gets the list of steps for this project"""
+        return await self.__getList( "RamStep", "getSteps", "steps", hydrate,
+            ('projectUuid', projectUuid),
+            ('type', stepType) )
+
+    async def getCurrentProject(self):
+        """Gets the current project
+
+        Returns: RamProject.
+        """
+        if not await self.__checkUser():
+            self.__noUserReply('getCurrentProject')
+            return None
+
+        generation = self._subscription.generation()
+        reply = await self.__post( "getCurrentProject" )
+        content = RamDaemonInterface.checkReply(reply)
+        uuid = content.get("uuid", "")
+        if uuid == "":
+            return None
+        return self._registry.create( "RamProject", uuid, content.get("data", {}), generation )
+
+    async def getCurrentUser(self):
+        """Gets the current user"""
+        content = RamDaemonInterface.checkReply( await self.ping() )
+        uuid =  content.get("userUuid", "")
+        if uuid == "":
+            return None
+        return self._registry.create( "RamUser", uuid )
+
+    async def setCurrentProject(self, projectUuid):
+        """Sets the current project.
+
+        Returns: dict.
+        """
+        if not await self.__checkUser(): return self.__noUserReply('setCurrentProject')
+        return await self.__post( (
+            "setCurrentProject",
+            ('uuid', projectUuid)
+            ) )
+
+    async def getData(self, uuid):
+        """Gets the data for a specific RamObject.
+
+        Returns: dict.
+        """
+        if not await self.__checkUser():
+            self.__noUserReply('getData')
+            return {}
+
+        reply = await self.__post( (
+            "getData",
+            ('uuid', uuid)
+            ) )
+        content = RamDaemonInterface.checkReply(reply)
+        return content.get("data", {})
+
+    async def setData(self, uuid, data, keys=None):
+        """Sets the data of a specific RamObject, see RamDaemonInterface.setData().
+
+        Returns: dict.
+        """
+        if not await self.__checkUser(): return self.__noUserReply('setData')
+        return await self.__post( setDataQuery( uuid, data, keys, self._session ) )
+
+    async def getPath(self, uuid):
+        """Gets the path for a specific RamObject.
+
+        Returns: str.
+        """
+        if not await self.__checkUser():
+            self.__noUserReply('getPath')
+            return ""
+
+        reply = await self.__post( (
+            "getPath",
+            ('uuid', uuid)
+            ) )
+        content = RamDaemonInterface.checkReply(reply)
+        return content.get("path", "")
+
+    async def uuidFromPath(self, path, type ):
+        """Gets the uuid of an Object using its path.
+
+        Returns: str.
+        """
+        if not await self.__checkUser():
+            self.__noUserReply('uuidFromPath')
+            return ""
+
+        reply = await self.__post( (
+            "uuidFromPath",
+            ('path', path),
+            ('type', type),
+            ) )
+        content = RamDaemonInterface.checkReply(reply)
+        return content.get("uuid", "")
+
+    async def getDataBatch(self, uuids):
+        """Gets the data for several RamObjects at once.
+
+        Uses the batch query if the daemon supports it, runs the getData queries concurrently otherwise.
+
+        Returns: dict.
+            The data (a dict) for each uuid.
+        """
+        uuids = list(uuids)
+        if not uuids:
+            return {}
+
+        if not await self.__checkUser():
+            self.__noUserReply('getDataBatch')
+            return {}
+
+        result = {}
+        if self._session.supports('getDataBatch'):
+            replies = await asyncio.gather( *[ self.__post( (
+                "getDataBatch",
+                ('uuids', jsonDumps(chunk, compact=True))
+                ) ) for chunk in batchChunks(uuids) ] )
+            for reply in replies:
+                content = RamDaemonInterface.checkReply(reply)
+                for obj in content.get("objects", ()):
+                    result[obj.get("uuid", "")] = obj.get("data", {})
+        else:
+            datas = await asyncio.gather( *[ self.getData(uuid) for uuid in uuids ] )
+            result = dict( zip(uuids, datas) )
+
+        for uuid in uuids:
+            if not uuid in result:
+                result[uuid] = {}
+        return result
+
+    async def getPathBatch(self, uuids):
+        """Gets the paths of several RamObjects at once.
+
+        Uses the batch query if the daemon supports it, runs the getPath queries concurrently otherwise.
+
+        Returns: dict.
+            The path (a str) for each uuid.
+        """
+        uuids = list(uuids)
+        if not uuids:
+            return {}
+
+        if not await self.__checkUser():
+            self.__noUserReply('getPathBatch')
+            return {}
+
+        result = {}
+        if self._session.supports('getPathBatch'):
+            replies = await asyncio.gather( *[ self.__post( (
+                "getPathBatch",
+                ('uuids', jsonDumps(chunk, compact=True))
+                ) ) for chunk in batchChunks(uuids) ] )
+            for reply in replies:
+                content = RamDaemonInterface.checkReply(reply)
+                result.update( content.get("paths", {}) )
+        else:
+            paths = await asyncio.gather( *[ self.getPath(uuid) for uuid in uuids ] )
+            result = dict( zip(uuids, paths) )
+
+        for uuid in uuids:
+            if not uuid in result:
+                result[uuid] = ""
+        return result
+
+    async def create(self, uuid, data, objectType):
+        """Creates a new object in the daemon"""
+        if not await self.__checkUser():
+            return self.__noUserReply('create')
+
+        if not isinstance(data, str):
+            data = jsonDumps(data, compact=True)
+
+        return await self.__post( (
+            "create",
+            ("uuid", uuid),
+            ('data', data),
+            ("type", objectType)
+            ) )
+
+    async def getStatus(self, itemUuid, stepUuid):
+        """Gets the status of an item & step"""
+
+        if not await self.__checkUser():
+            self.__noUserReply('getStatus')
+            return None
+
+        generation = self._subscription.generation()
+        reply = await self.__post( (
+            "getStatus",
+            ('itemUuid', itemUuid),
+            ('stepUuid', stepUuid)
+            ) )
+        content = RamDaemonInterface.checkReply(reply)
+        uuid = content.get("uuid", "")
+        if (uuid == ""):
+            return None
+        return self._registry.create( "RamStatus", uuid, content.get("data", {}), generation )
+
+    async def setStatusModifiedBy(self, uuid, userUuid = "current"):
+        """Sets the user who's modified the status.
+
+        If userUuid is 'current', it will be the current user in the Ramses Client
+        """
+        if not await self.__checkUser():
+            return self.__noUserReply('setStatusModifiedBy')
+
+        return await self.__post( (
+            "setStatusModifiedBy",
+            ('uuid', uuid),
+            ('userUuid', userUuid)
+            ) )
+
+    async def __getList(self, objectType, queryName, replyKey, hydrate, *args):
+        """Gets a list of objects, with their data if hydrate is True (see RamDaemonInterface.getShots())"""
+        if not await self.__checkUser():
+            self.__noUserReply(queryName)
+            return ()
+
+        if hydrate and self._session.supports('hydrate'):
+            args = args + ( ('hydrate', '1'), )
+        generation = self._subscription.generation()
+        reply = await self.__post( (queryName,) + args )
+        content = RamDaemonInterface.checkReply(reply)
+        objs = content.get(replyKey, ())
+
+        if hydrate and objs and isinstance(objs[0], str):
+            datas = await self.getDataBatch( objs )
+            objs = [ { "uuid": uuid, "data": datas.get(uuid, {}) } for uuid in objs ]
+
+        return self._registry.createList( objectType, objs, generation )
+
+    async def __checkUser(self):
+        """Checks if there's a current user, using the cache of the session if it's recent enough.
+
+        Concurrent checks share the same ping."""
+        if self._session.userUuid() is not None:
+            return True
+
+        if self._pingTask is None:
+            self._pingTask = asyncio.ensure_future( self.ping() )
+            self._pingTask.add_done_callback( self.__pingDone )
+        data = await asyncio.shield( self._pingTask )
+        if data is None:
+            return False
+        content = data.get('content')
+        if content is None:
+            return False
+        return content.get('userUuid', "") != ""
+
+    def __pingDone(self, task):
+        self._pingTask = None
+
+    def __noUserReply(self, query):
+        log( Log.NoUser, LogLevel.Debug)
+        return {
+            'accepted': False,
+            'success': False,
+            'message': Log.NoUser,
+            'query': query,
+            'content': None
+        }
+
+    async def __post(self, query, readReply=True):
+        """Posts a query and returns a dict corresponding to the json reply
+
+        Returns: dict or None.
+            The Daemon reply converted from json to a python dict.
+            None if there is an error or the Daemon is unavailable.
+        """
+        query = RamDaemonInterface.buildQuery( query, self._session.supports('escaping') )
+        if not isReadQuery(query):
+            # The reads in flight in other threads may reply without this write
+            self._daemon.coalescer().invalidate()
+
+        if not self._circuit.allow():
+            log( "The Ramses Daemon is offline, I'm not posting: " + query, LogLevel.DataSent)
+            return None
+
+        log( query, LogLevel.DataSent)
+
+        data = encodeQuery( query, self._session )
+        # Transient failures of the read queries are retried, see RamDaemonInterface.retryPolicy()
+        retryPolicy = self._daemon.retryPolicy()
+        attempt = 0
+        while True:
+            if attempt > 0:
+                await asyncio.sleep( retryPolicy.delay(attempt - 1) )
+            async with self._semaphore:
+                acquired = await self._limiter.acquireAsync( self.__priority(query) )
+                start = time.perf_counter()
+                try:
+                    obj, received = await self.__exchange( data, readReply, isReadQuery(query) )
+                    break
+                except ValueError:
+                    if self.__retry( query, attempt ):
+                        attempt = attempt + 1
+                        continue
+                    self._circuit.success()
+                    invalidReply = {
+                        'accepted': False,
+                        'success': False
+                    }
+                    self.__record( query, start, len(data), 0, invalidReply, True )
+                    log("Invalid reply data from the Ramses Daemon.", LogLevel.Critical)
+                    return invalidReply
+                except Exception as e: #pylint: disable=broad-except
+                    if self.__retry( query, attempt ):
+                        attempt = attempt + 1
+                        continue
+                    self.__record( query, start, len(data), 0, None, True, True )
+                    log("Daemon can't be reached", LogLevel.Debug)
+                    log(str(e), LogLevel.Critical)
+                    self._session.invalidate()
+                    self._circuit.failure()
+                    return None
+                finally:
+                    if acquired: self._limiter.release()
+
+        self._circuit.success()
+        failed = readReply and not (obj['accepted'] and obj['success'])
+        self.__record( query, start, len(data), received, obj, failed )
+
+        if not readReply:
+            return None
+
+        log (str(obj), LogLevel.DataReceived )
+
+        if not obj['accepted']: log("Unknown Ramses Daemon query: " + obj['query'], LogLevel.Critical)
+        if not obj['success']: log("Warning: the Ramses Daemon could not reply to the query: " + obj['query'], LogLevel.Critical)
+        if not obj['accepted'] or not obj['success']: self._session.invalidate()
+        if obj['message']: log(obj['message'], LogLevel.Debug)
+
+        return obj
+
+    def __priority(self, query):
+        """The default priority of a query, see RamDaemonInterface.limiter()"""
+        if query.partition('&')[0] in BULK_QUERIES:
+            return QueryPriority.BULK
+        return QueryPriority.NORMAL
+
+    def __retry(self, query, attempt):
+        """Checks if a failed query can be posted again"""
+        if not self._daemon.retryPolicy().canRetry( query, attempt ):
+            return False
+        if self._circuit.state() != CircuitState.CLOSED:
+            return False
+        self._stats.recordRetry( query )
+        log( "Retrying: " + query, LogLevel.Debug )
+        return True
+
+    def __record(self, query, start, sent, received, reply, failed, unreachable=False):
+        """Records a query in the stats, and in the recording of RamDaemonInterface if there's one"""
+        duration = time.perf_counter() - start
+        self._stats.record( query, start, duration, sent, received, failed )
+        recorder = self._daemon.recorder()
+        if recorder is not None:
+            recorder.record( query, reply, start, duration, unreachable )
+
+    async def __exchange(self, data, readReply, resend):
+        """Sends the data through an idle or new connection and reads the complete reply.
+
+        A reused connection may have been closed by the daemon in the meantime:
+        in this case, if resend is True, the query is sent again through a new connection,
+        see RamDaemonInterface.__exchange().
+
+        Returns: tuple.
+            The decoded reply (None if readReply is False), and the number of bytes received.
+        """
+        while True:
+            if self._idle:
+                connection = self._idle.pop()
+                if connection.stale():
+                    # Closed after its first query: the daemon may not keep connections alive
+                    connection.close()
+                    if not self._reuseWorks:
+                        self._keepAlive = False
+                    continue
+            else:
+                reader, writer = await self._transport.connectAsync()
+                connection = AsyncRamDaemonConnection(reader, writer)
+            reused = connection.queryCount() > 0
+
+            try:
+                await connection.send(data)
+                if not readReply:
+                    connection.close()
+                    return None, 0
+                received = connection.bytesReceived()
+                reply = await connection.readReply()
+                received = connection.bytesReceived() - received
+            except OSError:
+                self.__discard(connection)
+                if reused and resend: continue
+                raise
+            except ValueError:
+                connection.close()
+                raise
+
+            if reply is None:
+                self.__discard(connection)
+                if reused and resend: continue
+                raise ConnectionError("The Ramses Daemon closed the connection without replying.")
+
+            if reused:
+                self._reuseWorks = True
+            if self._keepAlive:
+                self._idle.append(connection)
+            else:
+                connection.close()
+            return reply, received
+
+    def __discard(self, connection):
+        """Closes a failed connection; turns off keep-alive if the daemon never accepted to reuse a connection"""
+        connection.close()
+        if connection.queryCount() > 1 and not self._reuseWorks:
+            self._keepAlive = False
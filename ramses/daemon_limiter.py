@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import functools
+
+from .constants import QueryPriority
+
+# The time in seconds between two checks of an asyncio query waiting for a slot
+ASYNC_POLL_INTERVAL = 0.005
+
+class RamDaemonLimiter( object ):
+    """Limits the load put on the Ramses Daemon by this process, so that many processes
+    (like the tasks of a render farm) can't freeze the Ramses Client.
+
+    - The rate is limited with a token bucket: a query needs a token, and the tokens are refilled
+      at the given rate, up to burst tokens. A short burst of queries is not delayed.
+    - The number of queries waiting for their reply at the same time is capped.
+
+    Queries which can't be posted right away wait in a queue, and are served in priority order (see QueryPriority),
+    then in the order they were queued. The priority is set for the current thread with prioritize().
+    With a rate of 0 and no cap, queries are never delayed. This class is thread-safe.
+    """
+
+    def __init__(self, rate=0.0, burst=10, maxInFlight=0):
+        """
+        Args:
+            rate: float.
+                The maximum number of queries per second, 0 for no limit.
+            burst: int.
+                The number of queries which can be posted at once before the rate is limited.
+            maxInFlight: int.
+                The maximum number of queries waiting for their reply at the same time, 0 for no limit.
+        """
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._queue = []
+        self._counter = itertools.count()
+        self._inFlight = 0
+        self._waitCount = 0
+        self._waitTime = 0
+        self.setLimits(rate, burst, maxInFlight)
+
+    def setLimits(self, rate=0.0, burst=10, maxInFlight=0):
+        """Changes the limits, see __init__()"""
+        with self._condition:
+            self._rate = rate
+            self._burst = max(1, burst)
+            self._maxInFlight = maxInFlight
+            self._tokens = self._burst
+            self._refillTime = time.monotonic()
+            self._condition.notify_all()
+
+    def enabled(self):
+        """True if queries may be delayed"""
+        return self._rate > 0 or self._maxInFlight > 0
+
+    def rate(self):
+        """The maximum number of queries per second, 0 for no limit"""
+        return self._rate
+
+    def maxInFlight(self):
+        """The maximum number of queries waiting for their reply at the same time, 0 for no limit"""
+        return self._maxInFlight
+
+    def inFlight(self):
+        """The number of queries currently waiting for their reply"""
+        return self._inFlight
+
+    def priority(self, default=QueryPriority.NORMAL):
+        """The priority set for the current thread with prioritize(), or the default one"""
+        return getattr(self._local, 'priority', default)
+
+    def prioritize(self, priority):
+        """Sets the priority of the queries posted by the current thread:
+
+            with DAEMON.limiter().prioritize( QueryPriority.BULK ):
+                ...
+
+        Returns: RamDaemonPriority.
+        """
+        return RamDaemonPriority(self, priority)
+
+    def acquire(self, priority=QueryPriority.NORMAL, cost=1):
+        """Waits until a query can be posted. Each successful call must be followed by a call to release().
+
+        Args:
+            priority: int.
+                One of QueryPriority, used if no priority is set for the current thread.
+            cost: int.
+                The number of queries posted at once, through a pipeline.
+
+        Returns: bool.
+            False if the limiter is disabled, then release() must not be called.
+        """
+        if not self.enabled():
+            return False
+
+        priority = self.priority(priority)
+        with self._condition:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._queue, ticket)
+            start = None
+            while True:
+                acquired, timeout = self.__take(ticket, cost, start)
+                if acquired:
+                    return True
+                if start is None:
+                    start = time.perf_counter()
+                self._condition.wait(timeout)
+
+    async def acquireAsync(self, priority=QueryPriority.NORMAL, cost=1):
+        """Like acquire(), for the asyncio queries: waits without blocking the event loop.
+        The asyncio queries share the queue of the other threads.
+
+        Returns: bool.
+            False if the limiter is disabled, then release() must not be called.
+        """
+        if not self.enabled():
+            return False
+
+        priority = self.priority(priority)
+        with self._condition:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._queue, ticket)
+        start = None
+        try:
+            while True:
+                with self._condition:
+                    acquired, timeout = self.__take(ticket, cost, start)
+                if acquired:
+                    return True
+                if start is None:
+                    start = time.perf_counter()
+                # The coroutine can't be notified by the other threads, check again regularly
+                if timeout is None:
+                    timeout = ASYNC_POLL_INTERVAL
+                await asyncio.sleep( timeout )
+        except BaseException:
+            # Cancelled: don't block the queue
+            with self._condition:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._condition.notify_all()
+            raise
+
+    def release(self):
+        """Reports a query acquired with acquire() has got its reply"""
+        with self._condition:
+            self._inFlight = max(0, self._inFlight - 1)
+            self._condition.notify_all()
+
+    def waitCount(self):
+        """The number of queries which have been delayed since the last reset"""
+        return self._waitCount
+
+    def waitTime(self):
+        """The total time in seconds queries have been delayed since the last reset"""
+        return self._waitTime
+
+    def resetCounters(self):
+        """Resets waitCount() and waitTime()"""
+        with self._condition:
+            self._waitCount = 0
+            self._waitTime = 0
+
+    def _setPriority(self, priority):
+        """Sets the priority of the current thread, returns the previous one"""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        return previous
+
+    def _resetPriority(self, previous):
+        if previous is None:
+            del self._local.priority
+        else:
+            self._local.priority = previous
+
+    def __take(self, ticket, cost, start):
+        """Takes a slot and the tokens if it's the turn of the ticket and they're available.
+        Must be called with the condition locked.
+
+        Returns: tuple.
+            True if they're taken, and the time to wait for the tokens (None to wait for the turn or a slot).
+        """
+        if self._queue[0] != ticket:
+            return False, None
+        self.__refill()
+        # A pipeline larger than the bucket only has to wait for a full bucket
+        needed = min(cost, self._burst)
+        slotAvailable = self._maxInFlight <= 0 or self._inFlight < self._maxInFlight
+        tokenAvailable = self._rate <= 0 or self._tokens >= needed
+        if slotAvailable and tokenAvailable:
+            heapq.heappop(self._queue)
+            if self._rate > 0:
+                self._tokens = self._tokens - needed
+            self._inFlight = self._inFlight + 1
+            if start is not None:
+                self._waitCount = self._waitCount + 1
+                self._waitTime = self._waitTime + time.perf_counter() - start
+            # The next one in the queue may be able to go too
+            self._condition.notify_all()
+            return True, None
+        if slotAvailable:
+            return False, (needed - self._tokens) / self._rate
+        return False, None
+
+    def __refill(self):
+        if self._rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min( self._burst, self._tokens + (now - self._refillTime) * self._rate )
+        self._refillTime = now
+
+class RamDaemonPriority( object ):
+    """Sets the priority of the queries posted by the current thread in a with block, see RamDaemonLimiter.prioritize()"""
+
+    def __init__(self, limiter, priority):
+        self._limiter = limiter
+        self._priority = priority
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self._limiter._setPriority( self._priority )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._limiter._resetPriority( self._previous )
+
+def interactive( method ):
+    """Decorates the methods run by the user, so that their queries are posted before the background ones
+    when the daemon load is limited"""
+    @functools.wraps(method)
+    def interactiveMethod(*args, **kwargs):
+        from .daemon_interface import RamDaemonInterface
+        with RamDaemonInterface.instance().limiter().prioritize( QueryPriority.INTERACTIVE ):
+            return method(*args, **kwargs)
+    return interactiveMethod
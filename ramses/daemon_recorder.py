@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import json
+import time
+import threading
+
+class RamDaemonRecorder( object ):
+    """Writes all the queries posted to the daemon and their replies to a JSON Lines file,
+    to replay them later without a daemon with a RamReplayTransport.
+
+    Each line is a JSON object: query (str), reply (dict, or null if no reply was read),
+    start (seconds since the beginning of the recording), duration (seconds)
+    and failed (true if the daemon could not be reached).
+    This class is thread-safe.
+    """
+
+    def __init__(self, filePath):
+        """
+        Args:
+            filePath: str.
+                The file is overwritten.
+        """
+        self._filePath = filePath
+        self._file = open(filePath, 'w', encoding="utf8")
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._count = 0
+
+    def filePath(self):
+        """The path of the recording"""
+        return self._filePath
+
+    def count(self):
+        """The number of queries recorded"""
+        return self._count
+
+    def record(self, query, reply, start, duration, failed=False):
+        """Records a query and its reply.
+
+        Args:
+            query: str.
+            reply: dict or None.
+            start: float.
+                The time.perf_counter() when the query was posted.
+            duration: float.
+                The time in seconds before the reply was received.
+            failed: bool.
+                True if the daemon could not be reached.
+        """
+        line = json.dumps( {
+            'query': query,
+            'reply': reply,
+            'start': start - self._start,
+            'duration': duration,
+            'failed': failed,
+            } ) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._count = self._count + 1
+
+    def close(self):
+        """Stops recording and closes the file"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+
+def loadRecording( filePath ):
+    """Reads a recording written by RamDaemonRecorder.
+
+    Returns: list of dict.
+    """
+    entries = []
+    with open(filePath, 'r', encoding="utf8") as recordFile:
+        for line in recordFile:
+            line = line.strip()
+            if line:
+                entries.append( json.loads(line) )
+    return entries
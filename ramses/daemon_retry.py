@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import random
+
+class RamDaemonRetryPolicy( object ):
+    """Decides when a query which failed because of a dropped connection or an incomplete reply is posted again.
+
+    Only the queries which can safely be posted twice (the read queries) are retried;
+    queries changing the data, like create or setData, are never retried.
+    The delay before each retry is random, up to a maximum which doubles after each try ("full jitter"),
+    so that many clients failing at the same time don't all retry at the same time.
+    """
+
+    def __init__(self, retries=2, delay=0.05, maxDelay=1.0, idempotentQueries=()):
+        """
+        Args:
+            retries: int.
+                The maximum number of retries of a query, 0 to disable retries.
+            delay: float.
+                The maximum delay in seconds before the first retry.
+            maxDelay: float.
+                The maximum delay in seconds before any retry.
+            idempotentQueries: iterable of str.
+                The names of the queries which can be retried.
+        """
+        self._retries = retries
+        self._delay = delay
+        self._maxDelay = maxDelay
+        self._idempotentQueries = frozenset(idempotentQueries)
+
+    def retries(self):
+        """The maximum number of retries of a query"""
+        return self._retries
+
+    def setRetries(self, retries):
+        """Sets the maximum number of retries of a query, 0 to disable retries"""
+        self._retries = retries
+
+    def canRetry(self, query, attempt):
+        """Checks if a query can be posted again.
+
+        Args:
+            query: str.
+            attempt: int.
+                The number of retries already done.
+        """
+        if attempt >= self._retries:
+            return False
+        return query.partition('&')[0] in self._idempotentQueries
+
+    def delay(self, attempt):
+        """The time in seconds to wait before the given retry (starting at 0)"""
+        return random.uniform( 0, min( self._maxDelay, self._delay * (2 ** attempt) ) )
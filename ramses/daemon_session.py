@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import time
+import threading
+
+class RamDaemonSession( object ):
+    """The state of the session with the Ramses Daemon, as known from its last ping reply.
+
+    The logged in user is cached for a given timeout, so that queries don't need to ping the daemon first
+    to check there's a current user. The cache is invalidated as soon as a reply from the daemon fails.
+
+    The session also keeps the list of the optional capabilities the daemon advertises in its ping replies
+    (batch queries...). Older daemons don't advertise any, in which case the API falls back to standard queries.
+    This class is thread-safe.
+    """
+
+    def __init__(self, timeout=10.0):
+        """
+        Args:
+            timeout: float.
+                The time in seconds during which the current user is cached. 0 to disable the cache.
+        """
+        self._timeout = timeout
+        self._userUuid = ""
+        self._updateTime = 0
+        self._capabilities = ()
+        self._lock = threading.Lock()
+        self._checkCount = 0
+        self._pingCount = 0
+
+    def timeout(self):
+        """The time in seconds during which the current user is cached"""
+        return self._timeout
+
+    def setTimeout(self, timeout):
+        """Sets the time in seconds during which the current user is cached. 0 to disable the cache."""
+        self._timeout = timeout
+
+    def userUuid(self):
+        """The uuid of the current user if it's been checked recently.
+
+        Returns: str or None.
+            None if the user has to be checked again.
+        """
+        with self._lock:
+            self._checkCount = self._checkCount + 1
+            if self._userUuid == "":
+                return None
+            if time.time() - self._updateTime >= self._timeout:
+                return None
+            return self._userUuid
+
+    def update(self, content):
+        """Updates the session from the content of a ping reply"""
+        if content is None:
+            self.invalidate()
+            return
+        with self._lock:
+            self._pingCount = self._pingCount + 1
+            self._userUuid = content.get('userUuid', "")
+            self._updateTime = time.time()
+            self._capabilities = tuple(content.get('capabilities', ()))
+
+    def invalidate(self):
+        """Forgets the current user, it will be checked again with the next query"""
+        with self._lock:
+            self._userUuid = ""
+            self._updateTime = 0
+
+    def reset(self):
+        """Forgets the current user and the capabilities, when connecting to another daemon"""
+        with self._lock:
+            self._userUuid = ""
+            self._updateTime = 0
+            self._capabilities = ()
+
+    def capabilities(self):
+        """The optional capabilities advertised by the daemon in its last ping reply
+
+        Returns: tuple of str.
+        """
+        return self._capabilities
+
+    def supports(self, capability):
+        """Checks if the daemon has advertised the given capability"""
+        return capability in self._capabilities
+
+    def checkCount(self):
+        """The number of times the current user has been checked since the last reset"""
+        return self._checkCount
+
+    def pingCount(self):
+        """The number of ping replies received since the last reset"""
+        return self._pingCount
+
+    def resetCounters(self):
+        """Resets checkCount() and pingCount()"""
+        with self._lock:
+            self._checkCount = 0
+            self._pingCount = 0
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import json
+import time
+import bisect
+import threading
+
+from .logger import log
+from .constants import LogLevel
+
+# Upper bounds of the latency histogram buckets, in seconds. The last bucket gets everything slower.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RamDaemonTrace( object ):
+    """The list of the queries posted to the daemon during a RamDaemonStats.trace() block"""
+
+    def __init__(self, allThreads=False):
+        self._thread = None if allThreads else threading.current_thread()
+        self._queries = []
+        self._start = time.perf_counter()
+        self._end = None
+
+    def _record(self, query, start, duration, bytesSent, bytesReceived, failed):
+        if self._thread is not None and self._thread is not threading.current_thread():
+            return
+        self._queries.append( {
+            'query': query,
+            'start': start - self._start,
+            'duration': duration,
+            'bytesSent': bytesSent,
+            'bytesReceived': bytesReceived,
+            'failed': failed,
+            } )
+
+    def _stop(self):
+        self._end = time.perf_counter()
+
+    def queries(self):
+        """The queries, in the order they were posted.
+
+        Returns: list of dict.
+            query, start (relative to the beginning of the trace), duration, bytesSent, bytesReceived, failed
+        """
+        return list(self._queries)
+
+    def queryCount(self):
+        """The number of queries"""
+        return len(self._queries)
+
+    def totalTime(self):
+        """The time spent waiting for the daemon, in seconds"""
+        return sum( q['duration'] for q in self._queries )
+
+    def elapsed(self):
+        """The duration of the trace, in seconds"""
+        end = self._end
+        if end is None:
+            end = time.perf_counter()
+        return end - self._start
+
+    def counts(self):
+        """The number of queries by query name
+
+        Returns: dict.
+        """
+        counts = {}
+        for q in self._queries:
+            name = q['query'].partition('&')[0]
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+class RamDaemonStats( object ):
+    """Records the number, latency, size and failures of the queries posted to the daemon, by query name.
+    This class is thread-safe.
+
+        stats = RamDaemonInterface.instance().stats()
+        with stats.trace() as trace:
+            Ramses.instance().saveFile( filePath )
+        print( trace.counts() )
+        print( stats.report() )
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._traces = []
+
+    def record(self, query, start, duration, bytesSent=0, bytesReceived=0, failed=False):
+        """Records a query.
+
+        Args:
+            query: str.
+                The query string; its name is the first argument.
+            start: float.
+                The time.perf_counter() when the query was posted.
+            duration: float.
+                The time in seconds before the reply was received.
+        """
+        name = query.partition('&')[0]
+        with self._lock:
+            entry = self.__entry(name)
+            if entry['count'] == 0:
+                entry['minTime'] = duration
+                entry['maxTime'] = duration
+            entry['count'] += 1
+            if failed:
+                entry['failures'] += 1
+            entry['totalTime'] += duration
+            entry['minTime'] = min(entry['minTime'], duration)
+            entry['maxTime'] = max(entry['maxTime'], duration)
+            entry['bytesSent'] += bytesSent
+            entry['bytesReceived'] += bytesReceived
+            entry['histogram'][ bisect.bisect_left(LATENCY_BUCKETS, duration) ] += 1
+            traces = list(self._traces)
+
+        for trace in traces:
+            trace._record(query, start, duration, bytesSent, bytesReceived, failed)
+
+    def recordRetry(self, query):
+        """Records a query posted again after a transient failure"""
+        name = query.partition('&')[0]
+        with self._lock:
+            entry = self.__entry(name)
+            entry['retries'] += 1
+
+    def report(self):
+        """A snapshot of the statistics.
+
+        Returns: dict.
+            'queries': the statistics by query name (count, failures, retries, totalTime, minTime, maxTime, meanTime,
+                bytesSent, bytesReceived, histogram), 'latencyBuckets': the upper bounds of the histogram buckets,
+            and the totals: 'count', 'failures', 'retries', 'totalTime', 'bytesSent', 'bytesReceived'.
+        """
+        with self._lock:
+            queries = {}
+            for name, entry in self._queries.items():
+                entry = dict(entry)
+                entry['histogram'] = list(entry['histogram'])
+                entry['meanTime'] = entry['totalTime'] / max(1, entry['count'])
+                queries[name] = entry
+
+        report = {
+            'queries': queries,
+            'latencyBuckets': list(LATENCY_BUCKETS),
+            }
+        for key in ('count', 'failures', 'retries', 'totalTime', 'bytesSent', 'bytesReceived'):
+            report[key] = sum( entry[key] for entry in queries.values() )
+        return report
+
+    def count(self, queryName=None):
+        """The number of queries posted since the last reset, with the given name or in total"""
+        with self._lock:
+            if queryName is None:
+                return sum( entry['count'] for entry in self._queries.values() )
+            entry = self._queries.get(queryName)
+            if entry is None:
+                return 0
+            return entry['count']
+
+    def retryCount(self, queryName=None):
+        """The number of retries since the last reset, for the given query name or in total"""
+        with self._lock:
+            if queryName is None:
+                return sum( entry['retries'] for entry in self._queries.values() )
+            entry = self._queries.get(queryName)
+            if entry is None:
+                return 0
+            return entry['retries']
+
+    def reset(self):
+        """Clears all the statistics"""
+        with self._lock:
+            self._queries = {}
+
+    def trace(self, allThreads=False):
+        """A context manager recording all the queries posted during the block.
+
+        Args:
+            allThreads: bool.
+                By default, only the queries posted by the current thread are recorded.
+
+        Returns: context manager.
+            Its value is the RamDaemonTrace.
+        """
+        return RamDaemonStatsTrace(self, allThreads)
+
+    def dump(self, filePath):
+        """Writes the report to a JSON file"""
+        with open(filePath, 'w', encoding="utf8") as statsFile:
+            statsFile.write( json.dumps( self.report(), indent=4 ) )
+
+    def dumpAtExit(self):
+        """Writes the report to RamSettings.daemonStatsFile, if it's set. Registered to run at exit."""
+        from .ram_settings import RamSettings
+        filePath = RamSettings.instance().daemonStatsFile
+        if filePath == "":
+            return
+        try:
+            self.dump(filePath)
+        except OSError as e:
+            log("I can't write the daemon statistics to " + filePath + ": " + str(e), LogLevel.Critical)
+
+    def __entry(self, name):
+        """The statistics of a query name, created if needed; the lock must be held"""
+        entry = self._queries.get(name)
+        if entry is None:
+            entry = {
+                'count': 0,
+                'failures': 0,
+                'retries': 0,
+                'totalTime': 0.0,
+                'minTime': 0.0,
+                'maxTime': 0.0,
+                'bytesSent': 0,
+                'bytesReceived': 0,
+                'histogram': [0] * (len(LATENCY_BUCKETS) + 1),
+                }
+            self._queries[name] = entry
+        return entry
+
+    def _addTrace(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def _removeTrace(self, trace):
+        with self._lock:
+            self._traces.remove(trace)
+
+class RamDaemonStatsTrace( object ):
+    """The context manager returned by RamDaemonStats.trace()"""
+
+    def __init__(self, stats, allThreads):
+        self._stats = stats
+        self._trace = RamDaemonTrace(allThreads)
+
+    def __enter__(self):
+        self._stats._addTrace(self._trace)
+        return self._trace
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._trace._stop()
+        self._stats._removeTrace(self._trace)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import threading
+
+from .logger import log
+from .constants import LogLevel
+from .daemon_connection import RamDaemonConnection
+
+class RamDaemonSubscription( object ):
+    """Keeps track of the objects changed in the Ramses Daemon, so that their cached data can be kept
+    until they change instead of being fetched again after a timeout.
+
+    If the daemon advertises the 'subscribe' capability, a dedicated connection is kept open
+    and the daemon pushes an objectChanged event each time an object changes.
+    Otherwise, if it advertises 'getChanges', the daemon is polled for the modification stamps
+    of the objects changed since the last poll.
+    With older daemons the subscription is never active, and the objects use their cache timeout.
+
+    Each change increments a generation number: an object keeps the generation of its data when it gets it,
+    and its cache is valid as long as tracks() is True and changed() is False.
+    Changes may have been missed before the subscription became active: data got before that
+    is only valid until its cache timeout.
+    This class is thread-safe.
+    """
+
+    def __init__(self, daemon, enabled=True, pollInterval=1.0, retryDelay=1.0, maxRetryDelay=30.0):
+        """
+        Args:
+            daemon: RamDaemonInterface.
+            enabled: bool.
+                If False, the subscription is never started.
+            pollInterval: float.
+                The time in seconds between two polls when the daemon can't push changes. 0 to disable polling.
+            retryDelay: float.
+                The time in seconds before connecting again when the subscription is lost, doubled after each failure.
+            maxRetryDelay: float.
+                The maximum time in seconds before connecting again.
+        """
+        self._daemon = daemon
+        self._enabled = enabled
+        self._pollInterval = pollInterval
+        self._retryDelay = retryDelay
+        self._maxRetryDelay = maxRetryDelay
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._connection = None
+        self._mode = ""
+        self._active = False
+        self._generation = 0
+        self._resetGeneration = 0
+        self._changed = {}
+        self._callbacks = []
+        self._eventCount = 0
+
+    def start(self):
+        """Starts following the changes, if the daemon supports it.
+        Called each time the daemon is pinged; does nothing if the subscription is already running."""
+        if not self._enabled:
+            return
+        session = self._daemon.session()
+        if session.supports('subscribe'):
+            mode = 'push'
+        elif session.supports('getChanges') and self._pollInterval > 0:
+            mode = 'poll'
+        else:
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._mode = mode
+            self._stopped.clear()
+            if mode == 'push':
+                target = self.__listen
+            else:
+                target = self.__poll
+            self._thread = threading.Thread( target=target, name="RamDaemonSubscription", daemon=True )
+            self._thread.start()
+        log("Following the changes of the Ramses Daemon (" + mode + ").", LogLevel.Debug)
+
+    def stop(self):
+        """Stops following the changes, the objects use their cache timeout again"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._stopped.set()
+            connection = self._connection
+        if connection is not None:
+            # Interrupts the blocking read
+            connection.shutdown()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.__setActive(False)
+
+    def enabled(self):
+        """True if the subscription is started when the daemon supports it"""
+        return self._enabled
+
+    def setEnabled(self, enabled=True):
+        """Enables or disables the subscription. When disabled, the objects always use their cache timeout."""
+        self._enabled = enabled
+        if enabled:
+            self.start()
+        else:
+            self.stop()
+
+    def active(self):
+        """True if the changes are currently received: cached data is valid until changed() is True"""
+        return self._active
+
+    def mode(self):
+        """How the changes are received: 'push', 'poll', or an empty string if the subscription has never started"""
+        return self._mode
+
+    def generation(self):
+        """The current generation. Get it before getting the data of an object, and keep it with the data.
+
+        Returns: int.
+        """
+        return self._generation
+
+    def tracks(self, generation):
+        """Checks if all the changes since the given generation are known:
+        the subscription is active, and has been since that generation"""
+        return self._active and generation >= self._resetGeneration
+
+    def changed(self, uuid, generation):
+        """Checks if the object has changed since the given generation.
+        The changes are forgotten when the objects stop being tracked (see invalidateAll()):
+        data older than that is considered changed."""
+        if generation < self._resetGeneration:
+            return True
+        return self._changed.get(uuid, 0) > generation
+
+    def objectChanged(self, uuid):
+        """Invalidates the cached data of an object"""
+        with self._lock:
+            self._generation = self._generation + 1
+            self._changed[uuid] = self._generation
+            self._eventCount = self._eventCount + 1
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(uuid)
+            except Exception as e: #pylint: disable=broad-except
+                log("A subscription callback failed: " + str(e), LogLevel.Critical)
+
+    def invalidateAll(self):
+        """Stops tracking the cached data of all the objects, they'll use their cache timeout until they're updated"""
+        with self._lock:
+            self._generation = self._generation + 1
+            self._resetGeneration = self._generation
+            # Only the changes since this generation are needed, don't keep the others forever
+            self._changed = {}
+
+    def addCallback(self, callback):
+        """Calls the function with the uuid of each changed object, from the subscription thread"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def removeCallback(self, callback):
+        """Removes a function added with addCallback()"""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def eventCount(self):
+        """The number of changes received since the last reset"""
+        return self._eventCount
+
+    def resetCounters(self):
+        """Resets eventCount()"""
+        with self._lock:
+            self._eventCount = 0
+
+    def __setActive(self, active):
+        if active:
+            # Changes may have been missed while inactive
+            self.invalidateAll()
+        self._active = active
+
+    def __listen(self):
+        """Keeps a connection open to receive the changes pushed by the daemon"""
+        delay = self._retryDelay
+        while not self._stopped.is_set():
+            try:
+                connection = RamDaemonConnection( self._daemon.transport() )
+            except OSError:
+                connection = None
+
+            if connection is not None:
+                with self._lock:
+                    self._connection = connection
+                try:
+                    connection.send( b'subscribe' )
+                    reply = connection.readReply()
+                    if reply is not None and reply.get('accepted', False) and reply.get('success', False):
+                        self.__setActive(True)
+                        delay = self._retryDelay
+                        while True:
+                            event = connection.readReply()
+                            if event is None:
+                                break
+                            self.__handleEvent(event)
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    self.__setActive(False)
+                    with self._lock:
+                        self._connection = None
+                    connection.close()
+
+            if not self._stopped.is_set():
+                log("The subscription to the Ramses Daemon was lost, I'll try again in " + str(round(delay, 1)) + " s.", LogLevel.Debug)
+            self._stopped.wait( delay )
+            delay = min(delay * 2, self._maxRetryDelay)
+
+    def __handleEvent(self, event):
+        if event.get('query', "") != 'objectChanged':
+            return
+        content = event.get('content')
+        if content is None:
+            return
+        uuid = content.get('uuid', "")
+        if uuid != "":
+            self.objectChanged(uuid)
+
+    def __poll(self):
+        """Asks the daemon for the objects changed since the last poll"""
+        since = None
+        while not self._stopped.is_set():
+            content = self._daemon.getChanges( since )
+            if content is None:
+                since = None
+                self.__setActive(False)
+            else:
+                for uuid in content.get('objects', {}):
+                    self.objectChanged(uuid)
+                # Use the time of the daemon, the clocks may differ
+                since = content.get('time', since)
+                if not self._active:
+                    self.__setActive(True)
+            self._stopped.wait( self._pollInterval )
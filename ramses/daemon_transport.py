@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import json
+import time
+import socket
+import asyncio
+import threading
+from collections import deque
+
+from .daemon_recorder import loadRecording
+from .daemon_encoding import readFrames
+
+class RamDaemonTransport( object ):
+    """The way connections to the Ramses Daemon are opened.
+
+    Any stream transport can be used by subclassing this class:
+    connect() must return a connected object with the sendall(), recv_into() and close() methods of a socket,
+    and connectAsync() an asyncio (reader, writer) pair.
+    """
+
+    def connect(self):
+        """Opens a new connection.
+
+        Returns: socket.
+
+        Raises: OSError.
+            If the daemon can't be reached.
+        """
+        raise NotImplementedError()
+
+    async def connectAsync(self):
+        """Opens a new connection for asyncio.
+
+        Returns: tuple.
+            (asyncio.StreamReader, asyncio.StreamWriter)
+        """
+        raise NotImplementedError()
+
+    def description(self):
+        """A description of the daemon location, for logs"""
+        return ""
+
+class RamTcpTransport( RamDaemonTransport ):
+    """Connects to the daemon through TCP. This is the only transport supported by the Ramses Client on all platforms."""
+
+    def __init__(self, address, port):
+        """
+        Args:
+            address: str.
+            port: int.
+        """
+        self._address = address
+        self._port = port
+
+    def address(self):
+        """The address of the daemon"""
+        return self._address
+
+    def port(self):
+        """The listening port of the daemon"""
+        return self._port
+
+    def connect(self):
+        s = socket.create_connection((self._address, self._port))
+        # Queries are small and must be sent right away
+        try:
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (OSError, AttributeError):
+            pass
+        return s
+
+    async def connectAsync(self):
+        return await asyncio.open_connection(self._address, self._port)
+
+    def description(self):
+        return self._address + ":" + str(self._port)
+
+class RamUnixTransport( RamDaemonTransport ):
+    """Connects to the daemon through a Unix domain socket, which is faster than TCP when the daemon is local.
+    Not available on Windows."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: str.
+                The path of the socket file.
+        """
+        self._path = path
+
+    def path(self):
+        """The path of the socket file"""
+        return self._path
+
+    def connect(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.connect(self._path)
+        except OSError:
+            s.close()
+            raise
+        return s
+
+    async def connectAsync(self):
+        return await asyncio.open_unix_connection(self._path)
+
+    def description(self):
+        return self._path
+
+class RamReplayTransport( RamDaemonTransport ):
+    """Replays a recording written by RamDaemonRecorder instead of connecting to a daemon,
+    to benchmark the API deterministically.
+
+    Each query gets the reply recorded for the same query, in the recorded order.
+    If the query was not recorded (e.g. it contains a new uuid), it gets the next reply recorded
+    for the same query name; if there's none left, it gets the last reply of the query, or a failed reply.
+    Replies are served instantly, unless realTime is True.
+    Subscriptions are accepted, but no change is ever pushed.
+    This class is thread-safe.
+    """
+
+    def __init__(self, filePath, realTime=False):
+        """
+        Args:
+            filePath: str.
+                The recording.
+            realTime: bool.
+                If True, waits for the recorded duration before each reply.
+        """
+        self._realTime = realTime
+        self._lock = threading.Lock()
+        self._entries = loadRecording( filePath )
+        self._used = [ False ] * len(self._entries)
+        self._byQuery = {}
+        self._byName = {}
+        for i, entry in enumerate(self._entries):
+            query = entry['query']
+            self._byQuery.setdefault( query, deque() ).append(i)
+            self._byName.setdefault( query.partition('&')[0], deque() ).append(i)
+        self._lastReplies = {}
+        self._queryCount = 0
+        self._missCount = 0
+
+    def connect(self):
+        return RamReplaySocket(self)
+
+    async def connectAsync(self):
+        # Bridge a real socket pair to a replay socket, so that asyncio can use it
+        clientSocket, serverSocket = socket.socketpair()
+        threading.Thread( target=self.__bridge, args=(serverSocket,), daemon=True ).start()
+        return await asyncio.open_connection( sock=clientSocket )
+
+    def description(self):
+        return "replay"
+
+    def queryCount(self):
+        """The number of queries replayed"""
+        return self._queryCount
+
+    def missCount(self):
+        """The number of queries which did not match a recorded query"""
+        return self._missCount
+
+    def reply(self, query):
+        """Gets the reply to a query.
+
+        Returns: dict.
+
+        Raises: ConnectionError.
+            If the daemon was unreachable when the query was recorded.
+        """
+        with self._lock:
+            self._queryCount = self._queryCount + 1
+            index = self.__next( self._byQuery.get(query) )
+            if index is None:
+                self._missCount = self._missCount + 1
+                index = self.__next( self._byName.get(query.partition('&')[0]) )
+
+            if index is None:
+                entry = self._lastReplies.get(query)
+            else:
+                self._used[index] = True
+                entry = self._entries[index]
+                self._lastReplies[query] = entry
+
+        if entry is None:
+            return {
+                'accepted': False,
+                'success': False,
+                'message': "This query was not recorded.",
+                'query': query.partition('&')[0],
+                'content': None,
+                }
+
+        if self._realTime:
+            time.sleep( entry['duration'] )
+        if entry.get('failed', False):
+            raise ConnectionError("The Ramses Daemon could not be reached when this query was recorded.")
+        if entry['reply'] is None:
+            # The reply was not read
+            return {
+                'accepted': True,
+                'success': True,
+                'message': "",
+                'query': query.partition('&')[0],
+                'content': None,
+                }
+        return entry['reply']
+
+    def __next(self, indices):
+        """Pops the next unused entry"""
+        if indices is None:
+            return None
+        while indices:
+            index = indices.popleft()
+            if not self._used[index]:
+                return index
+        return None
+
+    def __bridge(self, serverSocket):
+        replaySocket = RamReplaySocket(self)
+        chunk = bytearray(65536)
+        try:
+            while True:
+                received = serverSocket.recv_into(chunk)
+                if received == 0:
+                    break
+                replaySocket.sendall( bytes(chunk[:received]) )
+                serverSocket.sendall( replaySocket.pending() )
+        except OSError:
+            pass
+        finally:
+            serverSocket.close()
+
+class RamReplaySocket( object ):
+    """A socket replying with the replies of a RamReplayTransport"""
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._input = bytearray()
+        self._output = bytearray()
+        self._subscribed = False
+        self._closed = threading.Event()
+
+    def sendall(self, data):
+        """Queries are read according to their length when framed, split on new lines when pipelined,
+        otherwise each call is a query"""
+        if data.startswith(b'#') or self._input:
+            # A frame may be split between several calls
+            self._input += data
+            queries = [ query.decode('utf-8') for query in readFrames( self._input ) ]
+        else:
+            text = data.decode('utf-8')
+            if "\n" in text:
+                queries = [ query for query in text.split("\n") if query ]
+            else:
+                queries = [ text ]
+        for query in queries:
+            if query.partition('&')[0] == 'subscribe':
+                # Not recorded, the subscription connection waits for changes until it's closed
+                self._subscribed = True
+                reply = { 'accepted': True, 'success': True, 'message': "", 'query': 'subscribe', 'content': {} }
+            else:
+                reply = self._transport.reply(query)
+            self._output += json.dumps(reply).encode('utf-8')
+
+    def recv_into(self, buffer):
+        if not self._output and self._subscribed:
+            self._closed.wait()
+        size = min( len(buffer), len(self._output) )
+        buffer[:size] = self._output[:size]
+        del self._output[:size]
+        return size
+
+    def pending(self):
+        """Gets and clears the replies which have not been read yet
+
+        Returns: bytes.
+        """
+        output = bytes(self._output)
+        self._output.clear()
+        return output
+
+    def shutdown(self, how):
+        self._closed.set()
+
+    def close(self):
+        self._output.clear()
+        self._closed.set()
+
+def createTransport( settings, address='localhost' ):
+    """Creates the transport set in the settings.
+
+    Args:
+        settings: RamSettings.
+            daemonTransport is 'tcp' (using ramsesClientPort) or 'unix' (using daemonSocketPath).
+        address: str.
+            The address of the daemon for the TCP transport.
+
+    Returns: RamDaemonTransport.
+    """
+    if settings.daemonTransport == 'unix' and settings.daemonSocketPath != "" and hasattr(socket, 'AF_UNIX'):
+        return RamUnixTransport( settings.daemonSocketPath )
+    return RamTcpTransport( address, settings.ramsesClientPort )
@@ -0,0 +1,789 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import os
+import json
+import time
+import zlib
+import random
+import socket
+import tempfile
+import threading
+import socketserver
+import uuid as UUID
+
+from .constants import FolderNames
+from .daemon_transport import RamTcpTransport, RamUnixTransport
+from .daemon_encoding import readFrames, unescapeValue
+
+# All the optional capabilities the fake daemon can advertise
+CAPABILITIES = (
+    'getDataBatch',
+    'getPathBatch',
+    'uuidFromPathBatch',
+    'pipelining',
+    'hydrate',
+    'subscribe',
+    'getChanges',
+    'escaping',
+    'framing',
+    'zlib',
+    'patchData',
+    )
+
+class RamFakeDaemonHandler( socketserver.BaseRequestHandler ):
+    """Handles a connection to the fake daemon.
+
+    Like the Ramses Client, a chunk of data without a new line is handled as a single query.
+    As soon as a query terminated by a new line is received, the connection switches to pipelining:
+    the data is buffered and split on new lines.
+    Framed queries (starting with '#') are read according to their length, see daemon_encoding.
+    After a subscribe query, the changes are pushed through the connection.
+    """
+
+    def setup(self):
+        try:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (OSError, AttributeError):
+            pass
+        self.server.fakeDaemon._connected()
+
+    def finish(self):
+        self.server.fakeDaemon._unsubscribe( self.request )
+
+    def handle(self):
+        fakeDaemon = self.server.fakeDaemon
+        buffer = bytearray()
+        pipelining = False
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+
+            if buffer.startswith(b'#') and 'framing' in fakeDaemon.capabilities():
+                try:
+                    queries = readFrames(buffer)
+                except (ValueError, zlib.error):
+                    return
+            elif not pipelining and not b'\n' in buffer:
+                queries = [bytes(buffer)]
+                buffer = bytearray()
+            else:
+                pipelining = True
+                lines = bytes(buffer).split(b'\n')
+                buffer = bytearray(lines.pop())
+                queries = lines
+
+            replies = []
+            subscribe = False
+            for query in queries:
+                if query:
+                    replies.append( fakeDaemon.reply( query.decode('utf-8') ) )
+                    subscribe = subscribe or query.split(b'&')[0].strip() == b'subscribe'
+            if not replies:
+                continue
+
+            if fakeDaemon._dropConnection():
+                # Simulates a daemon under load dropping the connection in the middle of the reply
+                data = b''.join(replies)
+                try:
+                    self.request.sendall( data[:len(data)//2] )
+                except OSError:
+                    pass
+                return
+
+            try:
+                self.request.sendall( b''.join(replies) )
+            except OSError:
+                return
+
+            if subscribe and 'subscribe' in fakeDaemon.capabilities():
+                fakeDaemon._subscribe( self.request )
+
+            if fakeDaemon.closeConnections():
+                return
+
+class RamFakeDaemon( object ):
+    """A stand-in for the Ramses Daemon, serving a synthetic database, to test and benchmark the API without the Ramses Client.
+
+    It speaks the same query protocol and replies with the same JSON envelope (accepted, success, content, message, query).
+    The size of the database is configurable. Folders are not created, but the paths are built in a temporary folder
+    as the API may create them.
+
+        daemon = RamFakeDaemon( shots=100 )
+        daemon.start()
+        RamDaemonInterface.instance().setAddress( 'localhost', daemon.port() )
+        ...
+        daemon.stop()
+    """
+
+    def __init__(self, port=0, projects=1, sequences=2, shots=10, assetGroups=2, assets=10, steps=4, pipes=2, statuses=True,
+                 capabilities=CAPABILITIES, folderPath="", latency=0.0, closeConnections=False, socketPath="", dropRate=0.0):
+        """
+        Args:
+            port: int.
+                The listening port, 0 to use any available port.
+            projects: int.
+                The number of projects.
+            sequences: int.
+                The number of sequences in each project.
+            shots: int.
+                The number of shots in each sequence.
+            assetGroups: int.
+                The number of asset groups in each project.
+            assets: int.
+                The number of assets in each group.
+            steps: int.
+                The number of steps in each project, distributed between pre-production, assets, shots and post-production.
+            pipes: int.
+                The number of pipes in each project.
+            statuses: bool.
+                Whether to create a status for each item and step.
+            capabilities: tuple of str.
+                The optional capabilities advertised in the ping reply. Use an empty tuple to mimic an older Ramses Client.
+            folderPath: str.
+                The main Ramses folder; a temporary folder by default.
+            latency: float.
+                A delay in seconds added before replying to each query, to simulate a loaded or remote daemon.
+            closeConnections: bool.
+                If True, connections are closed after each reply, like older Ramses Clients.
+            socketPath: str.
+                If set, listens on this Unix domain socket instead of a TCP port.
+            dropRate: float.
+                The probability to close the connection in the middle of a reply, to simulate transient failures.
+                The queries are still handled.
+        """
+
+        self._port = port
+        self._capabilities = tuple(capabilities)
+        self._latency = latency
+        self._closeConnections = closeConnections
+        self._socketPath = socketPath
+        self._dropRate = dropRate
+        self._dropCount = 0
+
+        if folderPath == "":
+            folderPath = os.path.join( tempfile.gettempdir(), "RamsesFakeDaemon" )
+        self._folderPath = folderPath.replace("\\", "/")
+
+        self._lock = threading.RLock()
+        self._objects = {}
+        self._byType = {}
+        self._byPath = {}
+        self._statuses = {}
+        self._queryCounts = {}
+        self._connectionCount = 0
+        # Subscribed sockets, with a lock to not mix the events sent by several threads
+        self._subscribers = {}
+        self._changes = []
+
+        self._server = None
+        self._thread = None
+
+        self._userUuid = self.__add( "RamUser", {
+            "name": "Fake User",
+            "shortName": "FAKE",
+            "role": "admin",
+            "comment": "",
+            }, self.__path( "Users", "FAKE" ) )
+
+        for name, shortName, completion, color in (
+            ("No", "NO", 0, "#000000"),
+            ("To Do", "TODO", 0, "#999999"),
+            ("Work in progress", "WIP", 50, "#ff8800"),
+            ("Check", "CHK", 90, "#0088ff"),
+            ("OK", "OK", 100, "#00ff00"),
+            ):
+            self.__add( "RamState", {
+                "name": name,
+                "shortName": shortName,
+                "completionRatio": completion,
+                "color": color,
+                } )
+
+        self._fileTypeUuids = []
+        for name, shortName, extensions in (
+            ("Blender scene", "blend", ["blend"]),
+            ("Maya scene", "ma", ["ma", "mb"]),
+            ("Alembic", "abc", ["abc"]),
+            ):
+            self._fileTypeUuids.append( self.__add( "RamFileType", {
+                "name": name,
+                "shortName": shortName,
+                "extensions": extensions,
+                } ) )
+
+        self._currentProjectUuid = ""
+        for p in range(projects):
+            projectUuid = self.__createProject( p, sequences, shots, assetGroups, assets, steps, pipes, statuses )
+            if self._currentProjectUuid == "":
+                self._currentProjectUuid = projectUuid
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Starts listening in a background thread"""
+        if self._server is not None:
+            return
+        if self._socketPath != "":
+            if os.path.exists( self._socketPath ):
+                os.remove( self._socketPath )
+            self._server = socketserver.ThreadingUnixStreamServer( self._socketPath, RamFakeDaemonHandler, bind_and_activate=False )
+        else:
+            self._server = socketserver.ThreadingTCPServer( ('localhost', self._port), RamFakeDaemonHandler, bind_and_activate=False )
+            self._server.allow_reuse_address = True
+        self._server.daemon_threads = True
+        # Many clients may connect at once, the default backlog would make them wait for a SYN retransmission
+        self._server.request_queue_size = 128
+        self._server.server_bind()
+        self._server.server_activate()
+        self._server.fakeDaemon = self
+        if self._socketPath == "":
+            self._port = self._server.server_address[1]
+        self._thread = threading.Thread( target=self._server.serve_forever, daemon=True )
+        self._thread.start()
+
+    def stop(self):
+        """Stops listening"""
+        if self._server is None:
+            return
+        # Like the Ramses Client quitting, the subscribers are disconnected
+        with self._lock:
+            subscribers = list( self._subscribers.keys() )
+        for request in subscribers:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+        if self._socketPath != "" and os.path.exists( self._socketPath ):
+            os.remove( self._socketPath )
+
+    def port(self):
+        """The listening port; not used if the daemon listens on a Unix domain socket"""
+        return self._port
+
+    def socketPath(self):
+        """The path of the Unix domain socket, an empty string if the daemon listens on a TCP port"""
+        return self._socketPath
+
+    def transport(self):
+        """The transport to use to connect to this daemon: RamDaemonInterface.instance().setTransport( daemon.transport() )
+
+        Returns: RamDaemonTransport.
+        """
+        if self._socketPath != "":
+            return RamUnixTransport( self._socketPath )
+        return RamTcpTransport( 'localhost', self._port )
+
+    def folderPath(self):
+        """The main Ramses folder"""
+        return self._folderPath
+
+    def closeConnections(self):
+        """True if connections are closed after each reply"""
+        return self._closeConnections
+
+    def capabilities(self):
+        """The optional capabilities advertised in the ping reply"""
+        return self._capabilities
+
+    def setCapabilities(self, capabilities):
+        """Sets the optional capabilities advertised in the ping reply"""
+        self._capabilities = tuple(capabilities)
+
+    def currentProjectUuid(self):
+        return self._currentProjectUuid
+
+    def uuids(self, objectType):
+        """The uuids of all the objects of the given type"""
+        with self._lock:
+            return list( self._byType.get(objectType, ()) )
+
+    def setObjectData(self, uuid, data):
+        """Changes the data of an object as if another client had modified it; the subscribers are notified"""
+        with self._lock:
+            obj = self._objects[uuid]
+            obj["data"] = data
+            self.__changed(uuid)
+        self.__notify()
+
+    def subscriberCount(self):
+        """The number of connections currently subscribed to the changes"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def queryCount(self, queryName=None):
+        """The number of queries received since the last reset, for the given query name or in total"""
+        with self._lock:
+            if queryName is None:
+                return sum( self._queryCounts.values() )
+            return self._queryCounts.get(queryName, 0)
+
+    def dropCount(self):
+        """The number of connections dropped since the last reset, see dropRate"""
+        return self._dropCount
+
+    def connectionCount(self):
+        """The number of connections accepted since the last reset"""
+        return self._connectionCount
+
+    def resetCounters(self):
+        """Resets queryCount() and connectionCount()"""
+        with self._lock:
+            self._queryCounts = {}
+            self._connectionCount = 0
+            self._dropCount = 0
+
+    def reply(self, query):
+        """Handles a query and returns the encoded reply.
+
+        Args:
+            query: str.
+
+        Returns: bytes.
+        """
+        if self._latency > 0:
+            time.sleep( self._latency )
+
+        escaping = 'escaping' in self._capabilities
+        args = {}
+        queryName = ""
+        for arg in query.split('&'):
+            key, sep, value = arg.partition('=')
+            if queryName == "":
+                queryName = key
+            if escaping:
+                value = unescapeValue(value)
+            args[key] = value
+
+        with self._lock:
+            self._queryCounts[queryName] = self._queryCounts.get(queryName, 0) + 1
+
+        method = getattr(self, "_query_" + queryName, None)
+        if method is None:
+            return self.__encode( False, False, "Unknown query: " + queryName, queryName, None )
+
+        try:
+            with self._lock:
+                content = method( args )
+        except (KeyError, ValueError) as e:
+            return self.__encode( True, False, "Invalid query: " + str(e), queryName, None )
+        finally:
+            self.__notify()
+
+        return self.__encode( True, True, "", queryName, content )
+
+    # ==== Queries ====
+
+    def _query_ping(self, args):
+        return {
+            "version": "fake",
+            "ramses": "Ramses",
+            "userUuid": self._userUuid,
+            "capabilities": list(self._capabilities),
+            }
+
+    def _query_subscribe(self, args):
+        if not 'subscribe' in self._capabilities:
+            raise KeyError("subscribe")
+        return {}
+
+    def _query_getChanges(self, args):
+        if not 'getChanges' in self._capabilities:
+            raise KeyError("getChanges")
+        now = time.time()
+        if not "since" in args:
+            return { "objects": {}, "time": now }
+        since = float( args["since"] )
+        objects = {}
+        for uuid, obj in self._objects.items():
+            if obj["modified"] >= since:
+                objects[uuid] = obj["modified"]
+        return { "objects": objects, "time": now }
+
+    def _query_raise(self, args):
+        return {}
+
+    def _query_getRamsesFolder(self, args):
+        return { "path": self._folderPath }
+
+    def _query_getObjects(self, args):
+        objectType = args["type"]
+        return { "objects": [ self.__uuidData(uuid) for uuid in self._byType.get(objectType, ()) ] }
+
+    def _query_getProjects(self, args):
+        return { "projects": [ self.__uuidData(uuid) for uuid in self._byType.get("RamProject", ()) ] }
+
+    def _query_getShots(self, args):
+        return { "shots": self.__hydrate( args, self.__list( "RamShot", args["projectUuid"], "sequence", args.get("sequenceUuid", "") ) ) }
+
+    def _query_getAssets(self, args):
+        return { "assets": self.__hydrate( args, self.__list( "RamAsset", args["projectUuid"], "assetGroup", args.get("groupUuid", "") ) ) }
+
+    def _query_getSequences(self, args):
+        return { "sequences": self.__hydrate( args, self.__list( "RamSequence", args["projectUuid"] ) ) }
+
+    def _query_getAssetGroups(self, args):
+        return { "assetGroups": self.__hydrate( args, self.__list( "RamAssetGroup", args["projectUuid"] ) ) }
+
+    def _query_getPipes(self, args):
+        return { "pipes": self.__hydrate( args, self.__list( "RamPipe", args["projectUuid"] ) ) }
+
+    def _query_getSteps(self, args):
+        stepType = args.get("type", "ALL")
+        types = {
+            "PRE_PRODUCTION": ("pre",),
+            "ASSET_PRODUCTION": ("asset",),
+            "SHOT_PRODUCTION": ("shot",),
+            "POST_PRODUCTION": ("post",),
+            "PRODUCTION": ("asset", "shot"),
+            }.get( stepType, ("pre", "asset", "shot", "post") )
+        steps = []
+        for uuid in self.__list( "RamStep", args["projectUuid"] ):
+            if self._objects[uuid]["data"].get("type") in types:
+                steps.append(uuid)
+        return { "steps": self.__hydrate( args, steps ) }
+
+    def _query_getCurrentProject(self, args):
+        if self._currentProjectUuid == "":
+            return { "uuid": "" }
+        return self.__uuidData( self._currentProjectUuid )
+
+    def _query_setCurrentProject(self, args):
+        uuid = args["uuid"]
+        if not uuid in self._objects:
+            raise ValueError("Unknown project " + uuid)
+        self._currentProjectUuid = uuid
+        return {}
+
+    def _query_getData(self, args):
+        return { "data": self.__data( args["uuid"] ) }
+
+    def _query_setData(self, args):
+        obj = self._objects[ args["uuid"] ]
+        obj["data"] = json.loads( args["data"] )
+        self.__changed( args["uuid"] )
+        return {}
+
+    def _query_patchData(self, args):
+        if not 'patchData' in self._capabilities:
+            raise KeyError("patchData")
+        obj = self._objects[ args["uuid"] ]
+        obj["data"].update( json.loads( args["data"] ) )
+        for key in json.loads( args.get("removed", "[]") ):
+            obj["data"].pop(key, None)
+        self.__changed( args["uuid"] )
+        return {}
+
+    def _query_getPath(self, args):
+        obj = self._objects.get( args["uuid"] )
+        if obj is None:
+            return { "path": "" }
+        return { "path": obj["path"] }
+
+    def _query_uuidFromPath(self, args):
+        return { "uuid": self.__uuidFromPath( args["path"], args.get("type", "") ) }
+
+    def _query_create(self, args):
+        objectType = args["type"]
+        uuid = args["uuid"]
+        data = json.loads( args["data"] )
+        self.__add( objectType, data, uuid=uuid )
+        self.__changed( uuid )
+        return {}
+
+    def _query_getStatus(self, args):
+        uuid = self._statuses.get( (args["itemUuid"], args["stepUuid"]), "" )
+        if uuid == "":
+            return { "uuid": "" }
+        return self.__uuidData( uuid )
+
+    def _query_setStatusModifiedBy(self, args):
+        obj = self._objects[ args["uuid"] ]
+        userUuid = args.get("userUuid", "current")
+        if userUuid == "current":
+            userUuid = self._userUuid
+        obj["data"]["user"] = userUuid
+        self.__changed( args["uuid"] )
+        return {}
+
+    def _query_getDataBatch(self, args):
+        if not 'getDataBatch' in self._capabilities:
+            raise KeyError("getDataBatch")
+        uuids = json.loads( args["uuids"] )
+        return { "objects": [ { "uuid": uuid, "data": self.__data(uuid) } for uuid in uuids ] }
+
+    def _query_getPathBatch(self, args):
+        if not 'getPathBatch' in self._capabilities:
+            raise KeyError("getPathBatch")
+        uuids = json.loads( args["uuids"] )
+        paths = {}
+        for uuid in uuids:
+            obj = self._objects.get(uuid)
+            paths[uuid] = "" if obj is None else obj["path"]
+        return { "paths": paths }
+
+    def _query_uuidFromPathBatch(self, args):
+        if not 'uuidFromPathBatch' in self._capabilities:
+            raise KeyError("uuidFromPathBatch")
+        paths = json.loads( args["paths"] )
+        objectType = args.get("type", "")
+        return { "uuids": [ self.__uuidFromPath(path, objectType) for path in paths ] }
+
+    # ==== Database ====
+
+    def __createProject(self, index, numSequences, numShots, numAssetGroups, numAssets, numSteps, numPipes, statuses):
+        shortName = "PROJ" + str(index + 1)
+        projectFolder = self.__path( FolderNames.projects, shortName )
+        projectUuid = self.__add( "RamProject", {
+            "name": "Project " + str(index + 1),
+            "shortName": shortName,
+            "width": 1920,
+            "height": 1080,
+            "framerate": 24.0,
+            }, projectFolder )
+
+        stepTypes = ("pre", "asset", "shot", "post")
+        stepUuids = []
+        for s in range(numSteps):
+            stepType = stepTypes[s % len(stepTypes)]
+            stepShortName = stepType.upper() + str(s + 1)
+            if stepType == "pre":
+                stepFolder = self.__path( projectFolder, FolderNames.preProd, shortName + "_G_" + stepShortName )
+            elif stepType == "post":
+                stepFolder = self.__path( projectFolder, FolderNames.postProd, shortName + "_G_" + stepShortName )
+            else:
+                stepFolder = self.__path( projectFolder, FolderNames.prod, shortName + "_G_" + stepShortName )
+            stepUuids.append( self.__add( "RamStep", {
+                "name": "Step " + str(s + 1),
+                "shortName": stepShortName,
+                "type": stepType,
+                "project": projectUuid,
+                "publishSettings": "",
+                "customSettings": "",
+                }, stepFolder ) )
+
+        for p in range(numPipes):
+            if len(stepUuids) < 2:
+                break
+            outputStep = stepUuids[ p % len(stepUuids) ]
+            inputStep = stepUuids[ (p + 1) % len(stepUuids) ]
+            pipeFileUuid = self.__add( "RamPipeFile", {
+                "name": "Pipe file " + str(p + 1),
+                "shortName": "PF" + str(p + 1),
+                "fileType": self._fileTypeUuids[ p % len(self._fileTypeUuids) ],
+                "project": projectUuid,
+                "customSettings": "",
+                } )
+            self.__add( "RamPipe", {
+                "name": "",
+                "shortName": "",
+                "outputStep": outputStep,
+                "inputStep": inputStep,
+                "pipeFiles": [ pipeFileUuid ],
+                "project": projectUuid,
+                } )
+
+        assetSteps = [ uuid for uuid in stepUuids if self._objects[uuid]["data"]["type"] == "asset" ]
+        shotSteps = [ uuid for uuid in stepUuids if self._objects[uuid]["data"]["type"] == "shot" ]
+
+        for g in range(numAssetGroups):
+            groupName = "Group " + str(g + 1)
+            groupFolder = self.__path( projectFolder, FolderNames.assets, groupName )
+            groupUuid = self.__add( "RamAssetGroup", {
+                "name": groupName,
+                "shortName": "G" + str(g + 1),
+                "project": projectUuid,
+                }, groupFolder )
+            for a in range(numAssets):
+                assetShortName = "A" + str(g + 1) + "-" + str(a + 1)
+                assetFolder = self.__path( groupFolder, shortName + "_A_" + assetShortName )
+                assetUuid = self.__add( "RamAsset", {
+                    "name": "Asset " + assetShortName,
+                    "shortName": assetShortName,
+                    "assetGroup": groupUuid,
+                    "project": projectUuid,
+                    "tags": [],
+                    }, assetFolder )
+                if statuses:
+                    self.__addStatuses( assetUuid, "asset", assetFolder, shortName + "_A_" + assetShortName, assetSteps )
+
+        for q in range(numSequences):
+            sequenceUuid = self.__add( "RamSequence", {
+                "name": "Sequence " + str(q + 1),
+                "shortName": "SEQ" + str(q + 1),
+                "project": projectUuid,
+                } )
+            for s in range(numShots):
+                shotShortName = "SEQ" + str(q + 1) + "-SH" + str(s + 1).zfill(3)
+                shotFolder = self.__path( projectFolder, FolderNames.shots, shortName + "_S_" + shotShortName )
+                shotUuid = self.__add( "RamShot", {
+                    "name": "Shot " + shotShortName,
+                    "shortName": shotShortName,
+                    "duration": 5.0,
+                    "sequence": sequenceUuid,
+                    "project": projectUuid,
+                    }, shotFolder )
+                if statuses:
+                    self.__addStatuses( shotUuid, "shot", shotFolder, shortName + "_S_" + shotShortName, shotSteps )
+
+        return projectUuid
+
+    def __addStatuses(self, itemUuid, itemType, itemFolder, itemName, stepUuids):
+        for stepUuid in stepUuids:
+            stepShortName = self._objects[stepUuid]["data"]["shortName"]
+            statusUuid = self.__add( "RamStatus", {
+                "item": itemUuid,
+                "itemType": itemType,
+                "step": stepUuid,
+                "state": self._byType["RamState"][1],
+                "user": self._userUuid,
+                "completionRatio": 0,
+                "version": 1,
+                "published": False,
+                "comment": "",
+                "date": "2022-01-01- 00:00:00",
+                }, self.__path( itemFolder, itemName + "_" + stepShortName ) )
+            self._statuses[ (itemUuid, stepUuid) ] = statusUuid
+
+    def __add(self, objectType, data, path="", uuid=""):
+        if uuid == "":
+            uuid = str( UUID.uuid4() )
+        self._objects[uuid] = {
+            "type": objectType,
+            "data": data,
+            "path": path,
+            "modified": time.time(),
+            }
+        self._byType.setdefault(objectType, []).append(uuid)
+        if path != "":
+            self._byPath[path] = uuid
+        return uuid
+
+    def __path(self, *parts):
+        if not parts[0].startswith(self._folderPath):
+            parts = (self._folderPath,) + parts
+        return "/".join(parts)
+
+    def __list(self, objectType, projectUuid, groupKey="", groupUuid=""):
+        uuids = []
+        for uuid in self._byType.get(objectType, ()):
+            data = self._objects[uuid]["data"]
+            if data.get("project", "") != projectUuid:
+                continue
+            if groupUuid != "" and data.get(groupKey, "") != groupUuid:
+                continue
+            uuids.append(uuid)
+        return uuids
+
+    def __hydrate(self, args, uuids):
+        """Lists the data with the uuids if it's requested and supported"""
+        if args.get("hydrate", "") != "1" or not 'hydrate' in self._capabilities:
+            return uuids
+        return [ self.__uuidData(uuid) for uuid in uuids ]
+
+    def __data(self, uuid):
+        obj = self._objects.get(uuid)
+        if obj is None:
+            return {}
+        return obj["data"]
+
+    def __uuidData(self, uuid):
+        return { "uuid": uuid, "data": self.__data(uuid) }
+
+    def __uuidFromPath(self, path, objectType):
+        types = (objectType,)
+        if objectType == "RamItem":
+            types = ("RamItem", "RamShot", "RamAsset")
+        elif objectType in ("", "RamObject"):
+            types = None
+
+        path = path.replace("\\", "/").rstrip("/")
+        while path:
+            uuid = self._byPath.get(path)
+            if uuid is not None and (types is None or self._objects[uuid]["type"] in types):
+                return uuid
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        return ""
+
+    def __encode(self, accepted, success, message, query, content):
+        return json.dumps( {
+            "accepted": accepted,
+            "success": success,
+            "message": message,
+            "query": query,
+            "content": content,
+            }, separators=(',', ':') ).encode('utf-8')
+
+    def __changed(self, uuid):
+        """Stamps a modified object, the subscribers will be notified"""
+        self._objects[uuid]["modified"] = time.time()
+        if self._subscribers:
+            self._changes.append(uuid)
+
+    def __notify(self):
+        """Pushes the pending changes to the subscribers"""
+        with self._lock:
+            if not self._changes:
+                return
+            events = b''.join( self.__encode( True, True, "", "objectChanged", { "uuid": uuid } ) for uuid in self._changes )
+            self._changes = []
+            subscribers = list( self._subscribers.items() )
+        for request, lock in subscribers:
+            try:
+                with lock:
+                    request.sendall(events)
+            except OSError:
+                self._unsubscribe(request)
+
+    def _subscribe(self, request):
+        with self._lock:
+            self._subscribers[request] = threading.Lock()
+
+    def _unsubscribe(self, request):
+        with self._lock:
+            self._subscribers.pop(request, None)
+
+    def _dropConnection(self):
+        if self._dropRate <= 0 or random.random() >= self._dropRate:
+            return False
+        with self._lock:
+            self._dropCount = self._dropCount + 1
+        return True
+
+    def _connected(self):
+        with self._lock:
+            self._connectionCount = self._connectionCount + 1
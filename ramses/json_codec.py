@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import json
+import threading
+
+from .logger import log
+from .constants import LogLevel
+
+class RamJsonCodec( object ):
+    """Encodes and decodes JSON, for the daemon replies, the object data and the metadata files.
+
+    This is the standard library implementation; faster libraries are used instead if they're installed
+    (see RamSettings.jsonCodec). Other codecs can be added with registerJsonCodec().
+    """
+
+    name = 'json'
+
+    @classmethod
+    def available( cls ):
+        """True if the library used by this codec is installed"""
+        return True
+
+    def loads(self, data):
+        """Decodes a JSON document.
+
+        Args:
+            data: str or bytes.
+
+        Raises: ValueError.
+            If the document is invalid.
+        """
+        return json.loads(data)
+
+    def dumps(self, obj, compact=False, indent=None):
+        """Encodes an object.
+
+        Args:
+            compact: bool.
+                Without any whitespace.
+            indent: int or None.
+                Pretty-prints with this indentation; some codecs only support their own indentation.
+
+        Returns: str.
+        """
+        if indent is not None:
+            return json.dumps(obj, indent=indent)
+        if compact:
+            return json.dumps(obj, separators=(',', ':'))
+        return json.dumps(obj)
+
+class RamOrjsonCodec( RamJsonCodec ):
+    """Uses orjson, the fastest codec. Its output is always compact;
+    orjson can only indent with 2 spaces, the standard library is used for other indentations."""
+
+    name = 'orjson'
+
+    @classmethod
+    def available( cls ):
+        try:
+            import orjson
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+        self._option = orjson.OPT_NON_STR_KEYS
+
+    def loads(self, data):
+        return self._loads(data)
+
+    def dumps(self, obj, compact=False, indent=None):
+        option = self._option
+        if indent == 2:
+            option = option | self._orjson.OPT_INDENT_2
+        elif indent is not None:
+            return super(RamOrjsonCodec, self).dumps(obj, compact, indent)
+        return self._dumps(obj, option=option).decode('utf-8')
+
+class RamUjsonCodec( RamJsonCodec ):
+    """Uses ujson"""
+
+    name = 'ujson'
+
+    @classmethod
+    def available( cls ):
+        try:
+            import ujson
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        import ujson
+        self._loads = ujson.loads
+        self._dumps = ujson.dumps
+
+    def loads(self, data):
+        return self._loads(data)
+
+    def dumps(self, obj, compact=False, indent=None):
+        if indent is not None:
+            return self._dumps(obj, ensure_ascii=False, escape_forward_slashes=False, indent=indent)
+        return self._dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+
+# The codecs by name, in the order of preference when the codec is 'auto'
+JSON_CODECS = {
+    'orjson': RamOrjsonCodec,
+    'ujson': RamUjsonCodec,
+    'json': RamJsonCodec,
+}
+
+_codec = None
+_codecLock = threading.Lock()
+
+def registerJsonCodec( codecClass, preferred=False ):
+    """Adds a codec, which can then be selected with RamSettings.jsonCodec.
+
+    Args:
+        codecClass: class.
+            A RamJsonCodec subclass with a unique name.
+        preferred: bool.
+            If True, it's preferred to the other codecs when the codec is 'auto'.
+    """
+    with _codecLock:
+        if preferred:
+            codecs = dict(JSON_CODECS)
+            JSON_CODECS.clear()
+            JSON_CODECS[codecClass.name] = codecClass
+            JSON_CODECS.update(codecs)
+        else:
+            JSON_CODECS[codecClass.name] = codecClass
+
+def availableJsonCodecs():
+    """The names of the codecs which can be used, in the order of preference
+
+    Returns: list of str.
+    """
+    return [ name for name, codecClass in JSON_CODECS.items() if codecClass.available() ]
+
+def jsonCodec():
+    """The codec set with RamSettings.jsonCodec, or the fastest available one if it's 'auto'
+
+    Returns: RamJsonCodec.
+    """
+    codec = _codec
+    if codec is None:
+        from .ram_settings import RamSettings
+        codec = setJsonCodec( RamSettings.instance().jsonCodec )
+    return codec
+
+def setJsonCodec( name='auto' ):
+    """Changes the codec.
+
+    Args:
+        name: str.
+            'auto', or the name of a codec: 'orjson', 'ujson', 'json'...
+
+    Returns: RamJsonCodec.
+        The codec used; the standard one if the requested one is not available.
+    """
+    global _codec
+    names = availableJsonCodecs()
+    if name != 'auto' and not name in names:
+        log("The JSON codec " + name + " is not available, I'm using the standard json module.", LogLevel.Debug)
+        name = 'json'
+    elif name == 'auto':
+        name = names[0]
+    with _codecLock:
+        _codec = JSON_CODECS[name]()
+    return _codec
+
+def jsonLoads( data ):
+    """Decodes a JSON document (str or bytes) with the current codec"""
+    return jsonCodec().loads(data)
+
+def jsonDumps( obj, compact=False, indent=None ):
+    """Encodes an object to a JSON str with the current codec, see RamJsonCodec.dumps()"""
+    return jsonCodec().dumps(obj, compact, indent)
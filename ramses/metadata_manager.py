@@ -17,11 +17,13 @@
 #
 #======================= END GPL LICENSE BLOCK ========================
 
-import os, json, time
+import os, time
 from datetime import datetime
 
 from .file_manager import RamFileManager
 from .constants import FileNames, MetaDataKeys
+from .json_codec import jsonLoads, jsonDumps
+from .ram_settings import RamSettings
 
 class RamMetaDataManager():
     """A Class to get/set metadata from files
@@ -173,10 +175,10 @@ class RamMetaDataManager():
             return {}
 
         data = {}
-        with open(file, 'r') as f:
+        with open(file, 'r', encoding="utf8") as f:
             content = f.read()
             try:
-                data = json.loads(content)
+                data = jsonLoads(content)
             except:
                 return {}
 
@@ -209,5 +211,11 @@ class RamMetaDataManager():
         """Sets the metadata for the given path using the given dict"""
         file = RamMetaDataManager.getMetaDataFile( path )
 
-        with open(file, 'w') as f:
-            json.dump( data, f, indent = 4)
+        # Compact files are faster to read and write, but not meant to be read by humans
+        indent = 4
+        if RamSettings.instance().compactMetaData:
+            indent = None
+
+        # Some codecs don't escape the non-ASCII characters
+        with open(file, 'w', encoding="utf8") as f:
+            f.write( jsonDumps( data, compact=True, indent=indent ) )
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import threading
+import weakref
+from collections import OrderedDict
+
+# The minimum number of cells before the unused ones are removed
+PRUNE_SIZE = 1024
+# Protect the cached data of the objects when they're used from several threads.
+# Objects share these locks according to their uuid, instead of creating a lock for each object.
+DATA_LOCKS = tuple( threading.RLock() for i in range(64) )
+
+def dataLock( uuid ):
+    """The lock protecting the cached data of the object with this uuid"""
+    return DATA_LOCKS[ hash(uuid) % len(DATA_LOCKS) ]
+
+class RamDataCell( object ):
+    """The cached data of an object, shared by all the RamObject instances with the same uuid"""
+
+    __slots__ = ('data', 'cacheTime', 'generation', 'pending', '__weakref__')
+
+    def __init__(self):
+        self.data = {}
+        # The time.time() when the data was got from the daemon
+        self.cacheTime = 0
+        # The generation of the daemon subscription when the data was got, see RamDaemonSubscription
+        self.generation = 0
+        # The number of transactions with changes of the data not sent yet, see RamObjectTransaction.
+        # The cell must not be overwritten with data from the daemon until they're sent
+        self.pending = 0
+
+class RamCachePolicy( object ):
+    """How long the data of the objects of a class is cached, when the changes of the daemon can't be followed.
+
+    - The data is used during the timeout after it has been got from the daemon.
+    - During the stale time following the timeout, the data is still used, but it's refreshed in the background;
+      the new data is used as soon as it's received.
+    - The pinned keys are values which never change (like the project of a step):
+      they're read from the cache whatever its age.
+
+    A timeout or stale time of None uses the value of RamSettings.
+    """
+
+    def __init__(self, timeout=None, staleTime=None, pinnedKeys=()):
+        """
+        Args:
+            timeout: float or None.
+                The time in seconds during which the data is used.
+            staleTime: float or None.
+                The time in seconds after the timeout during which the data is used while it's refreshed.
+            pinnedKeys: iterable of str.
+                The keys of the data which never change.
+        """
+        from .ram_settings import RamSettings
+        self._settings = RamSettings.instance()
+        self._timeout = timeout
+        self._staleTime = staleTime
+        self.pinnedKeys = frozenset(pinnedKeys)
+
+    def timeout(self):
+        """The time in seconds during which the data is used"""
+        if self._timeout is None:
+            return self._settings.objectCacheTimeout
+        return self._timeout
+
+    def staleTime(self):
+        """The time in seconds after the timeout during which the data is used while it's refreshed"""
+        if self._staleTime is None:
+            return self._settings.objectCacheStaleTime
+        return self._staleTime
+
+    @staticmethod
+    def fromDict( policyDict ):
+        """Builds a policy from the settings: a dict with the optional keys timeout, staleTime and pinnedKeys"""
+        return RamCachePolicy(
+            policyDict.get('timeout'),
+            policyDict.get('staleTime'),
+            policyDict.get('pinnedKeys', ())
+            )
+
+class RamObjectCache( object ):
+    """An identity map of the cached data of the objects, by uuid.
+
+    Objects are built each time they're returned by an accessor (like RamStatus.step() or RamItem.project()),
+    so each object doesn't keep its own data: all the objects with the same uuid share the same RamDataCell,
+    and the data got by one of them is used by the others.
+
+    The cells are kept as long as an object uses them, and the most recently used ones are also kept
+    after their objects are deleted, up to maxSize() cells.
+
+    How long the data is used depends on the class of the object, see RamCachePolicy.
+    The policies are set by class name with RamSettings.objectCachePolicies or setPolicy(),
+    and inherited by the subclasses. This class is thread-safe,
+    except for the hit and miss counters which are not locked: they're only statistics, a few increments may be lost.
+    """
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def instance( cls ):
+        with cls._instanceLock:
+            if cls._instance is None:
+                from .ram_settings import RamSettings
+                instance = cls.__new__(cls)
+                instance._lock = threading.Lock()
+                # Weak references to the cells, the dead ones are removed when the dict grows
+                instance._cells = {}
+                instance._pruneSize = PRUNE_SIZE
+                instance._recent = OrderedDict()
+                instance._maxSize = RamSettings.instance().objectCacheSize
+                instance._policies = None
+                instance._classPolicies = {}
+                instance._hits = 0
+                instance._misses = 0
+                cls._instance = instance
+
+        return cls._instance
+
+    def __init__(self):
+        """
+        RamObjectCache is a singleton and cannot be initialized with `RamObjectCache()`. Call RamObjectCache.instance() instead.
+
+        Raises:
+            RuntimeError
+        """
+        raise RuntimeError("RamObjectCache can't be initialized with `RamObjectCache()`, it is a singleton. Call RamObjectCache.instance() instead.")
+
+    def cell(self, uuid):
+        """The data cell shared by the objects with this uuid, created if needed
+
+        Returns: RamDataCell.
+        """
+        with self._lock:
+            ref = self._cells.get(uuid)
+            cell = None
+            if ref is not None:
+                cell = ref()
+            if cell is None:
+                cell = RamDataCell()
+                self._cells[uuid] = weakref.ref(cell)
+                if len(self._cells) > self._pruneSize:
+                    self.__prune()
+            if self._maxSize > 0:
+                self._recent[uuid] = cell
+                self._recent.move_to_end(uuid)
+                if len(self._recent) > self._maxSize:
+                    self._recent.popitem(last=False)
+            return cell
+
+    def maxSize(self):
+        """The number of cells kept after their objects are deleted"""
+        return self._maxSize
+
+    def setMaxSize(self, maxSize):
+        """Sets the number of cells kept after their objects are deleted, 0 to keep only the cells in use"""
+        with self._lock:
+            self._maxSize = max(0, maxSize)
+            while len(self._recent) > self._maxSize:
+                self._recent.popitem(last=False)
+
+    def size(self):
+        """The number of cells currently cached"""
+        with self._lock:
+            self.__prune()
+            return len(self._cells)
+
+    def clear(self):
+        """Forgets all the cached data; the objects in use keep theirs, but don't share it anymore"""
+        with self._lock:
+            self._cells = {}
+            self._pruneSize = PRUNE_SIZE
+            self._recent.clear()
+
+    def policy(self, objectClass):
+        """The cache policy of a class: the one set for the class, or for its nearest base class
+
+        Returns: RamCachePolicy.
+        """
+        policy = self._classPolicies.get(objectClass)
+        if policy is not None:
+            return policy
+
+        policies = self.__policies()
+        policy = None
+        for baseClass in objectClass.__mro__:
+            policy = policies.get(baseClass.__name__)
+            if policy is not None:
+                break
+        if policy is None:
+            policy = policies['']
+        with self._lock:
+            self._classPolicies[objectClass] = policy
+        return policy
+
+    def setPolicy(self, className, policy):
+        """Sets the cache policy of a class and its subclasses.
+
+        Args:
+            className: str.
+                The name of the class, like "RamStep".
+            policy: RamCachePolicy.
+                None to use the default policy.
+        """
+        policies = self.__policies()
+        with self._lock:
+            if policy is None:
+                policies.pop(className, None)
+            else:
+                policies[className] = policy
+            self._classPolicies = {}
+
+    def resetPolicies(self):
+        """Reloads the policies from RamSettings.objectCachePolicies"""
+        with self._lock:
+            self._policies = None
+            self._classPolicies = {}
+
+    def recordHit(self):
+        """Records data read from the cache"""
+        self._hits = self._hits + 1
+
+    def recordMiss(self):
+        """Records data which had to be got from the daemon"""
+        self._misses = self._misses + 1
+
+    def hitCount(self):
+        """The number of times the data of an object was read from the cache since the last reset"""
+        return self._hits
+
+    def missCount(self):
+        """The number of times the data of an object was got from the daemon since the last reset"""
+        return self._misses
+
+    def hitRate(self):
+        """The ratio of the data read from the cache, between 0 and 1
+
+        Returns: float.
+        """
+        total = self._hits + self._misses
+        if total == 0:
+            return 0.0
+        return self._hits / total
+
+    def resetCounters(self):
+        """Resets hitCount() and missCount()"""
+        self._hits = 0
+        self._misses = 0
+
+    def __policies(self):
+        policies = self._policies
+        if policies is None:
+            from .ram_settings import RamSettings
+            policies = { '': RamCachePolicy() }
+            for className, policyDict in RamSettings.instance().objectCachePolicies.items():
+                policies[className] = RamCachePolicy.fromDict( policyDict )
+            with self._lock:
+                self._policies = policies
+        return policies
+
+    def __prune(self):
+        """Removes the cells which are not used anymore. Must be called with the lock held."""
+        self._cells = { uuid: ref for uuid, ref in self._cells.items() if ref() is not None }
+        self._pruneSize = max(PRUNE_SIZE, len(self._cells) * 2)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import time
+import threading
+
+from .logger import log
+from .constants import LogLevel, QueryPriority
+from .object_cache import dataLock
+
+class RamObjectRefresher( object ):
+    """Refreshes the cached data of the objects in the background, see RamCachePolicy and RamObject.prefetch().
+
+    The objects to refresh are queued, each one only once, and a worker thread gets
+    the data of all the queued objects at once with RamDaemonInterface.getDataBatch(),
+    with a bulk priority. This class is thread-safe.
+    """
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def instance( cls ):
+        with cls._instanceLock:
+            if cls._instance is None:
+                instance = cls.__new__(cls)
+                instance._condition = threading.Condition()
+                instance._pending = {}
+                instance._fetching = {}
+                instance._thread = None
+                instance._refreshCount = 0
+                cls._instance = instance
+
+        return cls._instance
+
+    def __init__(self):
+        """
+        RamObjectRefresher is a singleton and cannot be initialized with `RamObjectRefresher()`. Call RamObjectRefresher.instance() instead.
+
+        Raises:
+            RuntimeError
+        """
+        raise RuntimeError("RamObjectRefresher can't be initialized with `RamObjectRefresher()`, it is a singleton. Call RamObjectRefresher.instance() instead.")
+
+    def refresh(self, uuid, cell):
+        """Queues the refresh of the data of an object.
+
+        Args:
+            uuid: str.
+            cell: RamDataCell.
+                The cell to update with the new data.
+        """
+        with self._condition:
+            # Already queued, or being fetched
+            if uuid in self._pending or uuid in self._fetching:
+                return
+            self._pending[uuid] = cell
+            if self._thread is None:
+                self._thread = threading.Thread( target=self.__run, name="RamObjectRefresher", daemon=True )
+                self._thread.start()
+            self._condition.notify()
+
+    def fetch(self, cells):
+        """Gets the data of several objects now, and updates their cached data.
+
+        Args:
+            cells: dict.
+                The RamDataCell to update, by uuid.
+
+        Returns: int.
+            The number of objects updated.
+        """
+        from .daemon_interface import RamDaemonInterface
+        daemon = RamDaemonInterface.instance()
+
+        # Changes received while the data is fetched will invalidate it
+        generation = daemon.subscription().generation()
+        start = time.time()
+        if len(cells) == 1:
+            uuid = next(iter(cells))
+            objectsData = { uuid: daemon.getData( uuid ) }
+        else:
+            objectsData = daemon.getDataBatch( cells.keys() )
+
+        updated = 0
+        for uuid, cell in cells.items():
+            data = objectsData.get(uuid)
+            if not data:
+                continue
+            with dataLock( uuid ):
+                # Don't overwrite newer data, or changes not sent yet
+                if cell.cacheTime > start or cell.pending:
+                    continue
+                cell.data = data
+                cell.cacheTime = time.time()
+                cell.generation = generation
+            updated = updated + 1
+        return updated
+
+    def pendingCount(self):
+        """The number of objects waiting to be refreshed"""
+        return len(self._pending)
+
+    def refreshCount(self):
+        """The number of objects refreshed since the last reset"""
+        return self._refreshCount
+
+    def resetCounters(self):
+        """Resets refreshCount()"""
+        with self._condition:
+            self._refreshCount = 0
+
+    def __run(self):
+        from .daemon_interface import RamDaemonInterface
+        limiter = RamDaemonInterface.instance().limiter()
+
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                pending = self._pending
+                self._pending = {}
+                self._fetching = pending
+
+            refreshed = 0
+            try:
+                with limiter.prioritize( QueryPriority.BULK ):
+                    refreshed = self.fetch( pending )
+            except Exception as e: #pylint: disable=broad-except
+                log("I can't refresh the data of the objects: " + str(e), LogLevel.Debug)
+
+            with self._condition:
+                self._fetching = {}
+                self._refreshCount = self._refreshCount + refreshed
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import threading
+
+from .logger import log
+from .constants import LogLevel
+
+class RamObjectRegistry( object ):
+    """The classes used to build the objects returned by the daemon, by type name ("RamShot", "RamAsset"...).
+
+    The Ramses classes are registered the first time the registry is used
+    (they can't be imported before, as they all depend on the daemon interface).
+    Other classes can be registered to replace them or to support new types:
+
+        class MyShot( RamShot ):
+            ...
+        RamObjectRegistry.instance().register( "RamShot", MyShot, ("shot",) )
+
+    Aliases are the other names used by the daemon for the same type, like the item types of the statuses.
+    Unknown types are built as RamObject.
+    """
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def instance( cls ):
+        with cls._instanceLock:
+            if cls._instance is None:
+                instance = cls.__new__(cls)
+                instance._classes = {}
+                instance._lock = threading.Lock()
+                instance._builtinsRegistered = False
+                cls._instance = instance
+
+        return cls._instance
+
+    def __init__(self):
+        """
+        RamObjectRegistry is a singleton and cannot be initialized with `RamObjectRegistry()`. Call RamObjectRegistry.instance() instead.
+
+        Raises:
+            RuntimeError
+        """
+        raise RuntimeError("RamObjectRegistry can't be initialized with `RamObjectRegistry()`, it is a singleton. Call RamObjectRegistry.instance() instead.")
+
+    def register(self, objectType, objectClass, aliases=()):
+        """Registers the class used to build the objects of the given type.
+
+        Args:
+            objectType: str.
+                The type name used by the daemon.
+            objectClass: class.
+                A RamObject subclass, its constructor must accept the uuid and data arguments.
+            aliases: tuple of str.
+                Other names for the same type.
+        """
+        with self._lock:
+            self._classes[objectType] = objectClass
+            for alias in aliases:
+                self._classes[alias] = objectClass
+
+    def objectClass(self, objectType):
+        """The class registered for the type; RamObject if the type is unknown"""
+        classes = self.__classes()
+        objectClass = classes.get(objectType)
+        if objectClass is None:
+            log("Unknown object type: " + str(objectType) + ", I'm using RamObject instead.", LogLevel.Debug)
+            objectClass = classes["RamObject"]
+        return objectClass
+
+    def types(self):
+        """The registered type names and aliases
+
+        Returns: list of str.
+        """
+        return list(self.__classes().keys())
+
+    def create(self, objectType, uuid, data=None, generation=None):
+        """Builds an object of the given type.
+
+        Args:
+            objectType: str.
+            uuid: str.
+            data: dict.
+            generation: int.
+                If the data comes from the daemon, the generation of the subscription read before the query was posted
+                (see RamDaemonSubscription.generation()): the data is cached with it, see RamObject.cacheData().
+        """
+        return self.__create( self.objectClass(objectType), uuid, data, generation )
+
+    def createList(self, objectType, objects, generation=None):
+        """Builds the objects of a daemon reply.
+
+        Args:
+            objectType: str.
+            objects: list.
+                The objects as listed by the daemon: dicts with a uuid and data, or uuid strings.
+            generation: int.
+                The generation of the subscription read before the query was posted, see create().
+
+        Returns: list of RamObject.
+        """
+        objectClass = self.objectClass(objectType)
+        result = []
+        append = result.append
+        for obj in objects:
+            if isinstance(obj, str):
+                append( objectClass( obj ) )
+            else:
+                append( self.__create( objectClass, obj.get("uuid", ""), obj.get("data"), generation ) )
+        return result
+
+    def __create(self, objectClass, uuid, data, generation):
+        if generation is None or not data:
+            return objectClass( uuid, data )
+        obj = objectClass( uuid )
+        obj.cacheData( data, generation )
+        return obj
+
+    def __classes(self):
+        if not self._builtinsRegistered:
+            self.__registerBuiltins()
+        return self._classes
+
+    def __registerBuiltins(self):
+        """Registers the Ramses classes, only once"""
+        with self._lock:
+            if self._builtinsRegistered:
+                return
+
+            from .ram_asset import RamAsset
+            from .ram_assetgroup import RamAssetGroup
+            from .ram_filetype import RamFileType
+            from .ram_item import RamItem
+            from .ram_object import RamObject
+            from .ram_pipe import RamPipe
+            from .ram_pipefile import RamPipeFile
+            from .ram_project import RamProject
+            from .ram_sequence import RamSequence
+            from .ram_shot import RamShot
+            from .ram_state import RamState
+            from .ram_status import RamStatus
+            from .ram_step import RamStep
+            from .ram_user import RamUser
+
+            builtins = {
+                "RamObject": RamObject,
+                "RamAsset": RamAsset,
+                "asset": RamAsset,
+                "RamAssetGroup": RamAssetGroup,
+                "RamFileType": RamFileType,
+                "RamItem": RamItem,
+                "item": RamItem,
+                "RamPipe": RamPipe,
+                "RamPipeFile": RamPipeFile,
+                "RamProject": RamProject,
+                "RamSequence": RamSequence,
+                "RamShot": RamShot,
+                "shot": RamShot,
+                "RamState": RamState,
+                "RamStatus": RamStatus,
+                "RamStep": RamStep,
+                "RamUser": RamUser,
+            }
+            # Classes registered before the builtins take precedence
+            builtins.update(self._classes)
+            self._classes = builtins
+            self._builtinsRegistered = True
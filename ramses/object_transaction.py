@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import time
+import threading
+
+from .logger import log
+from .constants import LogLevel
+from .object_cache import dataLock
+
+def succeeded( reply ):
+    """Checks if the daemon has accepted and applied a query"""
+    return reply is not None and reply.get('accepted', False) and reply.get('success', False)
+
+class RamObjectTransaction( object ):
+    """Groups the changes of the data of several objects, or of several values of an object,
+    so that the data of each object is sent only once to the daemon, when the transaction ends:
+
+        with status.edit():
+            status.setState( state )
+            status.setVersion( 3 )
+            status.setCompletionRatio( 100 )
+
+        with RamObject.transaction( batch=True ):
+            for status in statuses:
+                status.setPublished( True )
+
+    The changes are made in the current thread. They're visible right away in the cached data,
+    and sent when the outermost transaction including the object ends: one setData per object,
+    or all at once through a pipeline with batch=True.
+    While an object has changes not sent yet, its data is read from these changes in the current thread,
+    and it's not fetched again nor refreshed from the daemon.
+    If an exception is raised in the transaction, or if the daemon fails to save the changes,
+    the changes are discarded and the data of the objects will be fetched again from the daemon.
+    """
+
+    _local = threading.local()
+
+    @classmethod
+    def current( cls, uuid ):
+        """The innermost transaction of the current thread including the object
+
+        Returns: RamObjectTransaction or None.
+        """
+        stack = getattr(cls._local, 'stack', None)
+        if not stack:
+            return None
+        for transaction in reversed(stack):
+            if transaction.includes(uuid):
+                return transaction
+        return None
+
+    def __init__(self, objects=None, batch=False):
+        """
+        Args:
+            objects: iterable of RamObject or str.
+                The objects (or their uuids) included in the transaction; None to include all objects.
+            batch: bool.
+                If True, the changes of all the objects are sent at once through a pipeline.
+        """
+        if objects is None:
+            self._uuids = None
+        else:
+            self._uuids = frozenset( obj if isinstance(obj, str) else obj.uuid() for obj in objects )
+        self._batch = batch
+        self._pending = {}
+
+    def includes(self, uuid):
+        """Checks if the changes of the object are part of this transaction"""
+        return self._uuids is None or uuid in self._uuids
+
+    def defer(self, uuid, data, cell, keys=None):
+        """Keeps the new data of an object, to send it when the transaction ends.
+
+        Args:
+            uuid: str.
+            data: dict.
+            cell: RamDataCell.
+                The cached data of the object, cleared if the transaction is discarded.
+            keys: iterable of str.
+                The keys of the changed values, None if unknown.
+        """
+        previous = self._pending.get(uuid)
+        if previous is None:
+            with dataLock( uuid ):
+                cell.pending = cell.pending + 1
+        # Keep track of all the keys changed during the transaction
+        if keys is not None:
+            keys = frozenset(keys)
+            if previous is not None:
+                previousKeys = previous[2]
+                if previousKeys is None:
+                    keys = None
+                else:
+                    keys = previousKeys | keys
+        self._pending[uuid] = (data, cell, keys)
+
+    def pendingData(self, uuid):
+        """The data of an object with changes not sent yet, None if it has not changed in this transaction"""
+        pending = self._pending.get(uuid)
+        if pending is None:
+            return None
+        return pending[0]
+
+    def pendingCount(self):
+        """The number of objects with changes to send"""
+        return len(self._pending)
+
+    def commit(self):
+        """Sends the changes, or hands them to an enclosing transaction including the objects"""
+        from .daemon_interface import RamDaemonInterface
+        daemon = RamDaemonInterface.instance()
+
+        pending = self._pending
+        self._pending = {}
+        changes = []
+        for uuid, (data, cell, keys) in pending.items():
+            transaction = RamObjectTransaction.current( uuid )
+            if transaction is not None:
+                transaction.defer( uuid, data, cell, keys )
+                self.__release( uuid, cell )
+            else:
+                changes.append( (uuid, data, cell, keys) )
+
+        if not changes:
+            return
+
+        if self._batch and len(changes) > 1:
+            pipe = daemon.pipeline()
+            for uuid, data, cell, keys in changes:
+                pipe.setData( uuid, data, keys )
+            replies = pipe.execute()
+        else:
+            replies = [ daemon.setData( uuid, data, keys ) for uuid, data, cell, keys in changes ]
+
+        for (uuid, data, cell, keys), reply in zip(changes, replies):
+            with dataLock( uuid ):
+                self.__release( uuid, cell )
+                if succeeded( reply ):
+                    # The cell may have been overwritten by another thread in the meantime
+                    cell.data = data
+                    cell.cacheTime = time.time()
+                else:
+                    log("I can't save the changes of the object " + uuid + ", they're lost.", LogLevel.Critical)
+                    cell.data = {}
+                    cell.cacheTime = 0
+
+    def discard(self):
+        """Forgets the changes; the data of the objects will be fetched again"""
+        pending = self._pending
+        self._pending = {}
+        for uuid, (_, cell, _) in pending.items():
+            with dataLock( uuid ):
+                self.__release( uuid, cell )
+                cell.data = {}
+                cell.cacheTime = 0
+
+    def __release(self, uuid, cell):
+        """The changes of the object are not pending in this transaction anymore"""
+        with dataLock( uuid ):
+            cell.pending = max(0, cell.pending - 1)
+
+    def __enter__(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._local.stack.remove(self)
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
@@ -49,6 +49,20 @@ class RamAsset( RamItem ):
         log( "The given path does not belong to an asset", LogLevel.Debug )
         return None
 
+    @staticmethod
+    def fromPaths( fileOrFolderPaths ):
+        """Returns the RamAsset instances built using several paths, see fromPath().
+            The uuids are fetched at once, with uuidFromPathBatch.
+
+        Args:
+            fileOrFolderPaths (list of str)
+
+        Returns:
+            list of RamAsset, None for the paths which don't belong to an asset
+        """
+        uuids = DAEMON.uuidFromPathBatch( fileOrFolderPaths, "RamAsset" )
+        return [ RamAsset(uuid) if uuid != "" else None for uuid in uuids ]
+
     def __init__( self, uuid="", data = None, create=False ):
         """
         Args:
@@ -18,14 +18,26 @@
 #======================= END GPL LICENSE BLOCK ========================
 
 import time
-import json
 import re
 import os
 import uuid as UUID
 from .daemon_interface import RamDaemonInterface
+from .ram_settings import RamSettings
 from .logger import log, LogLevel
+from .json_codec import jsonLoads
+from .object_cache import RamObjectCache, RamDataCell, dataLock
+from .object_refresher import RamObjectRefresher
+from .object_transaction import RamObjectTransaction
 
 DAEMON = RamDaemonInterface.instance()
+SETTINGS = RamSettings.instance()
+SUBSCRIPTION = DAEMON.subscription()
+CACHE = RamObjectCache.instance()
+REFRESHER = RamObjectRefresher.instance()
+# The states of the cached data of an object
+CACHE_VALID = 0
+CACHE_STALE = 1 # Can be used while it's refreshed
+CACHE_EXPIRED = 2
 RE_UUID = re.compile("^[a-zA-Z0-9]+-[a-zA-Z0-9]+-[a-zA-Z0-9]+-[a-zA-Z0-9]+-[a-zA-Z0-9]+$")
 
 class RamObject(object):
@@ -76,66 +88,203 @@ class RamObject(object):
             uuid = str(UUID.uuid4())
         self.__uuid = uuid
 
+        # The data is shared with the other objects with the same uuid
+        if self.__virtual:
+            self.__cell = RamDataCell()
+        else:
+            self.__cell = CACHE.cell( uuid )
+
         if isinstance(data, str):
-            data = json.loads(data)   
+            data = jsonLoads(data)
         if data:
-            self.__data = data
-            self.__cacheTime = time.time()
-        else:
-            self.__data = {}
-            self.__cacheTime = 0
+            with self.__lock():
+                self.__cell.data = data
+                self.__cell.cacheTime = time.time()
+                self.__cell.generation = SUBSCRIPTION.generation()
 
         if create:
-            reply = DAEMON.create( self.__uuid, self.__data, objectType )
+            reply = DAEMON.create( self.__uuid, self.__cell.data, objectType )
             if not DAEMON.checkReply(reply):
                 log("I can't create this object.")
 
+    def __lock( self ):
+        return dataLock( self.__uuid )
+
     def uuid( self ):
         """Returns the uuid of the object"""
         return self.__uuid
 
     def data( self ):
         """Gets the data for this object"""
+        cell = self.__cell
         if self.__virtual:
-            return self.__data
-
-        # Check if the cached data is recent enough
-        # there's a 2-second timeout to not post too many queries
-        # and improve performance
-        cacheElapsed = time.time() - self.__cacheTime
-        if self.__data and cacheElapsed < 2:
-            return self.__data
+            return cell.data
+
+        # The changes made in a transaction are used until they're sent, whatever the cache state
+        transaction = RamObjectTransaction.current( self.__uuid )
+        if transaction is not None:
+            data = transaction.pendingData( self.__uuid )
+            if data is not None:
+                return data
+
+        state = self.__cacheState( cell )
+        if state == CACHE_VALID:
+            CACHE.recordHit()
+            return cell.data
+        # Stale data is still used while it's refreshed in the background;
+        # in background refresh mode, any cached data is used
+        if state == CACHE_STALE or ( cell.data and SETTINGS.objectBackgroundRefresh ):
+            REFRESHER.refresh( self.__uuid, cell )
+            CACHE.recordHit()
+            return cell.data
 
         # Get the data from the daemon
+        # Changes received while it's fetched will invalidate it
+        CACHE.recordMiss()
+        generation = SUBSCRIPTION.generation()
         data = DAEMON.getData( self.__uuid )
 
-        if data:
-            self.__data = data
-            self.__cacheTime = time.time()
+        with self.__lock():
+            # Don't overwrite the changes of a transaction in another thread
+            if data and not cell.pending:
+                cell.data = data
+                cell.cacheTime = time.time()
+                cell.generation = generation
+                return cell.data
+            return data or cell.data
+
+    def __cacheState( self, cell ):
+        """Checks if the cached data can be used.
 
-        return self.__data
+        Returns: int.
+            CACHE_VALID, CACHE_STALE or CACHE_EXPIRED.
+        """
+        if not cell.data or SUBSCRIPTION.changed( self.__uuid, cell.generation ):
+            return CACHE_EXPIRED
+        # While the changes of the daemon are followed, the cached data is valid until the object changes;
+        # otherwise it's valid during the timeout of the cache policy of the class, to not post too many queries
+        if SUBSCRIPTION.tracks( cell.generation ):
+            return CACHE_VALID
+        policy = CACHE.policy( self.__class__ )
+        age = time.time() - cell.cacheTime
+        timeout = policy.timeout()
+        if age < timeout:
+            return CACHE_VALID
+        if age < timeout + policy.staleTime():
+            return CACHE_STALE
+        return CACHE_EXPIRED
+
+    @staticmethod
+    def prefetch( objs, wait=False ):
+        """Gets the data of several objects at once, so that it's already cached when it's needed.
+        Only the objects without valid cached data are fetched, with getDataBatch.
 
-    def setData( self, data):
-        """Saves the new data for the object"""
+        Args:
+            objs: iterable of RamObject.
+            wait: bool.
+                If False, the data is fetched in the background and this method returns immediately.
+        """
+        cells = {}
+        for obj in objs:
+            if obj.__virtual:
+                continue
+            cell = obj.__cell
+            if obj.__cacheState( cell ) != CACHE_VALID:
+                cells[obj.__uuid] = cell
+
+        if not cells:
+            return
+        if wait:
+            REFRESHER.fetch( cells )
+        else:
+            for uuid, cell in cells.items():
+                REFRESHER.refresh( uuid, cell )
+
+    def setData( self, data, keys=None ):
+        """Saves the new data for the object
+
+        Args:
+            data: dict or str.
+            keys: iterable of str.
+                The keys of the values which have changed, if known: only these values are sent to the daemon if it supports it.
+        """
         if isinstance(data, str):
-            data = json.loads(data)
+            data = jsonLoads(data)
+
+        with self.__lock():
+            self.__cell.data = data
+            self.__cell.cacheTime = time.time()
+            self.__cell.generation = SUBSCRIPTION.generation()
 
-        self.__data = data
-        self.__cacheTime = time.time()
+            if not self.__virtual:
+                # In a transaction, the data is sent when it ends
+                transaction = RamObjectTransaction.current( self.__uuid )
+                if transaction is not None:
+                    transaction.defer( self.__uuid, data, self.__cell, keys )
+                else:
+                    DAEMON.setData( self.__uuid, data, keys )
 
-        if not self.__virtual:
-            DAEMON.setData( self.__uuid, data )
+    def cacheData( self, data, generation ):
+        """Keeps the data got from the daemon in the cache, without sending it back
+
+        Args:
+            data: dict.
+            generation: int.
+                The generation of the subscription read before the data was requested (see RamDaemonSubscription.generation()):
+                if the object changes while the data is received, it's fetched again.
+        """
+        if self.__virtual:
+            return
+        cell = self.__cell
+        with self.__lock():
+            # Don't overwrite newer data, or the changes of a transaction in another thread
+            if cell.pending or ( cell.data and cell.generation > generation ):
+                return
+            cell.data = data
+            cell.cacheTime = time.time()
+            cell.generation = generation
 
     def get(self, key, default = None):
         """Get a specific value in the data"""
+        # Pinned values never change, the cached ones are always valid
+        if key in CACHE.policy( self.__class__ ).pinnedKeys:
+            data = self.__cell.data
+            if key in data:
+                CACHE.recordHit()
+                return data[key]
         data = self.data()
         return data.get(key, default)
 
     def set(self, key, value):
         """Sets a new value in the object data"""
-        data = self.data()
-        data[key] = value
-        self.setData(data)
+        # Other threads must not change the data until it's saved
+        with self.__lock():
+            data = self.data()
+            data[key] = value
+            self.setData(data, (key,))
+
+    def edit( self ):
+        """Starts changing several values of the object; the data is sent once, at the end of the with block:
+
+            with shot.edit():
+                shot.set( "duration", 5.0 )
+                shot.setComment( "Done" )
+
+        Returns: RamObjectTransaction.
+        """
+        return RamObjectTransaction( (self,) )
+
+    @staticmethod
+    def transaction( batch=False ):
+        """Starts changing several objects; the data of each object is sent once, at the end of the with block.
+
+        Args:
+            batch: bool.
+                If True, the data of all the objects is sent at once through a pipeline.
+
+        Returns: RamObjectTransaction.
+        """
+        return RamObjectTransaction( None, batch )
 
     def name( self ):
         """
@@ -179,13 +328,38 @@ class RamObject(object):
         """Returns the folder corresponding to this object"""
         if self.__virtual:
             return self.get("folderPath", "")
-        p = DAEMON.getPath( self.__uuid )
-        if p != "" and not os.path.isdir( p ):
+        return RamObject.__makeFolder( DAEMON.getPath( self.__uuid ) )
+
+    @staticmethod
+    def folderPaths( objs ):
+        """Returns the folders corresponding to several objects, see folderPath().
+        The paths are fetched at once, with getPathBatch.
+
+        Args:
+            objs: iterable of RamObject.
+
+        Returns: list of str.
+            The folders, in the same order as the objects.
+        """
+        objs = list(objs)
+        paths = DAEMON.getPathBatch( [ obj.__uuid for obj in objs if not obj.__virtual ] )
+        folders = []
+        for obj in objs:
+            if obj.__virtual:
+                folders.append( obj.get("folderPath", "") )
+            else:
+                folders.append( RamObject.__makeFolder( paths.get(obj.__uuid, "") ) )
+        return folders
+
+    @staticmethod
+    def __makeFolder( path ):
+        """Creates the folder of an object if it does not exist yet; returns an empty string if it can't be created"""
+        if path != "" and not os.path.isdir( path ):
             try:
-                os.makedirs( p )
-            except:
+                os.makedirs( path )
+            except OSError:
                 return ""
-        return p
+        return path
 
     def virtual( self ):
         """Checks if this object is virtual"""
@@ -240,43 +240,51 @@ class RamProject( RamObject ):
         
         return thePath
 
-    def assets( self, assetGroup=None ):
+    def assets( self, assetGroup=None, hydrate=False ):
         """Available assets in this project and group.
         If groupName is an empty string, returns all assets.
 
         Args:
             groupName (str, optional): Defaults to "".
+            hydrate (bool, optional): Gets the data of the assets with the list, use it if you need their names. Defaults to False.
 
         Returns:
             list of RamAsset
         """
 
         groupUuid = RamObject.getUuid(assetGroup)
-        return DAEMON.getAssets(self.uuid(), groupUuid)
+        return DAEMON.getAssets(self.uuid(), groupUuid, hydrate)
 
-    def assetGroups( self ):
+    def assetGroups( self, hydrate=False ):
         """Available asset groups in this project
 
+        Args:
+            hydrate (bool, optional): Gets the data of the groups with the list. Defaults to False.
+
         Returns:
             list of RamAssetGroup
         """
         
-        return DAEMON.getAssetGroups(self.uuid())
+        return DAEMON.getAssetGroups(self.uuid(), hydrate)
 
-    def shots( self, nameFilter = "*", sequence = None ):
+    def shots( self, nameFilter = "*", sequence = None, hydrate=False ):
         """Available shots in this project
 
         Args:
             nameFilter
+            hydrate (bool, optional): Gets the data of the shots with the list, use it if you need their names.
+                Always True when filtering by name. Defaults to False.
 
         Returns:
             list of RamShot
         """
 
+        filtered = nameFilter != "*" and nameFilter != ""
+
         groupUuid = RamObject.getUuid(sequence)
-        shots = DAEMON.getShots(self.uuid(), groupUuid)
+        shots = DAEMON.getShots(self.uuid(), groupUuid, hydrate or filtered)
 
-        if nameFilter == "*" or nameFilter == "":
+        if not filtered:
             return shots
 
         result = []
@@ -290,10 +298,14 @@ class RamProject( RamObject ):
 
         return result
 
-    def sequences( self ):
-        """The sequences of this project"""
+    def sequences( self, hydrate=False ):
+        """The sequences of this project
+
+        Args:
+            hydrate (bool, optional): Gets the data of the sequences with the list. Defaults to False.
+        """
         
-        return DAEMON.getSequences(self.uuid())
+        return DAEMON.getSequences(self.uuid(), hydrate)
 
     def step(self, shortName):
         """
@@ -302,50 +314,55 @@ class RamProject( RamObject ):
         return:
             RamStep
         """
-        stps = self.steps()
+        stps = self.steps(hydrate=True)
         for s in stps:
             if s.shortName() == shortName:
                 return s
         return None
 
-    def steps( self, stepType=StepType.ALL ):
+    def steps( self, stepType=StepType.ALL, hydrate=False ):
         """Available steps in this project. Use type to filter the results.
             One of: RamStep.ALL, RamStep.ASSET_PODUCTION, RamStep.SHOT_PRODUCTION, RamStep.PRE_PRODUCTION, RamStep.PRODUCTION, RamStep.POST_PRODUCTION.
             RamStep.PRODUCTION represents a combination of SHOT and ASSET
 
         Args:
             typeStep (enumerated value, optional): Defaults to RamStep.ALL.
+            hydrate (bool, optional): Gets the data of the steps with the list. Defaults to False.
 
         Returns:
             list of RamStep
         """
         
-        return DAEMON.getSteps(self.uuid(), stepType)
+        return DAEMON.getSteps(self.uuid(), stepType, hydrate)
 
-    def pipes( self ):
+    def pipes( self, hydrate=False ):
         """Available pipes in this project
 
+        Args:
+            hydrate (bool, optional): Gets the data of the pipes with the list. Defaults to False.
+
         Returns:
             list of RamPipe
         """
         
-        return DAEMON.getPipes(self.uuid())
+        return DAEMON.getPipes(self.uuid(), hydrate)
 
     def _getAssetsInFolder(self, folderPath, assetGroup=None ):
         """lists and returns all assets in the given folder"""
-        assetList = []
-        
-        for foundFile in os.listdir( folderPath ):
-            # look in subfolder
-            if os.path.isdir( folderPath + '/' + foundFile ):
-                assets = self._getAssetsInFolder( folderPath + '/' + foundFile, assetGroup )
-                assetList = assetList + assets
-            
-            # Get Asset
-            asset = RamAsset.fromPath( folderPath + '/' + foundFile )
-            if asset is None:
-                continue
-            if asset.group() == assetGroup:
-                assetList.append( asset )
+        paths = []
+
+        def listPaths( folder ):
+            for foundFile in os.listdir( folder ):
+                # look in subfolder
+                if os.path.isdir( folder + '/' + foundFile ):
+                    listPaths( folder + '/' + foundFile )
+                paths.append( folder + '/' + foundFile )
+
+        listPaths( folderPath )
+
+        # Get all the assets, then their data, at once
+        assetList = [ asset for asset in RamAsset.fromPaths( paths ) if asset is not None ]
+        RamObject.prefetch( assetList, wait=True )
+        assetList = [ asset for asset in assetList if asset.group() == assetGroup ]
 
         return removeDuplicateObjectsFromList( assetList )
@@ -58,6 +58,73 @@ class RamSettings( object ):
             cls.ramsesClientPath =  cls.defaultRamsesClientPath = ""
             # Listening port of the Ramses Daemon
             cls.ramsesClientPort = cls.defaultRamsesClientPort = 18185
+            # How to connect to the daemon: 'tcp' (localhost:ramsesClientPort) or 'unix' (daemonSocketPath, not on Windows)
+            cls.daemonTransport = cls.defaultDaemonTransport = 'tcp'
+            # The path of the Unix domain socket of the daemon, used with the 'unix' transport
+            cls.daemonSocketPath = cls.defaultDaemonSocketPath = ""
+            # Keep the connections to the Ramses Daemon open to reuse them for the next queries
+            cls.daemonKeepAlive = cls.defaultDaemonKeepAlive = True
+            # Maximum number of idle connections kept open
+            cls.daemonPoolSize = cls.defaultDaemonPoolSize = 4
+            # Each thread keeps its own connection to the daemon; use it when posting queries from many threads
+            cls.daemonPerThreadConnections = cls.defaultDaemonPerThreadConnections = False
+            # Maximum number of queries sent ahead of their replies when the daemon supports pipelining
+            cls.daemonPipelineDepth = cls.defaultDaemonPipelineDepth = 32
+            # Minimum size in bytes of the queries compressed before they're sent, when the daemon supports it; 0 to disable compression
+            cls.daemonCompressThreshold = cls.defaultDaemonCompressThreshold = 32768
+            # Maximum number of queries per second posted to the daemon by this process, 0 for no limit; use it on render farms
+            cls.daemonRateLimit = cls.defaultDaemonRateLimit = 0.0
+            # Number of queries which can be posted at once before the rate is limited
+            cls.daemonRateBurst = cls.defaultDaemonRateBurst = 20
+            # Maximum number of queries waiting for their reply at the same time, 0 for no limit
+            cls.daemonMaxInFlight = cls.defaultDaemonMaxInFlight = 0
+            # Identical read queries posted at the same time by several threads share a single reply
+            cls.daemonCoalesceQueries = cls.defaultDaemonCoalesceQueries = True
+            # Number of consecutive failures to reach the daemon after which queries are rejected immediately
+            cls.daemonFailureThreshold = cls.defaultDaemonFailureThreshold = 1
+            # Time in seconds before trying to reach the daemon again after it has failed; doubled after each failed try
+            cls.daemonRetryDelay = cls.defaultDaemonRetryDelay = 1.0
+            # Maximum time in seconds between two tries to reach the daemon
+            cls.daemonMaxRetryDelay = cls.defaultDaemonMaxRetryDelay = 30.0
+            # Follow the changes of the objects in the daemon, to keep their data cached until they change; needs a daemon supporting it
+            cls.daemonSubscribe = cls.defaultDaemonSubscribe = True
+            # Time in seconds between two checks of the changes, when the daemon can't push them
+            cls.daemonPollInterval = cls.defaultDaemonPollInterval = 1.0
+            # Time in seconds during which the data of an object is cached, when the changes can't be followed
+            cls.objectCacheTimeout = cls.defaultObjectCacheTimeout = 2.0
+            # Number of objects whose data is kept cached after they're not used anymore
+            cls.objectCacheSize = cls.defaultObjectCacheSize = 2048
+            # Time in seconds after the cache timeout during which the cached data is still used, while it's refreshed in the background; 0 to disable
+            cls.objectCacheStaleTime = cls.defaultObjectCacheStaleTime = 0.0
+            # Always use the cached data, even when it's expired, while it's refreshed in the background: reading the data never waits for the daemon once it's cached.
+            # Useful in user interfaces, which shouldn't freeze
+            cls.objectBackgroundRefresh = cls.defaultObjectBackgroundRefresh = False
+            # The cache policies by class name, overriding objectCacheTimeout and objectCacheStaleTime for the objects of this class and its subclasses.
+            # The pinned keys are values which never change, always read from the cache.
+            cls.objectCachePolicies = cls.defaultObjectCachePolicies = {
+                "RamState": { "timeout": 60.0, "pinnedKeys": ["shortName"] },
+                "RamFileType": { "timeout": 60.0, "pinnedKeys": ["shortName", "extensions"] },
+                "RamStep": { "pinnedKeys": ["project"] },
+                "RamSequence": { "pinnedKeys": ["project"] },
+                "RamAssetGroup": { "pinnedKeys": ["project"] },
+                "RamStatus": { "pinnedKeys": ["item", "itemType", "step"] },
+            }
+            # Number of times a read query is posted again when the connection drops or the reply is incomplete; 0 to disable
+            cls.daemonReadRetries = cls.defaultDaemonReadRetries = 2
+            # Maximum time in seconds before the first retry of a read query; the actual delay is random, and doubled after each retry
+            cls.daemonReadRetryDelay = cls.defaultDaemonReadRetryDelay = 0.05
+            # Maximum time in seconds before any retry of a read query
+            cls.daemonReadMaxRetryDelay = cls.defaultDaemonReadMaxRetryDelay = 1.0
+            # A JSON Lines file where all the queries and replies are recorded, to be replayed with a RamReplayTransport; empty to disable
+            cls.daemonRecordFile = cls.defaultDaemonRecordFile = ""
+            # A JSON file where the statistics of the daemon queries are written when the process exits; empty to disable
+            cls.daemonStatsFile = cls.defaultDaemonStatsFile = ""
+            # Time in seconds during which the current user is cached instead of pinging the daemon before each query
+            cls.userCacheTimeout = cls.defaultUserCacheTimeout = 10.0
+            # The JSON library used for the daemon replies, the object data and the metadata: 'auto' (the fastest installed one), 'json', 'orjson' or 'ujson'
+            cls.jsonCodec = cls.defaultJsonCodec = 'auto'
+            # Write the metadata files without indentation
+            cls.compactMetaData = cls.defaultCompactMetaData = False
             # Minimum Log level printed when logging information
             cls.logLevel = cls.defaultLogLevel = LogLevel.Info
             # Timeout before auto incrementing a file, in minutes
@@ -102,6 +169,64 @@ class RamSettings( object ):
                         cls.ramsesClientPath = settingsDict['clientPath']
                     if 'clientPort' in settingsDict:
                         cls.ramsesClientPort = settingsDict['clientPort']
+                    if 'daemonTransport' in settingsDict:
+                        cls.daemonTransport = settingsDict['daemonTransport']
+                    if 'daemonSocketPath' in settingsDict:
+                        cls.daemonSocketPath = settingsDict['daemonSocketPath']
+                    if 'daemonKeepAlive' in settingsDict:
+                        cls.daemonKeepAlive = settingsDict['daemonKeepAlive']
+                    if 'daemonPoolSize' in settingsDict:
+                        cls.daemonPoolSize = settingsDict['daemonPoolSize']
+                    if 'daemonPerThreadConnections' in settingsDict:
+                        cls.daemonPerThreadConnections = settingsDict['daemonPerThreadConnections']
+                    if 'daemonPipelineDepth' in settingsDict:
+                        cls.daemonPipelineDepth = settingsDict['daemonPipelineDepth']
+                    if 'daemonCompressThreshold' in settingsDict:
+                        cls.daemonCompressThreshold = settingsDict['daemonCompressThreshold']
+                    if 'daemonRateLimit' in settingsDict:
+                        cls.daemonRateLimit = settingsDict['daemonRateLimit']
+                    if 'daemonRateBurst' in settingsDict:
+                        cls.daemonRateBurst = settingsDict['daemonRateBurst']
+                    if 'daemonMaxInFlight' in settingsDict:
+                        cls.daemonMaxInFlight = settingsDict['daemonMaxInFlight']
+                    if 'daemonCoalesceQueries' in settingsDict:
+                        cls.daemonCoalesceQueries = settingsDict['daemonCoalesceQueries']
+                    if 'daemonFailureThreshold' in settingsDict:
+                        cls.daemonFailureThreshold = settingsDict['daemonFailureThreshold']
+                    if 'daemonRetryDelay' in settingsDict:
+                        cls.daemonRetryDelay = settingsDict['daemonRetryDelay']
+                    if 'daemonMaxRetryDelay' in settingsDict:
+                        cls.daemonMaxRetryDelay = settingsDict['daemonMaxRetryDelay']
+                    if 'daemonReadRetries' in settingsDict:
+                        cls.daemonReadRetries = settingsDict['daemonReadRetries']
+                    if 'daemonReadRetryDelay' in settingsDict:
+                        cls.daemonReadRetryDelay = settingsDict['daemonReadRetryDelay']
+                    if 'daemonReadMaxRetryDelay' in settingsDict:
+                        cls.daemonReadMaxRetryDelay = settingsDict['daemonReadMaxRetryDelay']
+                    if 'daemonSubscribe' in settingsDict:
+                        cls.daemonSubscribe = settingsDict['daemonSubscribe']
+                    if 'daemonPollInterval' in settingsDict:
+                        cls.daemonPollInterval = settingsDict['daemonPollInterval']
+                    if 'objectCacheTimeout' in settingsDict:
+                        cls.objectCacheTimeout = settingsDict['objectCacheTimeout']
+                    if 'objectCacheSize' in settingsDict:
+                        cls.objectCacheSize = settingsDict['objectCacheSize']
+                    if 'objectCacheStaleTime' in settingsDict:
+                        cls.objectCacheStaleTime = settingsDict['objectCacheStaleTime']
+                    if 'objectBackgroundRefresh' in settingsDict:
+                        cls.objectBackgroundRefresh = settingsDict['objectBackgroundRefresh']
+                    if 'objectCachePolicies' in settingsDict:
+                        cls.objectCachePolicies = settingsDict['objectCachePolicies']
+                    if 'daemonRecordFile' in settingsDict:
+                        cls.daemonRecordFile = settingsDict['daemonRecordFile']
+                    if 'daemonStatsFile' in settingsDict:
+                        cls.daemonStatsFile = settingsDict['daemonStatsFile']
+                    if 'userCacheTimeout' in settingsDict:
+                        cls.userCacheTimeout = settingsDict['userCacheTimeout']
+                    if 'jsonCodec' in settingsDict:
+                        cls.jsonCodec = settingsDict['jsonCodec']
+                    if 'compactMetaData' in settingsDict:
+                        cls.compactMetaData = settingsDict['compactMetaData']
                     if 'logLevel' in settingsDict:
                         cls.logLevel = settingsDict['logLevel']
                     if 'autoIncrementTimeout' in settingsDict:
@@ -132,6 +257,35 @@ class RamSettings( object ):
         settingsDict = {
             'clientPath': self.ramsesClientPath,
             'clientPort': self.ramsesClientPort,
+            'daemonTransport': self.daemonTransport,
+            'daemonSocketPath': self.daemonSocketPath,
+            'daemonKeepAlive': self.daemonKeepAlive,
+            'daemonPoolSize': self.daemonPoolSize,
+            'daemonPerThreadConnections': self.daemonPerThreadConnections,
+            'daemonPipelineDepth': self.daemonPipelineDepth,
+            'daemonCompressThreshold': self.daemonCompressThreshold,
+            'daemonRateLimit': self.daemonRateLimit,
+            'daemonRateBurst': self.daemonRateBurst,
+            'daemonMaxInFlight': self.daemonMaxInFlight,
+            'daemonCoalesceQueries': self.daemonCoalesceQueries,
+            'daemonFailureThreshold': self.daemonFailureThreshold,
+            'daemonRetryDelay': self.daemonRetryDelay,
+            'daemonMaxRetryDelay': self.daemonMaxRetryDelay,
+            'daemonReadRetries': self.daemonReadRetries,
+            'daemonReadRetryDelay': self.daemonReadRetryDelay,
+            'daemonReadMaxRetryDelay': self.daemonReadMaxRetryDelay,
+            'daemonSubscribe': self.daemonSubscribe,
+            'daemonPollInterval': self.daemonPollInterval,
+            'objectCacheTimeout': self.objectCacheTimeout,
+            'objectCacheSize': self.objectCacheSize,
+            'objectCacheStaleTime': self.objectCacheStaleTime,
+            'objectBackgroundRefresh': self.objectBackgroundRefresh,
+            'objectCachePolicies': self.objectCachePolicies,
+            'daemonRecordFile': self.daemonRecordFile,
+            'daemonStatsFile': self.daemonStatsFile,
+            'userCacheTimeout': self.userCacheTimeout,
+            'jsonCodec': self.jsonCodec,
+            'compactMetaData': self.compactMetaData,
             'logLevel': self.logLevel,
             'autoIncrementTimeout': self.autoIncrementTimeout,
             'userSettings': self.userSettings,
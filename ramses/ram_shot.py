@@ -52,6 +52,20 @@ class RamShot( RamItem ):
         log( "The given path does not belong to a shot", LogLevel.Debug )
         return None
 
+    @staticmethod
+    def fromPaths( fileOrFolderPaths ):
+        """Returns the RamShot instances built using several paths, see fromPath().
+            The uuids are fetched at once, with uuidFromPathBatch.
+
+        Args:
+            fileOrFolderPaths (list of str)
+
+        Returns:
+            list of RamShot, None for the paths which don't belong to a shot
+        """
+        uuids = DAEMON.uuidFromPathBatch( fileOrFolderPaths, "RamShot" )
+        return [ RamShot(uuid) if uuid != "" else None for uuid in uuids ]
+
     def __init__( self, uuid="", data = None, create=False ):
         """
         Args:
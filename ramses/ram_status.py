@@ -75,7 +75,7 @@ class RamStatus( RamObject ):
         data = self.data()
         data["completionRatio"] = completion
         data["date"] = datetime.now().strftime("%Y-%m-%d- %H:%M:%S")
-        self.setData(data)
+        self.setData(data, ("completionRatio", "date"))
 
     def published(self):
         return self.get("published", False)
@@ -84,7 +84,7 @@ class RamStatus( RamObject ):
         data = self.data()
         data["published"] = published
         data["date"] = datetime.now().strftime("%Y-%m-%d- %H:%M:%S")
-        self.setData(data)
+        self.setData(data, ("published", "date"))
 
     def state(self):
         """The state"""
@@ -96,7 +96,7 @@ class RamStatus( RamObject ):
         data = self.data()
         data["state"] = RamObject.getUuid(state)
         data["date"] = datetime.now().strftime("%Y-%m-%d- %H:%M:%S")
-        self.setData(data)
+        self.setData(data, ("state", "date"))
 
     def step(self):
         """The step"""
@@ -105,16 +105,11 @@ class RamStatus( RamObject ):
 
     def item(self):
         """The item"""
-        from .ram_shot import RamShot
-        from .ram_asset import RamAsset
-        from .ram_item import RamItem
+        from .object_registry import RamObjectRegistry
         itemType = self.get("itemType", 'item')
-        if itemType == "shot":
-            return RamShot( self.get("item", "") )
-        elif itemType == "asset":
-            return RamAsset( self.get("item", "") )
-        else:
-            return RamItem( self.get("item", "") )
+        if not itemType in ("shot", "asset"):
+            itemType = "item"
+        return RamObjectRegistry.instance().create( itemType, self.get("item", "") )
 
     def user(self):
         """The last user who's modified the status"""
@@ -142,4 +137,4 @@ class RamStatus( RamObject ):
         data = self.data()
         data["version"] = version
         data["date"] = datetime.now().strftime("%Y-%m-%d- %H:%M:%S")
-        self.setData(data)
+        self.setData(data, ("version", "date"))
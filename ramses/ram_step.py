@@ -78,7 +78,7 @@ class RamStep( RamObject ):
             return ()
 
         inputPipes = []
-        pipes = project.pipes()
+        pipes = project.pipes(hydrate=True)
 
         for pipe in pipes:
             if pipe.inputStep() == self:
@@ -93,7 +93,7 @@ class RamStep( RamObject ):
             return ()
 
         outputPipes = []
-        pipes = project.pipes()
+        pipes = project.pipes(hydrate=True)
 
         for pipe in pipes:
             if pipe.outputStep() == self:
@@ -27,8 +27,9 @@ from .file_manager import RamFileManager
 from .file_info import RamFileInfo
 from .metadata_manager import RamMetaDataManager
 from .logger import log
-from .constants import LogLevel, Log
+from .constants import LogLevel, Log, CircuitState
 from .daemon_interface import RamDaemonInterface
+from .daemon_limiter import interactive
 from .ram_settings import RamSettings
 from .utils import load_module_from_path
 from .constants import ItemType
@@ -111,11 +112,14 @@ class Ramses( object ):
 
     def online(self):
         """True if connected to the Daemon and the Daemon is responding.
+        False while the Daemon can't be reached, until it replies again (see RamDaemonInterface.circuitBreaker()).
 
         Returns:
             bool
         """
-        return not self._offline
+        if self._offline:
+            return False
+        return DAEMON.circuitBreaker().state() != CircuitState.OPEN
 
     def alternativeFolderPaths(self):  # TODO
         """A list of alternative absolute paths to the main Ramses folder.
@@ -177,6 +181,8 @@ class Ramses( object ):
 
         # Check if already online
         self._offline = False
+        # Try to reach the daemon now, even if it has failed recently
+        DAEMON.circuitBreaker().reset()
         if DAEMON.online():
             user = self.currentUser()
             if user:
@@ -306,6 +312,7 @@ class Ramses( object ):
 
     # === EVENTS and HANDLERS ===
 
+    @interactive
     def publish(self, filePath, publishOptions=None, showPublishOptions=False ):
         """Publishes the item; runs the list of scripts Ramses.publishScripts
         Returns an error code:
@@ -362,6 +369,7 @@ class Ramses( object ):
 
         return 0
 
+    @interactive
     def updateStatus(self, item, status, step=None):
         """Runs the scripts in Ramses.instance().statusScripts."""
 
@@ -398,6 +406,7 @@ class Ramses( object ):
                 
         return 0
 
+    @interactive
     def openFile( self, filePath ):
         """Runs the scripts in Ramses.instance().openScripts."""
         from .ram_item import RamItem
@@ -448,6 +457,7 @@ class Ramses( object ):
 
         return 0
 
+    @interactive
     def importItem(self, current_file_path, import_file_paths, item, step=None, importOptions=None, showImportOptions=False ):
         """Runs the scripts in Ramses.instance().importScripts."""
         from .ram_step import RamStep
@@ -498,6 +508,7 @@ class Ramses( object ):
 
         return 0
 
+    @interactive
     def replaceItem(self, current_file_path, filePath, item, step=None, importOptions=None, showImportOptions=False):
         """Runs the scripts in Ramses.instance().replaceScripts."""
         from .ram_step import RamStep
@@ -556,6 +567,7 @@ class Ramses( object ):
                 
         return 0
 
+    @interactive
     def saveFile( self, filePath, incrementVersion=False, comment=None, newStateShortName=None ):
         """Runs the scripts in Ramses.instance().saveScripts.
         Returns an error code:
@@ -672,6 +684,7 @@ class Ramses( object ):
 
         return returnCode
 
+    @interactive
     def saveFileAs(self, currentFilePath, fileExtension, item, step, resource=""):
         """Runs the scripts in Ramses.instance().saveAsScripts
          Returns an error code:
@@ -743,6 +756,7 @@ class Ramses( object ):
 
         return returnCode
 
+    @interactive
     def saveTemplate( self, fileExtension, step, templateName="Template" ):
         """Runs the scripts in Ramses.instance().saveTemplateScripts
          Returns an error code:
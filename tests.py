@@ -1,6 +1,9 @@
 import os
+import uuid
+import asyncio
 from ramses.file_info import RamFileInfo
-# from time import perf_counter
+from ramses.fake_daemon import RamFakeDaemon
+from time import perf_counter, process_time, sleep
 from ramses import (
     log,
     LogLevel,
@@ -17,15 +20,29 @@ from ramses import (
     RamPipeFile,
     ItemType,
     RamDaemonInterface,
+    RamObjectRegistry,
+    AsyncRamDaemonInterface,
+    RamObjectCache,
+    RamStatus,
+    RamShot,
+    QueryPriority,
     StepType
     )
 
 settings = RamSettings.instance()
 settings.logLevel = LogLevel.Debug
 
-ramses = Ramses.instance()
 daemon = RamDaemonInterface.instance()
 
+# Set RAMSES_FAKE_DAEMON=1 to run the tests against a synthetic database instead of the Ramses Client
+fakeDaemon = None
+if os.environ.get('RAMSES_FAKE_DAEMON'):
+    fakeDaemon = RamFakeDaemon( shots=int(os.environ.get('RAMSES_FAKE_SHOTS', 10)) )
+    fakeDaemon.start()
+    daemon.setAddress( 'localhost', fakeDaemon.port() )
+
+ramses = Ramses.instance()
+
 testPaths = (
     'C:/Users/Duduf/Ramses/Projects/TEST/04-ASSETS/Main Characters/TEST_A_IS/TEST_A_IS_SET/_published/AllCharas_004_CHK/TEST_A_IS_SET_AllCharas-Set.mb',
     'D:/RxLab/Gestion/ZZ-Ramses-Data/Projects/synchronie/02-PROD/synchronie_G_MOD/Templates/synchronie_G_MOD_Template/synchronie_G_MOD_Template.mb'
@@ -192,6 +209,751 @@ def metaDataManager():
     print('Version is: ' + str(version))
     print('State is: ' + state)
 
+def daemonConnections( numQueries=1000 ):
+    """Counts the connections opened to the daemon for numQueries queries"""
+    pool = daemon.connectionPool()
+    pool.resetCounters()
+    tic = perf_counter()
+    for i in range(0, numQueries):
+        daemon.ping()
+    toc = perf_counter()
+    print('=== ' + str(numQueries) + ' queries in ' + str(int((toc-tic)*1000)) + ' ms ===')
+    print(' > Connections: ' + str(pool.connectCount()))
+    print(' > Reused connections: ' + str(pool.reuseCount()))
+    print(' > Keep alive: ' + str(pool.keepAlive()))
+
+def daemonUserChecks( numQueries=1000 ):
+    """Counts the pings needed to check the current user for numQueries queries"""
+    session = daemon.session()
+    session.resetCounters()
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+    for i in range(0, numQueries):
+        daemon.getData( proj.uuid() )
+    print('=== ' + str(numQueries) + ' queries ===')
+    print(' > User checks: ' + str(session.checkCount()))
+    print(' > Pings: ' + str(session.pingCount()))
+    print(' > Total round trips: ' + str(numQueries + session.pingCount()))
+
+def asyncQueries( numQueries=500 ):
+    """Compares serial queries with concurrent asyncio queries"""
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+
+    tic = perf_counter()
+    for i in range(0, numQueries):
+        daemon.getData( proj.uuid() )
+    toc = perf_counter()
+    print('=== ' + str(numQueries) + ' serial queries in ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+    async def run():
+        asyncDaemon = AsyncRamDaemonInterface()
+        await asyncio.gather( *[ asyncDaemon.getData( proj.uuid() ) for i in range(0, numQueries) ] )
+        await asyncDaemon.close()
+
+    tic = perf_counter()
+    asyncio.run( run() )
+    toc = perf_counter()
+    print('=== ' + str(numQueries) + ' concurrent queries in ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+def daemonPipelining():
+    """Compares getting the data of all the shots one by one and through a pipeline"""
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+    shots = proj.shots()
+
+    tic = perf_counter()
+    for shot in shots:
+        daemon.getData( shot.uuid() )
+    toc = perf_counter()
+    print('=== ' + str(len(shots)) + ' shots, one by one: ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+    tic = perf_counter()
+    pipe = daemon.pipeline()
+    for shot in shots:
+        pipe.getData( shot.uuid() )
+    pipe.execute()
+    toc = perf_counter()
+    print('=== ' + str(len(shots)) + ' shots, pipelined: ' + str(int((toc-tic)*1000)) + ' ms ===')
+    print(' > The daemon supports pipelining: ' + str(daemon.session().supports('pipelining')))
+
+def batchQueries( numShots=50 ):
+    """Compares getting the data, the folders and the uuids of all the shots one by one and in batches,
+    with a daemon which supports the batch queries and with one which doesn't"""
+    from ramses.fake_daemon import CAPABILITIES
+    transport = daemon.transport()
+    batchVerbs = ('getDataBatch', 'getPathBatch', 'uuidFromPathBatch')
+
+    for mode, capabilities in (
+        ('batch queries', CAPABILITIES),
+        ('fallback', [ c for c in CAPABILITIES if not c in batchVerbs ]),
+        ):
+        with RamFakeDaemon( shots=numShots, capabilities=capabilities ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            uuids = fake.uuids("RamShot")
+            shots = [ RamShot(uuid) for uuid in uuids ]
+
+            fake.resetCounters()
+            tic = perf_counter()
+            datas = [ daemon.getData(uuid) for uuid in uuids ]
+            paths = [ shot.folderPath() for shot in shots ]
+            found = [ RamShot.fromPath(path) for path in paths ]
+            toc = perf_counter()
+            print('=== ' + mode + ', one by one: ' + str(fake.queryCount()) + ' queries in ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+            fake.resetCounters()
+            tic = perf_counter()
+            batchDatas = daemon.getDataBatch( uuids )
+            batchPaths = RamObject.folderPaths( shots )
+            batchFound = RamShot.fromPaths( batchPaths + ['/not/a/shot'] )
+            toc = perf_counter()
+            print('=== ' + mode + ', batches: ' + str(fake.queryCount()) + ' queries in ' + str(int((toc-tic)*1000)) + ' ms ===')
+            for verb in batchVerbs:
+                print(' > ' + verb + ': ' + str(fake.queryCount(verb)))
+
+            print(' > Same data: ' + str( datas == [ batchDatas[uuid] for uuid in uuids ] ))
+            print(' > Same folders: ' + str( paths == batchPaths ))
+            print(' > Same shots: ' + str( found == batchFound[:-1] and batchFound[-1] is None ))
+
+    daemon.setTransport( transport )
+
+def daemonStats():
+    """Prints the queries posted to the daemon when listing the shots and their statuses"""
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+
+    stats = daemon.stats()
+    stats.reset()
+    with stats.trace() as trace:
+        for shot in proj.shots():
+            for step in proj.steps(StepType.SHOT_PRODUCTION):
+                shot.currentStatus(step)
+    print('=== ' + str(trace.queryCount()) + ' queries in ' + str(int(trace.elapsed()*1000)) + ' ms ===')
+    print(' > Waiting for the daemon: ' + str(int(trace.totalTime()*1000)) + ' ms')
+    for name, count in trace.counts().items():
+        print(' > ' + name + ': ' + str(count))
+
+    report = stats.report()
+    for name, entry in report['queries'].items():
+        print(name + ': ' + str(int(entry['meanTime']*1000000)) + ' µs, ' + str(entry['bytesReceived']) + ' bytes received')
+
+def daemonOffline( numQueries=5000 ):
+    """Posts queries to a daemon which can't be reached: only the first one should try to connect"""
+    address = daemon.address()
+    port = daemon.port()
+    # Nothing listens on this port
+    daemon.setAddress('localhost', 1)
+    breaker = daemon.circuitBreaker()
+    breaker.resetCounters()
+
+    tic = perf_counter()
+    for i in range(numQueries):
+        daemon.getData( "uuid" )
+    toc = perf_counter()
+    print('=== ' + str(numQueries) + ' offline queries in ' + str(int((toc-tic)*1000)) + ' ms ===')
+    print(' > Rejected: ' + str(breaker.rejectedCount()))
+    print(' > Circuit: ' + breaker.state() + ', next try in ' + str(round(breaker.retryDelay(), 1)) + ' s')
+    print(' > Online: ' + str(ramses.online()))
+
+    daemon.setAddress(address, port)
+
+def objectRegistry( numObjects=50000 ):
+    """Builds the objects of a large getObjects reply"""
+    registry = RamObjectRegistry.instance()
+    objs = []
+    for i in range(numObjects):
+        objs.append( {
+            'uuid': str(uuid.uuid4()),
+            'data': { 'shortName': 'SH' + str(i), 'name': 'Shot ' + str(i) }
+            } )
+
+    tic = perf_counter()
+    shots = registry.createList( "RamShot", objs )
+    toc = perf_counter()
+    print('=== ' + str(len(shots)) + ' objects built in ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+    tic = perf_counter()
+    shots = daemon.getObjects( "RamShot" )
+    toc = perf_counter()
+    print('=== ' + str(len(shots)) + ' shots from the daemon in ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+def hydratedLists():
+    """Counts the queries needed to list the names of all the shots"""
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+
+    stats = daemon.stats()
+    for hydrate in (False, True):
+        with stats.trace() as trace:
+            names = [ shot.name() for shot in proj.shots(hydrate=hydrate) ]
+        print('=== ' + str(len(names)) + ' shot names, hydrate=' + str(hydrate) + ': ' + str(trace.queryCount()) + ' queries in ' + str(int(trace.elapsed()*1000)) + ' ms ===')
+
+def coalescedQueries( numThreads=32 ):
+    """Many threads getting the data of the same objects at the same time"""
+    import threading
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+    shots = proj.shots()[0:10]
+
+    def render():
+        for shot in shots:
+            daemon.getData( shot.uuid() )
+            daemon.getPath( shot.uuid() )
+
+    coalescer = daemon.coalescer()
+    coalescer.resetCounters()
+    threads = [ threading.Thread(target=render) for i in range(numThreads) ]
+    tic = perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    toc = perf_counter()
+    print('=== ' + str(coalescer.callCount()) + ' queries from ' + str(numThreads) + ' threads in ' + str(int((toc-tic)*1000)) + ' ms ===')
+    print(' > Coalesced: ' + str(coalescer.coalescedCount()))
+
+def daemonTransports( numQueries=5000, numThreads=8 ):
+    """Compares the latency and throughput of small getData queries through TCP loopback and a Unix domain socket"""
+    import tempfile
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    transport = daemon.transport()
+
+    for socketPath in ("", os.path.join(tempfile.gettempdir(), "ramses-fake-daemon.sock")):
+        with RamFakeDaemon( socketPath=socketPath ) as fake:
+            daemon.setTransport( fake.transport() )
+            uuid = fake.currentProjectUuid()
+            daemon.getData( uuid )
+            name = 'Unix socket' if socketPath else 'TCP'
+
+            tic = perf_counter()
+            for i in range(numQueries):
+                daemon.getData( uuid )
+            toc = perf_counter()
+            print('=== ' + name + ': ' + str(int((toc-tic)/numQueries*1000000)) + ' µs per query ===')
+
+            tic = perf_counter()
+            with ThreadPoolExecutor( numThreads ) as executor:
+                # Different queries, so they're not coalesced
+                for i in range(numQueries):
+                    executor.submit( daemon.getPath, uuid if i % 2 else fake.uuids("RamUser")[0] )
+            toc = perf_counter()
+            print(' > ' + str(int(numQueries/(toc-tic))) + ' queries per second from ' + str(numThreads) + ' threads')
+
+    daemon.setTransport( transport )
+
+def threadedQueries( numQueries=4000, latency=0.001 ):
+    """Hammers getData from up to 32 threads against a fake daemon and checks the throughput scales with the threads.
+    The latency simulates the time the daemon needs to reply."""
+    from concurrent.futures import ThreadPoolExecutor
+    transport = daemon.transport()
+
+    with RamFakeDaemon( shots=100, latency=latency ) as fake:
+        daemon.setTransport( fake.transport() )
+        uuids = fake.uuids("RamShot")
+        expected = { uuid: RamObject(uuid).shortName() for uuid in uuids }
+
+        for perThread in (False, True):
+            daemon.setPerThreadConnections( perThread )
+            print('=== Per-thread connections: ' + str(perThread) + ' ===')
+            single = 0
+            for numThreads in (1, 2, 4, 8, 16, 32):
+                errors = []
+                def getData(i):
+                    uuid = uuids[i % len(uuids)]
+                    if daemon.getData( uuid ).get('shortName') != expected[uuid]:
+                        errors.append(uuid)
+
+                tic = perf_counter()
+                with ThreadPoolExecutor( numThreads ) as executor:
+                    list( executor.map( getData, range(numQueries) ) )
+                toc = perf_counter()
+                throughput = numQueries / (toc-tic)
+                if numThreads == 1:
+                    single = throughput
+                print(' > ' + str(numThreads) + ' threads: ' + str(int(throughput)) + ' queries per second (x' + str(round(throughput/single, 1)) + '), ' + str(len(errors)) + ' errors')
+
+    daemon.setPerThreadConnections( settings.daemonPerThreadConnections )
+    daemon.setTransport( transport )
+
+def changeSubscription( duration=3.0 ):
+    """Reads the names of all the shots in a loop, while another client changes one of them now and then.
+    Compares the number of queries and how long it takes to see the change with the cache timeout,
+    polling the changes, and changes pushed by the daemon."""
+    import threading
+    from ramses.fake_daemon import CAPABILITIES
+    transport = daemon.transport()
+    subscription = daemon.subscription()
+    baseCapabilities = [ c for c in CAPABILITIES if not c in ('subscribe', 'getChanges') ]
+
+    for mode, capabilities in (
+        ('timeout', baseCapabilities),
+        ('poll', baseCapabilities + ['getChanges']),
+        ('push', baseCapabilities + ['subscribe']),
+        ):
+        with RamFakeDaemon( shots=50, capabilities=capabilities ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            shots = [ RamObject(uuid) for uuid in fake.uuids("RamShot") ]
+            changed = shots[0]
+            delays = []
+            stop = threading.Event()
+
+            def otherClient():
+                i = 0
+                while not stop.wait(0.5):
+                    i = i + 1
+                    data = dict( changed.data() )
+                    data['name'] = 'Changed ' + str(i)
+                    fake.setObjectData( changed.uuid(), data )
+                    tic = perf_counter()
+                    while changed.name() != data['name'] and not stop.is_set():
+                        pass
+                    delays.append( perf_counter() - tic )
+
+            fake.resetCounters()
+            other = threading.Thread( target=otherClient )
+            other.start()
+            tic = perf_counter()
+            reads = 0
+            while perf_counter() - tic < duration:
+                for shot in shots:
+                    shot.name()
+                    reads = reads + 1
+            stop.set()
+            other.join()
+
+            print('=== ' + mode + ': ' + str(reads) + ' reads, ' + str(fake.queryCount('getData')) + ' getData queries ===')
+            if delays:
+                print(' > Change seen after ' + str(int(max(delays)*1000)) + ' ms at most')
+
+    daemon.setTransport( transport )
+
+def cachePolicies( duration=3.0, latency=0.002 ):
+    """A long batch job reading the steps, items and completion of all the statuses, the states and the file types in a loop,
+    with a daemon which can't push the changes: compares the default cache timeout,
+    the cache policies of the classes, and the stale data refreshed in the background"""
+    from ramses.fake_daemon import CAPABILITIES
+    from ramses.object_refresher import RamObjectRefresher
+    transport = daemon.transport()
+    cache = RamObjectCache.instance()
+    refresher = RamObjectRefresher.instance()
+    capabilities = [ c for c in CAPABILITIES if not c in ('subscribe', 'getChanges') ]
+
+    for mode, policies, staleTime in (
+        ('timeout', {}, 0.0),
+        ('policies', settings.defaultObjectCachePolicies, 0.0),
+        ('policies, stale', settings.defaultObjectCachePolicies, 10.0),
+        ):
+        settings.objectCachePolicies = policies
+        settings.objectCacheStaleTime = staleTime
+        cache.resetPolicies()
+        cache.clear()
+        with RamFakeDaemon( shots=25, latency=latency, capabilities=capabilities ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            statuses = [ RamStatus(uuid) for uuid in fake.uuids("RamStatus") ]
+            states = [ RamState(uuid) for uuid in fake.uuids("RamState") ]
+            fileTypes = [ RamFileType(uuid) for uuid in fake.uuids("RamFileType") ]
+
+            def read( status ):
+                status.step().project().uuid()
+                status.item().uuid()
+                status.completionRatio()
+                for state in states:
+                    state.shortName()
+                for fileType in fileTypes:
+                    fileType.extensions()
+
+            # Warm up the cache
+            for status in statuses:
+                read( status )
+
+            fake.resetCounters()
+            refresher.resetCounters()
+            maxTime = 0
+            reads = 0
+            tic = perf_counter()
+            while perf_counter() - tic < duration:
+                for status in statuses:
+                    readTic = perf_counter()
+                    read( status )
+                    maxTime = max( maxTime, perf_counter() - readTic )
+                    reads = reads + 1
+            print('=== ' + mode + ': ' + str(reads) + ' reads, ' + str(fake.queryCount('getData')) + ' getData queries, ' +
+                str(refresher.refreshCount()) + ' refreshed in the background, slowest read ' + str(round(maxTime*1000, 1)) + ' ms ===')
+
+    settings.objectCachePolicies = settings.defaultObjectCachePolicies
+    settings.objectCacheStaleTime = settings.defaultObjectCacheStaleTime
+    cache.resetPolicies()
+    daemon.setTransport( transport )
+
+def statusTransactions( numStatuses=500, latency=0.0002 ):
+    """Changes the state, version, completion ratio and publication of many statuses,
+    one value at a time, in an edit() of each status, and in a single batched transaction"""
+    transport = daemon.transport()
+    cache = RamObjectCache.instance()
+
+    for mode in ('one by one', 'edit', 'batched transaction'):
+        cache.clear()
+        with RamFakeDaemon( sequences=5, shots=100, latency=latency ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            statuses = [ RamStatus(uuid) for uuid in fake.uuids("RamStatus")[0:numStatuses] ]
+            state = RamState( fake.uuids("RamState")[0] )
+
+            def update( status ):
+                status.setState( state )
+                status.setVersion( status.version() + 1 )
+                status.setCompletionRatio( 100 )
+                status.setPublished( True )
+
+            fake.resetCounters()
+            tic = perf_counter()
+            if mode == 'one by one':
+                for status in statuses:
+                    update( status )
+            elif mode == 'edit':
+                for status in statuses:
+                    with status.edit():
+                        update( status )
+            else:
+                with RamObject.transaction( batch=True ):
+                    for status in statuses:
+                        update( status )
+            toc = perf_counter()
+            print('=== ' + mode + ': ' + str(len(statuses)) + ' statuses updated with ' + str(fake.queryCount()) + ' queries (' +
+                str(fake.queryCount('setData') + fake.queryCount('patchData')) + ' writes) in ' + str(int((toc-tic)*1000)) + ' ms ===')
+
+    daemon.setTransport( transport )
+
+def patchUpdates( numEdits=200, settingsSize=65536 ):
+    """Changes the comment of steps with large settings, sending the whole data or only the changed values"""
+    from ramses.fake_daemon import CAPABILITIES
+    transport = daemon.transport()
+    yamlSettings = "\n".join( "setting" + str(i) + ": value" + str(i) for i in range(settingsSize // 20) )
+
+    for mode, capabilities in (
+        ('setData', [ c for c in CAPABILITIES if c != 'patchData' ]),
+        ('patchData', CAPABILITIES),
+        ):
+        with RamFakeDaemon( capabilities=capabilities ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            steps = [ RamStep(uuid) for uuid in fake.uuids("RamStep") ]
+            for step in steps:
+                data = step.data()
+                data['publishSettings'] = yamlSettings
+                data['customSettings'] = yamlSettings
+                step.setData( data )
+
+            with daemon.stats().trace() as trace:
+                for i in range(numEdits):
+                    steps[ i % len(steps) ].setComment( "Edit " + str(i) )
+            sent = sum( q['bytesSent'] for q in trace.queries() )
+            print('=== ' + mode + ': ' + str(numEdits) + ' edits, ' + str(sent // 1024) + ' KB sent in ' + str(int(trace.elapsed()*1000)) + ' ms ===')
+            assert steps[0].comment().startswith("Edit")
+            assert fake.reply( "getData&uuid=" + steps[0].uuid() ).count( b'setting1:' ) == 2
+
+    daemon.setTransport( transport )
+
+def backgroundRefresh( duration=3.0, latency=0.005, cacheTimeout=0.5 ):
+    """A user interface redrawing the names of the shots at 60 fps, with a daemon which can't push the changes.
+    Compares the slowest frames when reading expired data waits for the daemon, and when it's refreshed in the background;
+    and the first frame with and without prefetching the data."""
+    from ramses.fake_daemon import CAPABILITIES
+    from ramses.object_refresher import RamObjectRefresher
+    transport = daemon.transport()
+    cache = RamObjectCache.instance()
+    refresher = RamObjectRefresher.instance()
+    capabilities = [ c for c in CAPABILITIES if not c in ('subscribe', 'getChanges') ]
+    settings.objectCacheTimeout = cacheTimeout
+
+    for mode, backgroundRefresh, prefetch in (
+        ('blocking', False, False),
+        ('background refresh', True, False),
+        ('prefetch, background refresh', True, True),
+        ):
+        settings.objectBackgroundRefresh = backgroundRefresh
+        cache.clear()
+        with RamFakeDaemon( shots=50, latency=latency, capabilities=capabilities ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            shots = [ RamShot(uuid) for uuid in fake.uuids("RamShot") ]
+            refresher.resetCounters()
+
+            tic = perf_counter()
+            if prefetch:
+                RamObject.prefetch( shots, wait=True )
+            names = [ shot.name() for shot in shots ]
+            firstFrame = perf_counter() - tic
+
+            frameTimes = []
+            tic = perf_counter()
+            while perf_counter() - tic < duration:
+                frameTic = perf_counter()
+                names = [ shot.name() for shot in shots ]
+                frameTime = perf_counter() - frameTic
+                frameTimes.append( frameTime )
+                sleep( max(0, 1/60 - frameTime) )
+
+            print('=== ' + mode + ': first frame ' + str(int(firstFrame*1000)) + ' ms, slowest frame ' + str(int(max(frameTimes)*1000)) + ' ms, ' +
+                str(len([ t for t in frameTimes if t > 1/60 ])) + ' dropped frames out of ' + str(len(frameTimes)) + ', ' +
+                str(fake.queryCount('getData')) + ' getData, ' + str(refresher.refreshCount()) + ' refreshed in the background ===')
+
+    settings.objectCacheTimeout = settings.defaultObjectCacheTimeout
+    settings.objectBackgroundRefresh = settings.defaultObjectBackgroundRefresh
+    daemon.setTransport( transport )
+
+def farmLoad( numTasks=64, duration=2.0, latency=0.001 ):
+    """Many threads (like render farm tasks) posting bulk queries, while the user saves a file.
+    Compares the load on the daemon and the latency of the interactive queries without and with limits."""
+    import threading
+    transport = daemon.transport()
+    limiter = daemon.limiter()
+
+    with RamFakeDaemon( shots=100, latency=latency ) as fake:
+        daemon.setTransport( fake.transport() )
+        uuids = fake.uuids("RamShot")
+        userUuid = fake.uuids("RamUser")[0]
+
+        for rate, maxInFlight in ((0, 0), (500, 4)):
+            limiter.setLimits( rate, settings.daemonRateBurst, maxInFlight )
+            limiter.resetCounters()
+            stop = threading.Event()
+
+            def task(i):
+                with limiter.prioritize( QueryPriority.BULK ):
+                    while not stop.is_set():
+                        daemon.getPath( uuids[i % len(uuids)] )
+                        i = i + 1
+
+            daemon.ping()
+            fake.resetCounters()
+            tasks = [ threading.Thread( target=task, args=(i,) ) for i in range(numTasks) ]
+            for t in tasks: t.start()
+            latencies = []
+            tic = perf_counter()
+            with limiter.prioritize( QueryPriority.INTERACTIVE ):
+                while perf_counter() - tic < duration:
+                    start = perf_counter()
+                    daemon.getData( userUuid )
+                    latencies.append( perf_counter() - start )
+                    stop.wait(0.05)
+            toc = perf_counter()
+            stop.set()
+            for t in tasks: t.join()
+
+            print('=== Rate limit: ' + str(rate) + ', max in flight: ' + str(maxInFlight) + ' ===')
+            print(' > Daemon load: ' + str(int(fake.queryCount()/(toc-tic))) + ' queries per second')
+            print(' > Interactive queries: ' + str(int(sum(latencies)/len(latencies)*1000)) + ' ms on average, ' + str(int(max(latencies)*1000)) + ' ms at most')
+            print(' > Delayed queries: ' + str(limiter.waitCount()))
+
+    limiter.setLimits( settings.daemonRateLimit, settings.daemonRateBurst, settings.daemonMaxInFlight )
+    daemon.setTransport( transport )
+
+def flakyDaemon( numQueries=2000, dropRate=0.02 ):
+    """Reads and writes data while the daemon drops some connections.
+    Compares the failed queries without and with retries of the read queries."""
+    transport = daemon.transport()
+    retryPolicy = daemon.retryPolicy()
+    stats = daemon.stats()
+
+    with RamFakeDaemon( shots=100, dropRate=dropRate ) as fake:
+        daemon.setTransport( fake.transport() )
+        uuids = fake.uuids("RamShot")
+
+        for retries in (0, settings.daemonReadRetries):
+            retryPolicy.setRetries( retries )
+            daemon.circuitBreaker().reset()
+            daemon.circuitBreaker().resetCounters()
+            stats.reset()
+            fake.resetCounters()
+            failedReads = 0
+            failedWrites = 0
+            tic = perf_counter()
+            for i in range(numQueries):
+                uuid = uuids[i % len(uuids)]
+                data = daemon.getData( uuid )
+                if not data:
+                    failedReads = failedReads + 1
+                    continue
+                if i % 10 == 0:
+                    reply = daemon.setData( uuid, data )
+                    if not reply or not reply.get('success', False):
+                        failedWrites = failedWrites + 1
+            toc = perf_counter()
+
+            print('=== ' + str(retries) + ' retries: ' + str(int((toc-tic)*1000)) + ' ms, ' + str(fake.dropCount()) + ' dropped connections ===')
+            print(' > Failed reads: ' + str(failedReads) + ', failed writes: ' + str(failedWrites) + ', rejected while offline: ' + str(daemon.circuitBreaker().rejectedCount()))
+            print(' > Retries: ' + str(stats.retryCount()))
+
+    retryPolicy.setRetries( settings.daemonReadRetries )
+    daemon.setTransport( transport )
+
+def largePayloads( numQueries=100, size=200000 ):
+    """Saves and reads back objects with large settings containing '&' and '=',
+    with the legacy query encoding, with escaping and framing, and with compression"""
+    from ramses.fake_daemon import CAPABILITIES
+    transport = daemon.transport()
+    stats = daemon.stats()
+    baseCapabilities = [ c for c in CAPABILITIES if not c in ('escaping', 'framing', 'zlib') ]
+
+    customSettings = ""
+    i = 0
+    while len(customSettings) < size:
+        customSettings = customSettings + "setting" + str(i) + ": path=/shots/" + str(i) + "&format=exr # é\n"
+        i = i + 1
+
+    for mode, capabilities in (
+        ('legacy', baseCapabilities),
+        ('escaping, framing', baseCapabilities + ['escaping', 'framing']),
+        ('escaping, framing, zlib', baseCapabilities + ['escaping', 'framing', 'zlib']),
+        ):
+        with RamFakeDaemon( capabilities=capabilities ) as fake:
+            daemon.setTransport( fake.transport() )
+            daemon.ping()
+            uuids = fake.uuids("RamStep")
+            stats.reset()
+            errors = 0
+            tic = perf_counter()
+            for i in range(numQueries):
+                uuid = uuids[i % len(uuids)]
+                data = { 'name': 'Step', 'shortName': 'S' + str(i), 'customSettings': customSettings }
+                daemon.setData( uuid, data )
+                if daemon.getData( uuid ) != data:
+                    errors = errors + 1
+            toc = perf_counter()
+            report = stats.report()
+            print('=== ' + mode + ': ' + str(int(numQueries/(toc-tic))) + ' round trips per second, ' + str(errors) + ' errors ===')
+            print(' > Sent: ' + str(report['bytesSent'] // 1024) + ' KB')
+
+    daemon.setTransport( transport )
+
+def jsonCodecs( replySize=1048576, numIterations=20 ):
+    """Compares the available JSON codecs on a realistic project reply of at least replySize bytes (1 MB by default),
+    and on a metadata file written with indentation or compact"""
+    import tempfile
+    from ramses.json_codec import setJsonCodec, availableJsonCodecs
+    from ramses.daemon_connection import decodeReply
+
+    # Add shots until the reply is large enough
+    numShots = 100
+    while True:
+        fake = RamFakeDaemon( sequences=1, shots=numShots, assetGroups=1, assets=numShots//4 )
+        shots = fake.reply( "getShots&projectUuid=" + fake.currentProjectUuid() + "&hydrate=1" )
+        if len(shots) >= replySize:
+            break
+        numShots = numShots * replySize // len(shots) + 1
+    content = decodeReply( bytearray(shots) )['content']
+    metaData = { "file" + str(i) + ".ma": { "comment": "Version " + str(i), "version": i, "state": "WIP", "history": list(range(10)) } for i in range(5000) }
+    metaDataFolder = tempfile.mkdtemp()
+    metaDataFile = RamMetaDataManager.getMetaDataFile( metaDataFolder )
+    print('=== Reply: ' + str(len(shots) // 1024) + ' KB, ' + str(len(content['shots'])) + ' shots ===')
+
+    for name in availableJsonCodecs():
+        codec = setJsonCodec( name )
+
+        tic = perf_counter()
+        for i in range(numIterations):
+            decodeReply( bytearray(shots) )
+        decodeTime = (perf_counter() - tic) / numIterations
+
+        tic = perf_counter()
+        for i in range(numIterations):
+            codec.dumps( content, compact=True )
+        encodeTime = (perf_counter() - tic) / numIterations
+
+        times = []
+        for compact in (False, True):
+            settings.compactMetaData = compact
+            tic = perf_counter()
+            for i in range(numIterations):
+                RamMetaDataManager.setMetaData( metaDataFolder, metaData )
+                with open( metaDataFile, 'r', encoding="utf8" ) as f:
+                    codec.loads( f.read() )
+            times.append( (perf_counter() - tic) / numIterations )
+            size = os.path.getsize( metaDataFile )
+
+        print(' > ' + name + ': decode ' + str(round(decodeTime*1000, 1)) + ' ms, encode ' + str(round(encodeTime*1000, 1)) + ' ms, ' +
+            'metadata ' + str(round(times[0]*1000, 1)) + ' ms (indented), ' + str(round(times[1]*1000, 1)) + ' ms (compact, ' + str(size // 1024) + ' KB)')
+
+    settings.compactMetaData = settings.defaultCompactMetaData
+    setJsonCodec( settings.jsonCodec )
+
+def objectIdentity():
+    """Lists the steps, states and users of the statuses of all the shots,
+    through accessors building new objects each time"""
+    proj = ramses.currentProject()
+    if proj is None:
+        print('There is no current project.')
+        return
+
+    cache = RamObjectCache.instance()
+    stats = daemon.stats()
+    steps = proj.steps( StepType.SHOT_PRODUCTION, hydrate=True )
+    shots = proj.shots( hydrate=True )
+    statuses = [ shot.currentStatus(step) for shot in shots for step in steps ]
+    statuses = [ status for status in statuses if status is not None ]
+    for i in range(2):
+        cache.resetCounters()
+        with stats.trace() as trace:
+            for status in statuses:
+                status.step().name()
+                status.state().name()
+                status.user().name()
+                for pipe in proj.pipes():
+                    pipe.inputStep().shortName()
+        print('=== ' + str(len(statuses)) + ' statuses: ' + str(trace.counts().get('getData', 0)) + ' getData queries in ' + str(int(trace.elapsed()*1000)) + ' ms, ' +
+            'cache hit rate ' + str(int(cache.hitRate()*100)) + '%, ' + str(cache.size()) + ' cached objects ===')
+
+def browseSession():
+    """A typical session: lists the shots of the current project with their status for each step"""
+    proj = ramses.currentProject()
+    if proj is None:
+        return
+    steps = proj.steps( StepType.SHOT_PRODUCTION, hydrate=True )
+    for shot in proj.shots( hydrate=True ):
+        shot.name()
+        shot.folderPath()
+        for step in steps:
+            shot.currentStatus(step)
+
+def recordReplay( filePath="", session=browseSession, numReplays=10 ):
+    """Records a session, or uses an existing recording, and replays it without a daemon
+    to measure the number of queries and the client-side CPU time"""
+    import tempfile
+    from ramses import RamReplayTransport
+
+    if filePath == "":
+        filePath = os.path.join(tempfile.gettempdir(), "ramses-session.jsonl")
+        daemon.startRecording( filePath )
+        session()
+        print('=== ' + str(daemon.stopRecording()) + ' queries recorded to ' + filePath + ' ===')
+
+    transport = daemon.transport()
+    stats = daemon.stats()
+    for i in range(numReplays):
+        replay = RamReplayTransport( filePath )
+        daemon.setTransport( replay )
+        with stats.trace() as trace:
+            cpu = process_time()
+            session()
+            cpu = process_time() - cpu
+        print(' > Replay: ' + str(trace.queryCount()) + ' queries (' + str(replay.missCount()) + ' not recorded), ' + str(int(cpu*1000)) + ' ms CPU')
+    daemon.setTransport( transport )
+
 # === TESTS ===
 
 # ramObjects()
@@ -206,6 +968,29 @@ def metaDataManager():
 # fileManager()
 # metaDataManager()
 # ramStep()
+# daemonConnections()
+# daemonUserChecks()
+# asyncQueries()
+# daemonPipelining()
+# batchQueries()
+# daemonStats()
+# daemonOffline()
+# objectRegistry()
+# hydratedLists()
+# coalescedQueries()
+# daemonTransports()
+# threadedQueries()
+# recordReplay()
+# changeSubscription()
+# cachePolicies()
+# statusTransactions()
+# patchUpdates()
+# backgroundRefresh()
+# farmLoad()
+# flakyDaemon()
+# largePayloads()
+# jsonCodecs()
+# objectIdentity()
 
 proj = ramses.currentProject()
 assets = proj.assets()